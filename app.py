@@ -4,25 +4,84 @@ Annual General Assembly QR Code System
 Generates QR codes for members and provides verification system
 """
 
-from flask import Flask, render_template, request, jsonify, send_file, redirect, url_for, session
-import pandas as pd
-import qrcode
-import qrcode.image.svg
+from flask import Flask, Response, render_template, request, jsonify, send_file, send_from_directory, redirect, url_for, session, stream_with_context
 from io import BytesIO
 import sqlite3
 import hashlib
 import secrets
-import smtplib
-from email.mime.multipart import MIMEMultipart
-from email.mime.text import MIMEText
-from email.mime.image import MIMEImage
 import os
 from datetime import datetime
 import json
+import hmac
+import math
 from functools import wraps
+from config import Config
+from outbox import EmailOutbox
+from dedupe import deduplicate_members
+from replication import Replicator
+from rate_limit import TokenBucketLimiter
+from assets import AssetManifest, IMMUTABLE
+from export import iter_attendance, parse_time, stream_csv, stream_xlsx
+from profiling import RequestProfiler
+from read_model import MemberSnapshot
+from code_manifest import CodeManifest
+from maintenance import DatabaseMaintenance
+from checkin_committer import CheckinCommitter
+from whatsapp_service import WhatsAppService
+from telemetry import ScanTelemetry
+from structured_logging import configure_logging, get_logger
 
 app = Flask(__name__)
 app.secret_key = 'your-secret-key-here'
+app.config['DATABASE'] = Config.DATABASE_URL
+if Config.PROXY_FIX_X_FOR:
+    # Rate limits key on the client address; take it from the proxy's header
+    from werkzeug.middleware.proxy_fix import ProxyFix
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=Config.PROXY_FIX_X_FOR)
+
+# JSON log lines written by a background thread; log calls only enqueue
+configure_logging()
+import_log = get_logger('import')
+verify_log = get_logger('verify')
+
+# Self-hosted static assets under content-hashed URLs
+assets = AssetManifest(app.static_folder)
+app.jinja_env.globals['asset_url'] = assets.url
+
+# Scanner shell precached by the service worker
+SCANNER_SHELL_PAGES = ['/mobile', '/verify']
+SCANNER_SHELL_ASSETS = [
+    'vendor/bootstrap/css/bootstrap.min.css',
+    'vendor/bootstrap/js/bootstrap.min.js',
+    'vendor/fontawesome/css/all.min.css',
+    'js/qr-scanner.js',
+    'js/scan-telemetry.js',
+    'js/code-manifest.js',
+    'js/qr-decode-worker.js',
+    'js/qr-decoder.js',
+]
+SCANNER_SHELL_FONTS = [
+    'vendor/fontawesome/webfonts/fa-solid-900.woff2',
+    'vendor/fontawesome/webfonts/fa-regular-400.woff2',
+]
+
+# Rate limits for the unauthenticated scanner endpoints
+verify_limiter = TokenBucketLimiter(
+    'verify', Config.VERIFY_RATE_PER_SECOND, Config.VERIFY_BURST,
+    global_rate=Config.VERIFY_GLOBAL_RATE_PER_SECOND,
+    devices_per_ip=Config.RATE_LIMIT_DEVICES_PER_IP
+)
+listing_limiter = TokenBucketLimiter('listing', Config.LISTING_RATE_PER_SECOND, Config.LISTING_BURST,
+                                     devices_per_ip=Config.RATE_LIMIT_DEVICES_PER_IP)
+telemetry_limiter = TokenBucketLimiter('telemetry', 1, 5, devices_per_ip=Config.RATE_LIMIT_DEVICES_PER_IP)
+
+# Latency samples reported by the scanner pages, aggregated per gate
+telemetry = ScanTelemetry(Config.TELEMETRY_WINDOW_SECONDS)
+
+# cProfile on a sample of requests while switched on from the admin panel
+profiler = RequestProfiler(Config.PROFILE_DIR, Config.PROFILE_SAMPLE_RATE, Config.PROFILE_MAX_FILES)
+profiler.install(app, exclude={'static', 'static_asset', 'service_worker',
+                               'profiling_status', 'profiling_configure', 'profiling_download'})
 
 # Admin credentials
 ADMIN_USERNAME = 'admin'
@@ -37,29 +96,179 @@ def admin_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
+def client_key():
+    """Identify the calling scanner by its device id, else its IP (a label, not trusted)"""
+    return request.headers.get('X-Device-Id') or request.remote_addr or 'unknown'
+
+def rate_limit_keys():
+    """(bucket key, IP): the device id only subdivides its IP's budget"""
+    ip = request.remote_addr or 'unknown'
+    device = request.headers.get('X-Device-Id', '')[:64]
+    return (f'{ip}/{device}' if device else ip), ip
+
+def rate_limited(limiter):
+    """Shed requests over the limiter's budget with 429 before any DB work"""
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            retry_after = limiter.acquire(*rate_limit_keys())
+            if retry_after:
+                response = jsonify({
+                    'valid': False,
+                    'error': 'Too many requests',
+                    'message': '⏳ Too many requests, please wait a moment',
+                    'retry_after': round(retry_after, 2)
+                })
+                response.status_code = 429
+                response.headers['Retry-After'] = str(max(1, math.ceil(retry_after)))
+                return response
+            return f(*args, **kwargs)
+        return decorated_function
+    return decorator
+
+def replication_token_required(f):
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        token = request.headers.get('X-Replication-Token', '')
+        if not replicator.enabled or not hmac.compare_digest(token, replicator.token):
+            return jsonify({'error': 'Replication not authorized'}), 403
+        return f(*args, **kwargs)
+    return decorated_function
+
 # Database setup
-def init_db():
-    conn = sqlite3.connect('aga_attendance.db')
+def get_db():
+    """Open a connection to the attendance database"""
+    return sqlite3.connect(app.config['DATABASE'])
+
+def qr_digest(qr_data):
+    """Fixed-width lookup key for a QR payload: the first 16 bytes of its SHA-256"""
+    if qr_data is None:
+        return None
+    return hashlib.sha256(qr_data.encode()).digest()[:16]
+
+def fetch_checkin_states(cursor, member_ids, chunk_size=500):
+    """{member_id: (checked_in, check_in_time)} for the members that exist"""
+    states = {}
+    for start in range(0, len(member_ids), chunk_size):
+        chunk = member_ids[start:start + chunk_size]
+        cursor.execute(
+            f'SELECT member_id, checked_in, check_in_time FROM members WHERE member_id IN ({",".join("?" * len(chunk))})',
+            chunk
+        )
+        states.update((row[0], (bool(row[1]), row[2])) for row in cursor.fetchall())
+    return states
+
+def migrate_qr_digest(conn):
+    """Rebuild a members table that still has the hex qr_hash column.
+
+    Older databases indexed both qr_code and a 64-character hex qr_hash.
+    SQLite cannot drop a UNIQUE constraint, so the table is copied into the
+    new layout (same column order, BLOB digest, one index) in a single
+    transaction, with digests computed by a registered SQL function.
+    """
     cursor = conn.cursor()
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS members (
+    cursor.execute('PRAGMA table_info(members)')
+    if {column[1]: column[2] for column in cursor.fetchall()}.get('qr_hash') == 'BLOB':
+        return False
+    
+    conn.create_function('qr_digest', 1, qr_digest, deterministic=True)
+    if conn.in_transaction:
+        conn.commit()
+    cursor.execute('BEGIN')
+    try:
+        cursor.execute('DROP TABLE IF EXISTS members_new')
+        create_members_table(cursor, 'members_new')
+        cursor.execute('''
+            INSERT INTO members_new
+            (id, member_id, full_name, email, phone, qr_code, qr_hash,
+             checked_in, check_in_time, created_at, check_in_gate)
+            SELECT id, member_id, full_name, email, phone, qr_code, qr_digest(qr_code),
+                   checked_in, check_in_time, created_at, check_in_gate
+            FROM members
+        ''')
+        cursor.execute('DROP TABLE members')
+        cursor.execute('ALTER TABLE members_new RENAME TO members')
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return True
+
+def create_members_table(cursor, name='members'):
+    """Create the members table (or a copy of its layout under another name)"""
+    cursor.execute(f'''
+        CREATE TABLE IF NOT EXISTS {name} (
             id INTEGER PRIMARY KEY,
             member_id TEXT UNIQUE,
             full_name TEXT,
             email TEXT,
             phone TEXT,
-            qr_code TEXT UNIQUE,
-            qr_hash TEXT UNIQUE,
+            qr_code TEXT,
+            qr_hash BLOB UNIQUE,
             checked_in BOOLEAN DEFAULT FALSE,
             check_in_time TIMESTAMP,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            check_in_gate TEXT
         )
     ''')
+
+# Durable invitation outbox (shares the attendance database)
+outbox = EmailOutbox(get_db)
+
+# WhatsApp invitations (keeps its connection pool and uploaded media ids)
+whatsapp = WhatsAppService()
+
+# Listing reads are served from memory; write paths keep it current
+snapshot = MemberSnapshot(get_db, source=lambda: app.config['DATABASE'],
+                          recheck_seconds=Config.MEMBERS_RECHECK_SECONDS)
+
+# Hashed valid-code list scanners use to reject unknown QRs locally
+code_manifest = CodeManifest(snapshot)
+
+# Check-in change log shipped to a peer node
+replicator = Replicator(get_db, Config.NODE_ID, Config.REPLICATION_PEER_URL, Config.REPLICATION_TOKEN,
+                        on_change=snapshot.update_checkins)
+
+# Single writer that commits concurrent check-ins in batches
+checkin_committer = CheckinCommitter(
+    get_db, replicator, on_change=snapshot.update_checkins,
+    max_batch=Config.CHECKIN_BATCH_SIZE,
+    max_wait_seconds=Config.CHECKIN_BATCH_WAIT_MS / 1000,
+    timeout_seconds=Config.CHECKIN_COMMIT_TIMEOUT_SECONDS,
+    profiler=profiler
+)
+
+# Online backups and WAL checkpoints while the server runs
+maintenance = DatabaseMaintenance(
+    get_db, lambda: app.config['DATABASE'], Config.BACKUP_DIR,
+    backup_interval_seconds=Config.BACKUP_INTERVAL_SECONDS,
+    keep=Config.BACKUP_KEEP,
+    pages_per_step=Config.BACKUP_PAGES_PER_STEP,
+    step_pause_seconds=Config.BACKUP_STEP_PAUSE_SECONDS,
+    checkpoint_interval_seconds=Config.CHECKPOINT_INTERVAL_SECONDS
+)
+
+def init_db():
+    conn = get_db()
+    cursor = conn.cursor()
+    create_members_table(cursor)
+    # Databases created before gates were recorded gain the column in place
+    cursor.execute('PRAGMA table_info(members)')
+    if 'check_in_gate' not in {column[1] for column in cursor.fetchall()}:
+        cursor.execute('ALTER TABLE members ADD COLUMN check_in_gate TEXT')
+    migrate_qr_digest(conn)
+    snapshot.create_tables(cursor)
+    outbox.create_tables(cursor)
+    replicator.create_tables(cursor)
     conn.commit()
     conn.close()
 
-def load_members_from_csv():
+MEMBERS_CSV = '2025_TIPCS_Annual_General_Assembly_(AGA25).csv'
+
+def load_members_from_csv(path=MEMBERS_CSV):
     """Load members from CSV file"""
+    # pandas is only needed for imports; loading it lazily keeps worker startup lean
+    import pandas as pd
     try:
         # Try different encodings to handle the CSV file
         encodings = ['utf-8', 'latin-1', 'cp1252', 'iso-8859-1']
@@ -67,8 +276,8 @@ def load_members_from_csv():
         
         for encoding in encodings:
             try:
-                df = pd.read_csv('2025_TIPCS_Annual_General_Assembly_(AGA25).csv', encoding=encoding)
-                print(f"Successfully loaded CSV with {encoding} encoding")
+                df = pd.read_csv(path, encoding=encoding)
+                import_log.info('CSV loaded', extra={'encoding': encoding, 'rows': len(df)})
                 break
             except UnicodeDecodeError:
                 continue
@@ -86,47 +295,71 @@ def load_members_from_csv():
             # Generate unique QR code data
             member_id = str(int(row['Id'])) if pd.notna(row['Id']) else secrets.token_hex(8)
             qr_data = f"AGA-{member_id}-{secrets.token_hex(4)}"
-            qr_hash = hashlib.sha256(qr_data.encode()).hexdigest()
             
             member = {
                 'member_id': member_id,
                 'full_name': str(row['Full name']).strip() if pd.notna(row['Full name']) else 'Unknown',
                 'email': str(row['Email1']).strip() if pd.notna(row['Email1']) else '',
                 'phone': str(row['Phone number']).strip() if pd.notna(row['Phone number']) else '',
-                'qr_code': qr_data,
-                'qr_hash': qr_hash
+                'qr_code': qr_data
             }
             members.append(member)
         
+        import_log.info('Members read from CSV', extra={'members': len(members)})
         return members
-    except Exception as e:
-        print(f"Error loading CSV file: {e}")
+    except Exception:
+        import_log.exception('Error loading CSV file')
         return []
 
+def load_existing_members():
+    """Fetch the members already in the database"""
+    conn = get_db()
+    cursor = conn.cursor()
+    cursor.execute('SELECT member_id, full_name, email, phone, qr_code FROM members')
+    rows = cursor.fetchall()
+    conn.close()
+    
+    return [{
+        'member_id': r[0],
+        'full_name': r[1],
+        'email': r[2] or '',
+        'phone': r[3] or '',
+        'qr_code': r[4]
+    } for r in rows]
+
 def save_members_to_db(members):
     """Save members to database"""
-    conn = sqlite3.connect('aga_attendance.db')
+    conn = get_db()
     cursor = conn.cursor()
     
     for member in members:
+        # Known members keep their QR code and check-in state
         cursor.execute('''
-            INSERT OR REPLACE INTO members 
+            INSERT INTO members 
             (member_id, full_name, email, phone, qr_code, qr_hash)
             VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT (member_id) DO UPDATE SET
+                full_name = excluded.full_name,
+                email = excluded.email,
+                phone = excluded.phone
         ''', (
             member['member_id'],
             member['full_name'],
             member['email'],
             member['phone'],
             member['qr_code'],
-            member['qr_hash']
+            qr_digest(member['qr_code'])
         ))
+    # Lets a server in another process notice an import run from manage.py
+    snapshot.mark_changed(cursor)
     
     conn.commit()
     conn.close()
+    snapshot.invalidate()
 
 def generate_qr_code(qr_data, member_name):
     """Generate QR code image"""
+    import qrcode
     qr = qrcode.QRCode(
         version=1,
         error_correction=qrcode.constants.ERROR_CORRECT_L,
@@ -164,6 +397,12 @@ def generate_qr_code(qr_data, member_name):
     
     return img
 
+def qr_image_path(qr_code, full_name):
+    """Where a pre-rendered QR image (python manage.py render-qr) is kept"""
+    # Keyed on both inputs so a new code or a renamed member misses the cache
+    key = hashlib.sha256(f'{qr_code}\n{full_name}'.encode()).hexdigest()[:32]
+    return os.path.join(Config.QR_CACHE_DIR, f'{key}.png')
+
 @app.route('/')
 def index():
     return render_template('index.html')
@@ -200,18 +439,49 @@ def verify():
 def mobile():
     return render_template('mobile.html')
 
+@app.route('/assets/<path:filename>')
+def static_asset(filename):
+    """Serve static files under fingerprinted, immutably cached names"""
+    path, immutable = assets.resolve(filename)
+    response = send_from_directory(app.static_folder, path)
+    if immutable:
+        response.headers['Cache-Control'] = IMMUTABLE
+    return response
+
+@app.route('/service-worker.js')
+def service_worker():
+    """Service worker precaching the scanner pages and their assets"""
+    precache = [assets.url(name) for name in SCANNER_SHELL_ASSETS]
+    # Fonts are requested by the stylesheet under their plain names
+    precache += [f'{assets.url_prefix}/{name}' for name in SCANNER_SHELL_FONTS]
+    version = hashlib.sha256(json.dumps(precache).encode()).hexdigest()[:10]
+    
+    response = app.response_class(
+        render_template('service-worker.js', version=version, pages=SCANNER_SHELL_PAGES, assets=precache),
+        mimetype='application/javascript'
+    )
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
 @app.route('/api/load-members', methods=['POST'])
 @admin_required
 def load_members():
     """Load members from CSV and generate QR codes"""
     try:
         members = load_members_from_csv()
+        members, duplicates = deduplicate_members(members, load_existing_members())
         save_members_to_db(members)
+        import_log.info('Members imported', extra={'members': len(members), 'duplicates': len(duplicates)})
+        
+        message = f'Loaded {len(members)} members successfully'
+        if duplicates:
+            message += f' ({len(duplicates)} duplicate rows merged)'
         
         return jsonify({
             'success': True,
-            'message': f'Loaded {len(members)} members successfully',
-            'count': len(members)
+            'message': message,
+            'count': len(members),
+            'duplicates': duplicates
         })
     except Exception as e:
         return jsonify({
@@ -222,7 +492,7 @@ def load_members():
 @app.route('/api/generate-qr/<member_id>')
 def generate_qr(member_id):
     """Generate QR code for specific member"""
-    conn = sqlite3.connect('aga_attendance.db')
+    conn = get_db()
     cursor = conn.cursor()
     
     cursor.execute('SELECT * FROM members WHERE member_id = ?', (member_id,))
@@ -232,6 +502,10 @@ def generate_qr(member_id):
     if not member:
         return jsonify({'error': 'Member not found'})
     
+    cached = qr_image_path(member[5], member[2])
+    if os.path.exists(cached):
+        return send_file(os.path.abspath(cached), mimetype='image/png')
+    
     # Generate QR code image
     img = generate_qr_code(member[5], member[2])  # qr_code, full_name
     
@@ -243,6 +517,7 @@ def generate_qr(member_id):
     return send_file(img_io, mimetype='image/png')
 
 @app.route('/api/verify-qr', methods=['POST'])
+@rate_limited(verify_limiter)
 def verify_qr():
     """Verify QR code and check in member"""
     data = request.get_json()
@@ -251,15 +526,16 @@ def verify_qr():
     if not qr_data:
         return jsonify({'error': 'No QR code data provided'})
     
-    conn = sqlite3.connect('aga_attendance.db')
+    conn = get_db()
     cursor = conn.cursor()
     
-    # Find member by QR code
-    cursor.execute('SELECT * FROM members WHERE qr_code = ?', (qr_data,))
+    # Find member by the digest of the scanned payload (the one indexed key)
+    cursor.execute('SELECT * FROM members WHERE qr_hash = ?', (qr_digest(qr_data),))
     member = cursor.fetchone()
+    conn.close()
     
     if not member:
-        conn.close()
+        verify_log.info('QR code not recognized', extra={'gate': client_key()})
         return jsonify({
             'valid': False,
             'message': '❌ Invalid: QR code not recognized'
@@ -267,7 +543,7 @@ def verify_qr():
     
     # Check if already checked in
     if member[7]:  # checked_in field
-        conn.close()
+        verify_log.info('QR code already used', extra={'member_id': member[1], 'gate': client_key()})
         return jsonify({
             'valid': False,
             'message': '❌ Invalid: QR code already used',
@@ -275,14 +551,32 @@ def verify_qr():
             'check_in_time': member[8]
         })
     
-    # Check in the member
-    cursor.execute('''
-        UPDATE members 
-        SET checked_in = TRUE, check_in_time = CURRENT_TIMESTAMP 
-        WHERE member_id = ?
-    ''', (member[1],))
-    conn.commit()
-    conn.close()
+    # Check in the member through the group committer; its NOT checked_in
+    # guard makes a concurrent scan of the same code at another gate lose
+    # instead of double-admitting
+    try:
+        result = checkin_committer.submit(member[1], True, client_key())
+    except sqlite3.OperationalError as e:
+        # Lock wait or commit wait timed out; the scan can simply be retried
+        verify_log.warning('Check-in busy', extra={'member_id': member[1], 'gate': client_key(), 'error': str(e)})
+        response = jsonify({
+            'valid': False,
+            'message': '⚠️ Busy: please scan again',
+            'error': str(e)
+        })
+        response.status_code = 503
+        response.headers['Retry-After'] = '1'
+        return response
+    
+    if not result['applied']:
+        verify_log.info('QR code already used', extra={'member_id': member[1], 'gate': client_key()})
+        return jsonify({
+            'valid': False,
+            'message': '❌ Invalid: QR code already used',
+            'member_name': member[2],
+            'check_in_time': result['check_in_time']
+        })
+    verify_log.info('Member checked in', extra={'member_id': member[1], 'gate': client_key()})
     
     return jsonify({
         'valid': True,
@@ -291,59 +585,94 @@ def verify_qr():
         'check_in_time': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
     })
 
+def listing_response(view):
+    """Serve a snapshot view, answering If-None-Match with 304 from memory"""
+    # Read the version before the body: a write in between only makes the
+    # body newer than its ETag, so the next poll re-downloads it
+    etag = snapshot.etag()
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = Response(snapshot.json(view), mimetype='application/json')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
 @app.route('/api/members')
+@rate_limited(listing_limiter)
 def get_members():
     """Get all members with their status"""
-    conn = sqlite3.connect('aga_attendance.db')
-    cursor = conn.cursor()
-    
-    cursor.execute('''
-        SELECT member_id, full_name, email, phone, checked_in, check_in_time
-        FROM members ORDER BY full_name
-    ''')
-    members = cursor.fetchall()
-    conn.close()
-    
-    return jsonify([{
-        'member_id': m[0],
-        'full_name': m[1],
-        'email': m[2],
-        'phone': m[3],
-        'checked_in': bool(m[4]),
-        'check_in_time': m[5]
-    } for m in members])
+    return listing_response('members')
 
 @app.route('/api/members-with-qr')
 @admin_required
 def get_members_with_qr():
     """Get all members with their QR codes for email sending"""
-    conn = sqlite3.connect('aga_attendance.db')
-    cursor = conn.cursor()
+    return listing_response('members_with_qr')
+
+@app.route('/api/code-manifest')
+@rate_limited(listing_limiter)
+def get_code_manifest():
+    """Hashed valid-code list for scanners; ?since=<version> returns only the changes"""
+    version = code_manifest.current()
+    if request.if_none_match.contains(version):
+        response = Response(status=304)
+    else:
+        response = jsonify(code_manifest.payload(request.args.get('since')))
+    response.set_etag(version)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+EXPORT_FORMATS = {
+    'csv': (stream_csv, 'text/csv; charset=utf-8'),
+    'xlsx': (stream_xlsx, 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+}
+
+@app.route('/api/export/attendance.<fmt>')
+@admin_required
+def export_attendance(fmt):
+    """Stream the attendance report as CSV or XLSX.
+
+    Optional filters: checked_in=true|false, from/to (ISO time, UTC if no
+    offset is given) on the check-in time, and gate (scanner device id, or
+    'admin' for manual check-ins).
+    """
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({
+            'success': False,
+            'message': f'Unsupported export format: {fmt}'
+        }), 404
     
-    cursor.execute('''
-        SELECT member_id, full_name, email, phone, qr_code, checked_in, check_in_time
-        FROM members ORDER BY full_name
-    ''')
-    members = cursor.fetchall()
-    conn.close()
+    checked_in = request.args.get('checked_in')
+    try:
+        filters = {
+            'checked_in': None if checked_in in (None, '') else checked_in.lower() in ('1', 'true', 'yes'),
+            'since': parse_time(request.args.get('from')),
+            'until': parse_time(request.args.get('to')),
+            'gate': request.args.get('gate') or None,
+        }
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'message': f'Invalid time filter: {str(e)}'
+        }), 400
     
-    return jsonify([{
-        'member_id': m[0],
-        'full_name': m[1],
-        'email': m[2],
-        'phone': m[3],
-        'qr_code': m[4],
-        'checked_in': bool(m[5]),
-        'check_in_time': m[6]
-    } for m in members])
+    writer, mimetype = EXPORT_FORMATS[fmt]
+    filename = f'attendance-{datetime.now().strftime("%Y%m%d-%H%M")}.{fmt}'
+    return Response(
+        stream_with_context(writer(iter_attendance(get_db, **filters))),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename="{filename}"'}
+    )
 
 @app.route('/api/send-invitations', methods=['POST'])
 @admin_required
 def send_invitations():
-    """Send invitations via email"""
+    """Send invitations via email or WhatsApp"""
     data = request.get_json()
     selected_members = data.get('members', [])
     send_type = data.get('type', 'bulk')  # 'bulk' or 'individual'
+    channel = data.get('channel', 'email')  # 'email' or 'whatsapp'
     
     if not selected_members:
         return jsonify({
@@ -352,28 +681,41 @@ def send_invitations():
         })
     
     try:
+        if channel == 'whatsapp':
+            if send_type == 'individual':
+                selected_members = selected_members[:1]
+            results = whatsapp.send_bulk_invitations(selected_members)
+            stats = whatsapp.get_stats(results)
+            
+            return jsonify({
+                'success': True,
+                'message': f'WhatsApp sending completed. {stats["successful"]}/{stats["total"]} messages sent successfully.',
+                'stats': stats,
+                'results': results
+            })
+        
         from email_service import EmailService
         email_service = EmailService()
         
         if send_type == 'individual':
-            # Send to individual member
-            member = selected_members[0]
-            success, message = email_service.send_single_invitation(
-                member['member_id'],
-                member['full_name'],
-                member['email'],
-                member['qr_code']
-            )
+            # Explicit resend to one member, even if already delivered
+            result = outbox.send_now(selected_members[:1], force=True)[0]
             
             return jsonify({
-                'success': success,
-                'message': message,
-                'member': member['full_name']
+                'success': result['success'],
+                'message': result['message'],
+                'member': result['member']
             })
         else:
-            # Send bulk invitations
-            results = email_service.send_bulk_invitations(selected_members)
+            # Send bulk invitations through the outbox so members already
+            # emailed are skipped and transient failures are retried later
+            results = outbox.send_now(
+                selected_members,
+                batch_size=int(data.get('batch_size', 10)),
+                delay_seconds=float(data.get('delay_seconds', 1))
+            )
             stats = email_service.get_email_stats(results)
+            outbox.wake()
             
             return jsonify({
                 'success': True,
@@ -388,6 +730,17 @@ def send_invitations():
             'message': f'Error sending invitations: {str(e)}'
         })
 
+@app.route('/api/outbox/pending')
+@admin_required
+def outbox_pending():
+    """List invitations that have not been delivered yet"""
+    pending = outbox.pending()
+    
+    return jsonify({
+        'count': len(pending),
+        'invitations': pending
+    })
+
 @app.route('/api/send-single-invitation', methods=['POST'])
 @admin_required
 def send_single_invitation():
@@ -403,7 +756,7 @@ def send_single_invitation():
     
     try:
         # Get member data from database
-        conn = sqlite3.connect('aga_attendance.db')
+        conn = get_db()
         cursor = conn.cursor()
         cursor.execute('SELECT * FROM members WHERE member_id = ?', (member_id,))
         member = cursor.fetchone()
@@ -415,19 +768,16 @@ def send_single_invitation():
                 'message': 'Member not found'
             })
         
-        from email_service import EmailService
-        email_service = EmailService()
-        
-        success, message = email_service.send_single_invitation(
-            member[1],  # member_id
-            member[2],  # full_name
-            member[3],  # email
-            member[5]   # qr_code
-        )
+        result = outbox.send_now([{
+            'member_id': member[1],
+            'full_name': member[2],
+            'email': member[3],
+            'qr_code': member[5]
+        }], force=True)[0]
         
         return jsonify({
-            'success': success,
-            'message': message,
+            'success': result['success'],
+            'message': result['message'],
             'member': member[2]
         })
         
@@ -451,69 +801,149 @@ def toggle_checkin():
             'message': 'Missing required parameters'
         })
     
-    conn = sqlite3.connect('aga_attendance.db')
+    conn = get_db()
     cursor = conn.cursor()
     
     try:
         # Check if member exists
         cursor.execute('SELECT full_name FROM members WHERE member_id = ?', (member_id,))
         member = cursor.fetchone()
+        conn.close()
         
         if not member:
-            conn.close()
             return jsonify({
                 'success': False,
                 'message': 'Member not found'
             })
         
-        # Update check-in status
+        # Update check-in status through the group committer, only if it is
+        # not already in that state
+        result = checkin_committer.submit(member_id, check_in, 'admin')
+        action = 'checked in' if check_in else 'checked out'
+        
+        if not result['applied']:
+            return jsonify({
+                'success': False,
+                'message': f'Member {member[0]} is already {action}'
+            })
+        
+        # Return the stored state so the admin table can patch the row in place
+        return jsonify({
+            'success': True,
+            'message': f'Member {member[0]} has been {action} successfully',
+            'member_id': member_id,
+            'checked_in': result['checked_in'],
+            'check_in_time': result['check_in_time']
+        })
+        
+    except Exception as e:
+        conn.close()
+        return jsonify({
+            'success': False,
+            'message': f'Error updating member status: {str(e)}'
+        })
+
+@app.route('/api/bulk-toggle-checkin', methods=['POST'])
+@admin_required
+def bulk_toggle_checkin():
+    """Check a list of members in or out in one transaction (admin function)"""
+    data = request.get_json() or {}
+    member_ids = data.get('member_ids')
+    check_in = data.get('check_in')
+    
+    if not isinstance(member_ids, list) or not member_ids or check_in is None:
+        return jsonify({
+            'success': False,
+            'message': 'member_ids (a non-empty list) and check_in are required'
+        })
+    
+    member_ids = list(dict.fromkeys(str(member_id) for member_id in member_ids))
+    check_in = bool(check_in)
+    conn = get_db()
+    cursor = conn.cursor()
+    
+    try:
+        # Take the write lock up front so the states read here cannot
+        # change before the update
+        cursor.execute('BEGIN IMMEDIATE')
+        before = fetch_checkin_states(cursor, member_ids)
+        to_change = [member_id for member_id in member_ids
+                     if member_id in before and before[member_id][0] != check_in]
+        
         if check_in:
-            cursor.execute('''
+            cursor.executemany('''
                 UPDATE members 
-                SET checked_in = TRUE, check_in_time = CURRENT_TIMESTAMP 
+                SET checked_in = TRUE, check_in_time = CURRENT_TIMESTAMP, check_in_gate = 'admin'
                 WHERE member_id = ?
-            ''', (member_id,))
-            action = 'checked in'
+            ''', [(member_id,) for member_id in to_change])
         else:
-            cursor.execute('''
+            cursor.executemany('''
                 UPDATE members 
-                SET checked_in = FALSE, check_in_time = NULL 
+                SET checked_in = FALSE, check_in_time = NULL, check_in_gate = NULL
                 WHERE member_id = ?
-            ''', (member_id,))
-            action = 'checked out'
+            ''', [(member_id,) for member_id in to_change])
+        replicator.log_members(cursor, to_change)
         
+        after = fetch_checkin_states(cursor, to_change)
         conn.commit()
         conn.close()
+        snapshot.update_checkins(after)
+        
+        results = []
+        for member_id in member_ids:
+            if member_id not in before:
+                results.append({'member_id': member_id, 'status': 'not_found'})
+                continue
+            checked_in, check_in_time = after.get(member_id, before[member_id])
+            results.append({
+                'member_id': member_id,
+                'status': 'updated' if member_id in after else 'unchanged',
+                'checked_in': checked_in,
+                'check_in_time': check_in_time
+            })
+        
+        action = 'checked in' if check_in else 'checked out'
+        message = f'{len(to_change)} members {action}'
+        if len(to_change) < len(member_ids):
+            message += f' ({len(member_ids) - len(to_change)} already {action} or not found)'
         
         return jsonify({
             'success': True,
-            'message': f'Member {member[0]} has been {action} successfully'
+            'message': message,
+            'updated': len(to_change),
+            'results': results
         })
         
     except Exception as e:
+        conn.rollback()
         conn.close()
         return jsonify({
             'success': False,
-            'message': f'Error updating member status: {str(e)}'
+            'message': f'Error updating members: {str(e)}'
         })
 
 @app.route('/api/bulk-checkout', methods=['POST'])
 @admin_required
 def bulk_checkout():
     """Check out all members (admin function)"""
-    conn = sqlite3.connect('aga_attendance.db')
+    conn = get_db()
     cursor = conn.cursor()
     
     try:
+        cursor.execute('SELECT member_id FROM members WHERE checked_in = TRUE')
+        checked_in_ids = [row[0] for row in cursor.fetchall()]
+        
         cursor.execute('''
             UPDATE members 
-            SET checked_in = FALSE, check_in_time = NULL 
+            SET checked_in = FALSE, check_in_time = NULL, check_in_gate = NULL
             WHERE checked_in = TRUE
         ''')
         
         affected_rows = cursor.rowcount
+        replicator.log_members(cursor, checked_in_ids)
         conn.commit()
         conn.close()
+        snapshot.update_checkins({member_id: (False, None) for member_id in checked_in_ids})
         
         return jsonify({
             'success': True,
@@ -531,17 +961,22 @@ def bulk_checkout():
 @admin_required
 def reset_checkins():
     """Reset all check-ins (admin function)"""
-    conn = sqlite3.connect('aga_attendance.db')
+    conn = get_db()
     cursor = conn.cursor()
     
     try:
+        cursor.execute('SELECT member_id FROM members WHERE checked_in = TRUE')
+        checked_in_ids = [row[0] for row in cursor.fetchall()]
+        
         cursor.execute('''
             UPDATE members 
-            SET checked_in = FALSE, check_in_time = NULL
+            SET checked_in = FALSE, check_in_time = NULL, check_in_gate = NULL
         ''')
         
+        replicator.log_members(cursor, checked_in_ids)
         conn.commit()
         conn.close()
+        snapshot.update_checkins({member_id: (False, None) for member_id in checked_in_ids})
         
         return jsonify({
             'success': True,
@@ -570,7 +1005,7 @@ def add_member():
             })
     
     try:
-        conn = sqlite3.connect('aga_attendance.db')
+        conn = get_db()
         cursor = conn.cursor()
         
         # Generate unique member ID
@@ -580,7 +1015,6 @@ def add_member():
         
         # Generate unique QR code data
         qr_data = f"AGA-{next_id}-{secrets.token_hex(4)}"
-        qr_hash = hashlib.sha256(qr_data.encode()).hexdigest()
         
         # Insert new member
         cursor.execute('''
@@ -593,11 +1027,12 @@ def add_member():
             data['email'].strip(),
             data.get('phone', '').strip(),
             qr_data,
-            qr_hash
+            qr_digest(qr_data)
         ))
         
         conn.commit()
         conn.close()
+        snapshot.invalidate()
         
         return jsonify({
             'success': True,
@@ -634,7 +1069,7 @@ def edit_member():
             })
     
     try:
-        conn = sqlite3.connect('aga_attendance.db')
+        conn = get_db()
         cursor = conn.cursor()
         
         # Check if member exists
@@ -662,10 +1097,17 @@ def edit_member():
         
         conn.commit()
         conn.close()
+        snapshot.invalidate()
         
         return jsonify({
             'success': True,
-            'message': f'Member {data["full_name"]} updated successfully'
+            'message': f'Member {data["full_name"]} updated successfully',
+            'member': {
+                'member_id': member_id,
+                'full_name': data['full_name'].strip(),
+                'email': data['email'].strip(),
+                'phone': data.get('phone', '').strip()
+            }
         })
         
     except Exception as e:
@@ -689,7 +1131,7 @@ def delete_member():
         })
     
     try:
-        conn = sqlite3.connect('aga_attendance.db')
+        conn = get_db()
         cursor = conn.cursor()
         
         # Check if member exists
@@ -708,6 +1150,7 @@ def delete_member():
         
         conn.commit()
         conn.close()
+        snapshot.invalidate()
         
         return jsonify({
             'success': True,
@@ -721,7 +1164,155 @@ def delete_member():
             'message': f'Error deleting member: {str(e)}'
         })
 
+@app.route('/api/rate-limits')
+@admin_required
+def rate_limit_stats():
+    """Counters of allowed and rejected scanner requests"""
+    return jsonify({
+        'verify': verify_limiter.stats(),
+        'listing': listing_limiter.stats(),
+        'telemetry': telemetry_limiter.stats()
+    })
+
+@app.route('/api/telemetry/scans', methods=['POST'])
+@rate_limited(telemetry_limiter)
+def report_scan_telemetry():
+    """Accept a batch of scanner timing samples (decode, round trip, display)"""
+    data = request.get_json(silent=True, force=True) or {}
+    samples = data.get('samples')
+    if not isinstance(samples, list):
+        return jsonify({
+            'success': False,
+            'message': 'samples must be a list'
+        }), 400
+    
+    gate = str(data.get('device_id') or client_key())[:64]
+    kept = telemetry.record(gate, samples[:100])
+    return jsonify({'success': True, 'recorded': kept})
+
+@app.route('/api/telemetry/scans')
+@admin_required
+def scan_telemetry():
+    """Per-gate scanner latency percentiles, slowest gate first"""
+    return jsonify(telemetry.summary())
+
+@app.route('/api/profiling')
+@admin_required
+def profiling_status():
+    """Profiler settings and the slowest recently sampled requests"""
+    limit = request.args.get('limit', 20, type=int)
+    return jsonify({
+        **profiler.status(),
+        'slowest': profiler.slowest(limit)
+    })
+
+@app.route('/api/profiling', methods=['POST'])
+@admin_required
+def profiling_configure():
+    """Switch request profiling on/off and set the sampled fraction"""
+    data = request.get_json() or {}
+    try:
+        profiler.configure(
+            enabled=data.get('enabled'),
+            sample_rate=data.get('sample_rate'),
+            routes=data.get('routes')
+        )
+    except (TypeError, ValueError, AttributeError) as e:
+        return jsonify({
+            'success': False,
+            'message': f'Invalid profiling settings: {str(e)}'
+        }), 400
+    
+    return jsonify({
+        'success': True,
+        'message': f"Profiling {'enabled' if profiler.enabled else 'disabled'}",
+        **profiler.status()
+    })
+
+@app.route('/api/profiling/files/<path:filename>')
+@admin_required
+def profiling_download(filename):
+    """Download a pstats file for snakeviz/flameprof"""
+    return send_from_directory(os.path.abspath(profiler.directory), filename, as_attachment=True)
+
+@app.route('/api/maintenance')
+@admin_required
+def maintenance_status():
+    """Last backup and WAL checkpoint, and the snapshot files kept"""
+    return jsonify(maintenance.status())
+
+@app.route('/api/maintenance/backup', methods=['POST'])
+@admin_required
+def maintenance_backup():
+    """Take an online backup now"""
+    try:
+        backup = maintenance.backup_once()
+        return jsonify({
+            'success': True,
+            'message': f"Backup written: {os.path.basename(backup['path'])} ({backup['pages']} pages in {backup['duration_ms']:.0f} ms)",
+            **backup
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'Error writing backup: {str(e)}'
+        })
+
+@app.route('/api/replication/status')
+@replication_token_required
+def replication_status():
+    """Report this node's id and log position to a peer"""
+    return jsonify(replicator.status())
+
+@app.route('/api/replication/changes')
+@replication_token_required
+def replication_changes():
+    """Ship check-in log entries after a sequence number to a peer"""
+    since = request.args.get('since', 0, type=int)
+    
+    return jsonify({
+        'node_id': replicator.node_id,
+        'changes': replicator.changes_since(since)
+    })
+
+@app.route('/api/replication/apply', methods=['POST'])
+@replication_token_required
+def replication_apply():
+    """Merge check-in log entries pushed by a peer"""
+    data = request.get_json()
+    
+    try:
+        stats = replicator.apply(data['origin'], data.get('changes', []), since=data.get('since'))
+        return jsonify({'success': True, **stats})
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'Error applying changes: {str(e)}'
+        }), 500
+
+@app.route('/api/replication/sync', methods=['POST'])
+def replication_sync():
+    """Sync with the configured peer now (admin or replication token)"""
+    token = request.headers.get('X-Replication-Token', '')
+    authorized = session.get('admin_logged_in') or (
+        replicator.enabled and hmac.compare_digest(token, replicator.token)
+    )
+    if not authorized:
+        return jsonify({'error': 'Replication not authorized'}), 403
+    
+    try:
+        summary = replicator.sync_once()
+        return jsonify({'success': True, **summary})
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'Error syncing with peer: {str(e)}'
+        })
+
 if __name__ == '__main__':
     init_db()
+    outbox.resume()
+    replicator.start_worker(Config.REPLICATION_INTERVAL_SECONDS)
+    maintenance.start_worker()
     port = int(os.environ.get('PORT', 5000))
     app.run(debug=False, host='0.0.0.0', port=port)
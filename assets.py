@@ -0,0 +1,51 @@
+"""
+Fingerprinted static assets
+
+Templates link assets through ``asset_url()``, which embeds a short content
+hash in the file name (``bootstrap.min.3f2a1c9d0e.css``). Those URLs never
+change meaning, so they are served with a one-year immutable cache
+lifetime; editing a file changes its hash and therefore its URL.
+"""
+
+import hashlib
+import os
+import re
+
+FINGERPRINT = re.compile(r'^(?P<stem>.+)\.(?P<digest>[0-9a-f]{10})(?P<ext>\.[^./]+)$')
+IMMUTABLE = 'public, max-age=31536000, immutable'
+
+
+class AssetManifest:
+    def __init__(self, static_folder, url_prefix='/assets'):
+        self.static_folder = static_folder
+        self.url_prefix = url_prefix
+        self._digests = {}
+
+    def digest(self, filename):
+        """Short content hash of a static file, computed once per process"""
+        if filename not in self._digests:
+            with open(os.path.join(self.static_folder, filename), 'rb') as f:
+                self._digests[filename] = hashlib.sha256(f.read()).hexdigest()[:10]
+        return self._digests[filename]
+
+    def url(self, filename):
+        """Fingerprinted URL for a static file"""
+        if not os.path.isfile(os.path.join(self.static_folder, filename)):
+            raise FileNotFoundError(f'Unknown static asset: {filename}')
+
+        stem, ext = os.path.splitext(filename)
+        return f'{self.url_prefix}/{stem}.{self.digest(filename)}{ext}'
+
+    def resolve(self, requested):
+        """Map a requested asset path to (static file, immutable?).
+
+        Files referenced relatively from a fingerprinted stylesheet (fonts
+        in Font Awesome's CSS) arrive without a hash and are still served,
+        just without the immutable lifetime.
+        """
+        match = FINGERPRINT.match(requested)
+        if match:
+            filename = match.group('stem') + match.group('ext')
+            if os.path.isfile(os.path.join(self.static_folder, filename)):
+                return filename, match.group('digest') == self.digest(filename)
+        return requested, False
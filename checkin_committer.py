@@ -0,0 +1,188 @@
+"""
+Group commit for check-ins
+
+Scan and admin check-in requests do not commit on their own. They hand a
+claim to a single writer thread and wait for its result. The writer takes
+what has queued up (until the batch is full or a few milliseconds after
+the first claim) and applies the claims one by one, in arrival order, in
+one transaction, so a burst of arrivals costs one commit (one fsync)
+instead of one each.
+
+Exactly-once is unchanged: every claim is the same guarded UPDATE as
+before (``WHERE ... AND NOT checked_in``), so of two claims for the same
+code, in one batch or not, only the first changes the row and the other
+is answered "already used". Results are handed out only after the commit
+succeeded; if it fails, every claim in the batch gets the error and none
+was applied.
+
+Callers wait at most timeout_seconds. A claim that times out while still
+queued is withdrawn; one already in the transaction may still commit, and
+a retry then finds the member checked in.
+"""
+
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future, TimeoutError
+from structured_logging import get_logger
+
+log = get_logger('verify')
+
+
+class CheckinCommitter:
+    def __init__(self, connect, replicator=None, on_change=None, max_batch=64, max_wait_seconds=0.002,
+                 timeout_seconds=10, profiler=None):
+        self.connect = connect
+        self.replicator = replicator
+        self.on_change = on_change
+        # RequestProfiler: batches run off the request thread, so they are
+        # sampled on their own as "checkin_batch"
+        self.profiler = profiler
+        self.max_batch = max_batch
+        self.max_wait_seconds = max_wait_seconds
+        self.timeout_seconds = timeout_seconds
+        self.batches = 0
+        self.claims = 0
+        self.largest_batch = 0
+        self._queue = queue.SimpleQueue()
+        self._worker = None
+        self._lock = threading.Lock()
+
+    def submit(self, member_id, check_in, gate=None):
+        """Check a member in (or out) and wait until it is committed.
+
+        Returns {'applied', 'checked_in', 'check_in_time'}; applied is False
+        when the member was already in that state (or no longer exists).
+        Raises the database error if the batch could not be committed, and
+        sqlite3.OperationalError if no result came within timeout_seconds.
+        """
+        future = Future()
+        self._ensure_worker()
+        self._queue.put(((member_id, bool(check_in), gate), future))
+        try:
+            return future.result(timeout=self.timeout_seconds)
+        except TimeoutError:
+            # Withdraw the claim unless the writer has already taken it
+            future.cancel()
+            raise sqlite3.OperationalError(f'check-in not committed within {self.timeout_seconds} s')
+
+    def stats(self):
+        return {
+            'batches': self.batches,
+            'claims': self.claims,
+            'largest_batch': self.largest_batch,
+            'mean_batch': round(self.claims / self.batches, 2) if self.batches else None
+        }
+
+    def _ensure_worker(self):
+        if self._worker and self._worker.is_alive():
+            return
+        with self._lock:
+            if not (self._worker and self._worker.is_alive()):
+                self._worker = threading.Thread(target=self._run, name='checkin-committer', daemon=True)
+                self._worker.start()
+
+    def _run(self):
+        batch = []
+        error = None
+        try:
+            while True:
+                batch = [self._queue.get()]
+                deadline = time.monotonic() + self.max_wait_seconds
+                while len(batch) < self.max_batch:
+                    timeout = deadline - time.monotonic()
+                    try:
+                        batch.append(self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+                # Skip claims whose caller gave up waiting
+                batch = [(claim, future) for claim, future in batch if future.set_running_or_notify_cancel()]
+                if batch and self.profiler:
+                    self.profiler.task('checkin_batch', f'{len(batch)} claims', self._commit, batch)
+                elif batch:
+                    self._commit(batch)
+                batch = []
+        except Exception as e:
+            error = e
+            log.error('Check-in writer stopped', extra={'error': str(e)})
+        finally:
+            # Nobody is left to answer these; the next submit starts a new writer
+            error = error or RuntimeError('check-in writer stopped')
+            pending = batch
+            while True:
+                try:
+                    pending.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            for _, future in pending:
+                if future.cancelled() or future.done():
+                    continue
+                if future.running() or future.set_running_or_notify_cancel():
+                    future.set_exception(error)
+
+    def _commit(self, batch):
+        claims = [claim for claim, _ in batch]
+        try:
+            results, states = self._apply(claims)
+        except Exception as e:
+            log.warning('Check-in batch failed', extra={'claims': len(claims), 'error': str(e)})
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        self.batches += 1
+        self.claims += len(claims)
+        self.largest_batch = max(self.largest_batch, len(claims))
+        if states and self.on_change:
+            try:
+                self.on_change(states)
+            except Exception as e:
+                log.error('Check-in change callback failed', extra={'error': str(e)})
+        log.debug('Check-in batch committed', extra={'claims': len(claims), 'applied': len(states)})
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    def _apply(self, claims):
+        conn = self.connect()
+        try:
+            cursor = conn.cursor()
+            cursor.execute('BEGIN IMMEDIATE')
+            results = []
+            states = {}
+            for member_id, check_in, gate in claims:
+                if check_in:
+                    cursor.execute('''
+                        UPDATE members
+                        SET checked_in = TRUE, check_in_time = CURRENT_TIMESTAMP, check_in_gate = ?
+                        WHERE member_id = ? AND NOT checked_in
+                    ''', (gate, member_id))
+                else:
+                    cursor.execute('''
+                        UPDATE members
+                        SET checked_in = FALSE, check_in_time = NULL, check_in_gate = NULL
+                        WHERE member_id = ? AND checked_in
+                    ''', (member_id,))
+                applied = cursor.rowcount == 1
+                # The state as this claim left (or found) it
+                cursor.execute('SELECT checked_in, check_in_time FROM members WHERE member_id = ?', (member_id,))
+                checked_in, check_in_time = cursor.fetchone() or (None, None)
+                if applied:
+                    states[member_id] = (bool(checked_in), check_in_time)
+                results.append({
+                    'applied': applied,
+                    'checked_in': None if checked_in is None else bool(checked_in),
+                    'check_in_time': check_in_time
+                })
+
+            if states and self.replicator:
+                self.replicator.log_members(cursor, list(states))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+        return results, states
@@ -0,0 +1,109 @@
+"""
+Compact valid-code manifest for scanner devices
+
+Scanners download the sorted list of 24-bit hashes of every member's QR
+code (3 bytes per member) and reject a scanned code locally when its hash
+is not in the list, so a wrong or foreign QR never costs a round trip.
+A hit only means "plausible": the code still goes to /api/verify-qr.
+
+The hashes are deliberately short. With a few thousand members about one
+random code in several thousand passes the filter, which is plenty to
+stop wrong QRs but leaves hundreds of thousands of candidate tokens per
+member, so the public manifest cannot be used to recover valid codes.
+
+The manifest is derived from the member snapshot. Each change to the set
+of codes gets a new version, and the recent changes are kept so a
+scanner that is a few versions behind downloads only the added and
+removed hashes.
+"""
+
+import base64
+import os
+import threading
+
+HASH_BITS = 24
+HASH_BYTES = HASH_BITS // 8
+
+
+def code_hash(code):
+    """24-bit hash of a QR payload; mirrored in static/js/code-manifest.js"""
+    # FNV-1a over the UTF-8 bytes, then the murmur3 finalizer to mix the bits
+    h = 0x811c9dc5
+    for byte in code.encode('utf-8'):
+        h = ((h ^ byte) * 0x01000193) & 0xffffffff
+    h ^= h >> 16
+    h = (h * 0x85ebca6b) & 0xffffffff
+    h ^= h >> 13
+    h = (h * 0xc2b2ae35) & 0xffffffff
+    h ^= h >> 16
+    return h >> (32 - HASH_BITS)
+
+
+def pack(hashes):
+    """Sorted hashes as base64 of fixed-width big-endian entries"""
+    return base64.b64encode(b''.join(h.to_bytes(HASH_BYTES, 'big') for h in sorted(hashes))).decode()
+
+
+class CodeManifest:
+    def __init__(self, snapshot, history=20):
+        self.snapshot = snapshot
+        self.epoch = os.urandom(4).hex()
+        self.version = 0
+        self.history = history
+        self._hashes = frozenset()
+        self._packed = pack(())
+        self._changes = []
+        self._rebuild = None
+        self._lock = threading.Lock()
+
+    @property
+    def tag(self):
+        return f'{self.epoch}-{self.version}'
+
+    def current(self):
+        """Refresh from the snapshot; returns the current version tag"""
+        rebuild, codes = self.snapshot.codes()
+        with self._lock:
+            if rebuild != self._rebuild:
+                self._rebuild = rebuild
+                hashes = frozenset(code_hash(code) for code in codes if code)
+                if hashes != self._hashes or not self.version:
+                    added, removed = hashes - self._hashes, self._hashes - hashes
+                    self._hashes = hashes
+                    self._packed = pack(hashes)
+                    self.version += 1
+                    self._changes.append((self.version, added, removed))
+                    del self._changes[:-self.history]
+            return self.tag
+
+    def payload(self, since=None):
+        """Full manifest, or only the changes after the version tag ``since``"""
+        tag = self.current()
+        with self._lock:
+            base = {'version': tag, 'hash_bits': HASH_BITS, 'count': len(self._hashes)}
+            delta = self._delta(since)
+            if delta is None:
+                return {**base, 'full': True, 'hashes': self._packed}
+            added, removed = delta
+            return {**base, 'full': False, 'since': since, 'added': pack(added), 'removed': pack(removed)}
+
+    def contains(self, code):
+        """Whether the code would pass the scanners' local check"""
+        self.current()
+        return code_hash(code) in self._hashes
+
+    def _delta(self, since):
+        # (added, removed) since the version tag, or None when the caller has
+        # to take the full list (restart, unknown or too old a version)
+        epoch, _, version = (since or '').partition('-')
+        if epoch != self.epoch or not version.isdigit() or not 0 < int(version) <= self.version:
+            return None
+        version = int(version)
+        newer = [change for change in self._changes if change[0] > version]
+        if len(newer) != self.version - version:
+            return None
+        # Walk the recorded changes backwards to the set the caller holds
+        hashes = set(self._hashes)
+        for _, added, removed in reversed(newer):
+            hashes = (hashes - added) | removed
+        return self._hashes - hashes, hashes - self._hashes
@@ -6,13 +6,19 @@ import os
 
 class Config:
     # Database
-    DATABASE_URL = 'aga_attendance.db'
+    DATABASE_URL = os.getenv('DATABASE_URL', 'aga_attendance.db')
     
     # Email settings (configure these for email sending)
     SMTP_SERVER = os.getenv('SMTP_SERVER', 'smtp.gmail.com')
     SMTP_PORT = int(os.getenv('SMTP_PORT', '587'))
     SMTP_USERNAME = os.getenv('SMTP_USERNAME', '')
     SMTP_PASSWORD = os.getenv('SMTP_PASSWORD', '')
+    SMTP_USE_TLS = os.getenv('SMTP_USE_TLS', 'true').lower() != 'false'
+    
+    # Invitation outbox retries (exponential backoff between attempts)
+    EMAIL_MAX_ATTEMPTS = int(os.getenv('EMAIL_MAX_ATTEMPTS', '5'))
+    EMAIL_RETRY_BASE_SECONDS = float(os.getenv('EMAIL_RETRY_BASE_SECONDS', '30'))
+    EMAIL_RETRY_MAX_SECONDS = float(os.getenv('EMAIL_RETRY_MAX_SECONDS', '3600'))
     
     # Event details
     EVENT_NAME = "TIPCS AGA25"
@@ -20,13 +26,81 @@ class Config:
     EVENT_TIME = "08:00"
     EVENT_VENUE = "Hotel Delphin El Habib, Monastir"
     
+    # Two-node check-in replication (disabled unless a token is set)
+    NODE_ID = os.getenv('NODE_ID', 'node-1')
+    REPLICATION_PEER_URL = os.getenv('REPLICATION_PEER_URL', '')
+    REPLICATION_TOKEN = os.getenv('REPLICATION_TOKEN', '')
+    REPLICATION_INTERVAL_SECONDS = float(os.getenv('REPLICATION_INTERVAL_SECONDS', '2'))
+    
+    # Rate limits per scanner device/IP (requests per second, burst size)
+    # and for all scanners together on the verification endpoint
+    VERIFY_RATE_PER_SECOND = float(os.getenv('VERIFY_RATE_PER_SECOND', '5'))
+    VERIFY_BURST = int(os.getenv('VERIFY_BURST', '10'))
+    VERIFY_GLOBAL_RATE_PER_SECOND = float(os.getenv('VERIFY_GLOBAL_RATE_PER_SECOND', '200'))
+    LISTING_RATE_PER_SECOND = float(os.getenv('LISTING_RATE_PER_SECOND', '0.5'))
+    LISTING_BURST = int(os.getenv('LISTING_BURST', '5'))
+    # Device ids are client-chosen: each IP address gets the budget of this
+    # many devices, however many ids it sends
+    RATE_LIMIT_DEVICES_PER_IP = int(os.getenv('RATE_LIMIT_DEVICES_PER_IP', '10'))
+    # Reverse proxies in front of the app (Railway, Heroku, nginx): trust
+    # this many X-Forwarded-For hops for the client address (0: none)
+    PROXY_FIX_X_FOR = int(os.getenv('PROXY_FIX_X_FOR', '0'))
+    
+    # Group commit of check-ins: claims applied per transaction, and how
+    # long the writer waits for more after the first (0: only what queued)
+    CHECKIN_BATCH_SIZE = int(os.getenv('CHECKIN_BATCH_SIZE', '64'))
+    CHECKIN_BATCH_WAIT_MS = float(os.getenv('CHECKIN_BATCH_WAIT_MS', '2'))
+    # Longest a request waits for its check-in to commit before answering
+    # 503 "please scan again"
+    CHECKIN_COMMIT_TIMEOUT_SECONDS = float(os.getenv('CHECKIN_COMMIT_TIMEOUT_SECONDS', '10'))
+    # How often the member listings check whether another process (e.g.
+    # `manage.py import`) changed the members table
+    MEMBERS_RECHECK_SECONDS = float(os.getenv('MEMBERS_RECHECK_SECONDS', '1'))
+    
+    # Scanner latency telemetry: rolling window of samples per gate
+    TELEMETRY_WINDOW_SECONDS = float(os.getenv('TELEMETRY_WINDOW_SECONDS', '900'))
+    
+    # Import duplicate detection: keys that identify the same person
+    # (email, phone, name) and how duplicates are merged (fill, first, last).
+    # name is off by default: two attendees can share a name, and merging
+    # them would leave one without a QR code
+    DEDUPE_MATCH_ON = [k.strip() for k in os.getenv('DEDUPE_MATCH_ON', 'email,phone').split(',') if k.strip()]
+    DEDUPE_MERGE_RULE = os.getenv('DEDUPE_MERGE_RULE', 'fill')
+    DEFAULT_PHONE_COUNTRY_CODE = os.getenv('DEFAULT_PHONE_COUNTRY_CODE', '216')
+    
+    # Structured logging: default level and per-subsystem overrides
+    # (import, email, verify, replication, maintenance), e.g. "email=DEBUG,verify=WARNING"
+    LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
+    LOG_LEVELS = os.getenv('LOG_LEVELS', '')
+    
+    # Online backups of the live database (0 disables) into rotating
+    # snapshot files, and passive WAL checkpoints between them
+    BACKUP_DIR = os.getenv('BACKUP_DIR', 'backups')
+    BACKUP_INTERVAL_SECONDS = float(os.getenv('BACKUP_INTERVAL_SECONDS', '300'))
+    BACKUP_KEEP = int(os.getenv('BACKUP_KEEP', '12'))
+    BACKUP_PAGES_PER_STEP = int(os.getenv('BACKUP_PAGES_PER_STEP', '100'))
+    BACKUP_STEP_PAUSE_SECONDS = float(os.getenv('BACKUP_STEP_PAUSE_SECONDS', '0.005'))
+    CHECKPOINT_INTERVAL_SECONDS = float(os.getenv('CHECKPOINT_INTERVAL_SECONDS', '30'))
+    
+    # Sampled request profiling (switched on from the admin panel)
+    PROFILE_DIR = os.getenv('PROFILE_DIR', 'profiles')
+    PROFILE_SAMPLE_RATE = float(os.getenv('PROFILE_SAMPLE_RATE', '0.1'))
+    PROFILE_MAX_FILES = int(os.getenv('PROFILE_MAX_FILES', '200'))
+    
     # QR Code settings
     QR_CODE_SIZE = 10
     QR_CODE_BORDER = 4
+    # Pre-rendered member QR images (python manage.py render-qr)
+    QR_CACHE_DIR = os.getenv('QR_CACHE_DIR', 'qr_cache')
     
     # Security
     SECRET_KEY = os.getenv('SECRET_KEY', 'your-secret-key-change-this')
     
-    # WhatsApp settings (for future WhatsApp integration)
+    # WhatsApp Cloud API invitations; the URL includes the sender's
+    # phone number id, e.g. https://graph.facebook.com/v19.0/<id>
     WHATSAPP_API_URL = os.getenv('WHATSAPP_API_URL', '')
     WHATSAPP_ACCESS_TOKEN = os.getenv('WHATSAPP_ACCESS_TOKEN', '')
+    WHATSAPP_TEMPLATE_NAME = os.getenv('WHATSAPP_TEMPLATE_NAME', 'aga_invitation')
+    WHATSAPP_TEMPLATE_LANGUAGE = os.getenv('WHATSAPP_TEMPLATE_LANGUAGE', 'en')
+    WHATSAPP_RATE_PER_SECOND = float(os.getenv('WHATSAPP_RATE_PER_SECOND', '20'))
+    WHATSAPP_CONCURRENCY = int(os.getenv('WHATSAPP_CONCURRENCY', '8'))
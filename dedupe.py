@@ -0,0 +1,152 @@
+"""
+Duplicate-member detection for CSV imports
+
+Each member gets normalized keys (email, E.164 phone, accent-folded name)
+held in hash indexes, so every incoming row is checked against the batch
+so far and the existing table in O(1).
+"""
+
+import re
+import unicodedata
+from config import Config
+
+MERGE_FIELDS = ('full_name', 'email', 'phone')
+
+
+def normalize_email(email):
+    """Lowercased, trimmed email address"""
+    return (email or '').strip().lower()
+
+
+def normalize_phone(phone, country_code=None):
+    """Phone number in E.164 form (+<country><number>), '' if unusable"""
+    country_code = country_code or Config.DEFAULT_PHONE_COUNTRY_CODE
+    raw = str(phone or '').strip()
+    if raw.endswith('.0'):
+        # Numbers read back from spreadsheets as floats
+        raw = raw[:-2]
+
+    digits = re.sub(r'\D', '', raw)
+    if not digits:
+        return ''
+
+    if raw.startswith('+'):
+        return '+' + digits
+    if digits.startswith('00'):
+        return '+' + digits[2:]
+    if digits.startswith(country_code) and len(digits) >= len(country_code) + 8:
+        return '+' + digits
+    return '+' + country_code + digits.lstrip('0')
+
+
+def normalize_name(name):
+    """Case- and accent-folded name with collapsed whitespace"""
+    folded = unicodedata.normalize('NFKD', name or '')
+    folded = ''.join(c for c in folded if not unicodedata.combining(c))
+    folded = re.sub(r'[^\w\s]', ' ', folded.casefold())
+    return ' '.join(folded.split())
+
+
+KEY_FUNCTIONS = {
+    'email': lambda member: normalize_email(member.get('email')),
+    'phone': lambda member: normalize_phone(member.get('phone')),
+    'name': lambda member: normalize_name(member.get('full_name')),
+}
+
+
+class DuplicateIndex:
+    """Hash indexes from each normalized key to the member that owns it"""
+
+    def __init__(self, match_on):
+        self.match_on = [kind for kind in match_on if kind in KEY_FUNCTIONS]
+        self.indexes = {kind: {} for kind in self.match_on}
+
+    def add(self, member):
+        for kind in self.match_on:
+            key = KEY_FUNCTIONS[kind](member)
+            if key:
+                self.indexes[kind].setdefault(key, member)
+
+    def find(self, member):
+        """Return (matching member, key kind) or (None, None)"""
+        for kind in self.match_on:
+            key = KEY_FUNCTIONS[kind](member)
+            if key and key in self.indexes[kind]:
+                return self.indexes[kind][key], kind
+        return None, None
+
+
+def merge_member(kept, duplicate, rule):
+    """Fold a duplicate's fields into the kept record according to rule.
+
+    'first' keeps the first record untouched, 'fill' copies fields that
+    are empty on the first record, 'last' lets the later submission win.
+    """
+    for field in MERGE_FIELDS:
+        value = (duplicate.get(field) or '').strip()
+        if not value:
+            continue
+        if rule == 'last' or (rule == 'fill' and not (kept.get(field) or '').strip()):
+            kept[field] = value
+
+
+def deduplicate_members(incoming, existing=(), match_on=None, merge_rule=None):
+    """Collapse duplicates within incoming and against existing members.
+
+    Returns (members, report): the records to save, where duplicates have
+    been merged into the member they match (keeping that member's QR
+    code), and one report entry per merged row.
+    """
+    match_on = match_on or Config.DEDUPE_MATCH_ON
+    merge_rule = merge_rule or Config.DEDUPE_MERGE_RULE
+
+    index = DuplicateIndex(match_on)
+    existing_by_id = {}
+    for member in existing:
+        member = dict(member, source='existing')
+        existing_by_id[str(member['member_id'])] = member
+        index.add(member)
+
+    members = []
+    touched_existing = {}
+    report = []
+
+    for row_number, member in enumerate(incoming, start=1):
+        member_id = str(member['member_id'])
+
+        # Re-importing a known member is an update, not a duplicate
+        if member_id in existing_by_id:
+            current = existing_by_id[member_id]
+            for field in MERGE_FIELDS:
+                if (member.get(field) or '').strip():
+                    current[field] = member[field]
+            touched_existing[member_id] = current
+            index.add(current)
+            continue
+
+        match, kind = index.find(member)
+        if match is None:
+            member = dict(member, source='import')
+            members.append(member)
+            index.add(member)
+            continue
+
+        merge_member(match, member, merge_rule)
+        if match['source'] == 'existing':
+            touched_existing[str(match['member_id'])] = match
+        index.add(match)
+        report.append({
+            'row': row_number,
+            'member_id': member_id,
+            'full_name': member.get('full_name', ''),
+            'email': member.get('email', ''),
+            'matched_on': kind,
+            'merged_into': str(match['member_id']),
+            'merged_into_name': match.get('full_name', ''),
+            'source': match['source']
+        })
+
+    members.extend(touched_existing.values())
+    for member in members:
+        member.pop('source', None)
+    return members, report
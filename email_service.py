@@ -2,13 +2,24 @@
 Email service for sending QR code invitations
 """
 
+import math
 import smtplib
+from contextlib import contextmanager
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 from email.mime.image import MIMEImage
+from email.utils import make_msgid
 from io import BytesIO
 import qrcode
 from config import Config
+from structured_logging import get_logger
+
+log = get_logger('email')
+
+def base64_length(size):
+    """Bytes a payload of this size takes in a base64 MIME part (76-char lines)"""
+    encoded = 4 * math.ceil(size / 3)
+    return encoded + math.ceil(encoded / 76)
 
 class EmailService:
     def __init__(self):
@@ -16,9 +27,11 @@ class EmailService:
         self.smtp_port = Config.SMTP_PORT
         self.username = Config.SMTP_USERNAME
         self.password = Config.SMTP_PASSWORD
+        self.use_tls = Config.SMTP_USE_TLS
+        self._qr_saving = None
     
     def generate_qr_code_image(self, qr_data, member_name):
-        """Generate QR code image"""
+        """Generate a 1-bit QR code image with the member's name under it"""
         qr = qrcode.QRCode(
             version=1,
             error_correction=qrcode.constants.ERROR_CORRECT_L,
@@ -30,9 +43,10 @@ class EmailService:
         
         img = qr.make_image(fill_color="black", back_color="white")
         
-        # Add member name to image
+        # Add member name to image; drawing stays black and white so the
+        # PNG can be stored at one bit per pixel
         from PIL import Image, ImageDraw, ImageFont
-        img = img.convert('RGB')
+        img = img.convert('1')
         draw = ImageDraw.Draw(img)
         
         try:
@@ -49,12 +63,26 @@ class EmailService:
         x = (img_width - text_width) // 2
         y = img_height - text_height - 10
         
-        draw.text((x, y), text, fill="black", font=font)
+        draw.text((x, y), text, fill=0, font=font)
         
         return img
     
-    def create_email_content(self, member_name, qr_data):
+    @staticmethod
+    def encode_png(img):
+        """Encode an image as an optimized PNG (1-bit for QR codes)"""
+        buffer = BytesIO()
+        img.save(buffer, format='PNG', optimize=True)
+        return buffer.getvalue()
+    
+    def create_email_content(self, member_name, qr_data, qr_cid=None, qr_size=None):
         """Create modern HTML invitation email content"""
+        if qr_cid:
+            width, height = qr_size
+            qr_block = (f'<img src="cid:{qr_cid}" alt="QR access code" width="{width}" height="{height}" '
+                        f'style="display: block; max-width: 100%; height: auto;">')
+        else:
+            qr_block = '<p style="margin: 0; color: #999; font-style: italic; font-size: 13px;">(QR code attached as image)</p>'
+        
         html_content = f"""
         <!DOCTYPE html>
         <html>
@@ -76,7 +104,7 @@ class EmailService:
               <h2 style="font-size: 20px; color: #333;">Dear {member_name},</h2>
               <p style="font-size: 16px; color: #555; line-height: 1.6;">
                 We are delighted to confirm your successful registration for <strong>{Config.EVENT_NAME}</strong>.<br>
-                Please find your personal QR access code attached below. You’ll need to present it upon arrival for entry verification.
+                Please find your personal QR access code below. You’ll need to present it upon arrival for entry verification.
               </p>
 
               <div style="margin: 25px 0; background-color: #f8f9fa; border-left: 4px solid #007bff; padding: 15px 20px; border-radius: 8px;">
@@ -92,7 +120,7 @@ class EmailService:
                 <h3 style="font-size: 18px; color: #333;">🎫 Your QR Access Code</h3>
                 <p style="color: #777; font-size: 14px;">Please present this code at the entrance for identification.</p>
                 <div style="margin: 20px auto; border: 2px dashed #007bff; padding: 25px; border-radius: 10px; width: fit-content; background: #ffffff;">
-                  <p style="margin: 0; color: #999; font-style: italic; font-size: 13px;">(QR code attached as image)</p>
+                  {qr_block}
                 </div>
               </div>
 
@@ -129,57 +157,145 @@ class EmailService:
         """
         return html_content
     
+    @staticmethod
+    def serialize(msg):
+        """Wire form of a message, as SMTP DATA expects it (CRLF line ends)"""
+        return msg.as_bytes(policy=msg.policy.clone(linesep='\r\n'))
+    
+    def qr_saving_estimate(self):
+        """Bytes one invitation saves by carrying its QR code as a 1-bit PNG.
+        
+        Measured once on a sample code against the 24-bit RGB PNG
+        invitations used to carry, and reused for every message after.
+        """
+        if self._qr_saving is None:
+            img = self.generate_qr_code_image('AGA-0-00000000', 'Sample Member')
+            rgb_png = len(self.encode_png(img.convert('RGB')))
+            self._qr_saving = base64_length(rgb_png) - base64_length(len(self.encode_png(img)))
+        return self._qr_saving
+    
+    def build_invitation(self, member_name, email, qr_data):
+        """Build the MIME message for an invitation and its size report.
+        
+        The QR code is embedded inline (multipart/related, referenced by
+        Content-ID from the HTML) as a 1-bit PNG. deliver_invitation()
+        adds the size of the message as sent.
+        """
+        qr_img = self.generate_qr_code_image(qr_data, member_name)
+        qr_png = self.encode_png(qr_img)
+        qr_cid = make_msgid(idstring='qr', domain='invitation.local')[1:-1]
+        
+        msg = MIMEMultipart('related')
+        msg['From'] = self.username
+        msg['To'] = email
+        msg['Subject'] = f"🎟️ Your Access Pass – {Config.EVENT_NAME}"
+        
+        html_content = self.create_email_content(member_name, qr_data, qr_cid, qr_img.size)
+        msg.attach(MIMEText(html_content, 'html'))
+        
+        qr_part = MIMEImage(qr_png, 'png')
+        qr_part.add_header('Content-ID', f'<{qr_cid}>')
+        qr_part.add_header('Content-Disposition', 'inline', filename=f'qr-code-{member_name.replace(" ", "-")}.png')
+        msg.attach(qr_part)
+        
+        return msg, {'qr_png_bytes': len(qr_png)}
+    
+    def build_invitation_message(self, member_name, email, qr_data):
+        """Build the MIME message for an invitation"""
+        return self.build_invitation(member_name, email, qr_data)[0]
+    
+    def connect(self):
+        """Open a logged-in SMTP connection"""
+        server = smtplib.SMTP(self.smtp_server, self.smtp_port)
+        try:
+            if self.use_tls:
+                server.starttls()
+            server.login(self.username, self.password)
+        except Exception:
+            server.close()
+            raise
+        return server
+    
+    @staticmethod
+    def disconnect(server):
+        try:
+            server.quit()
+        except smtplib.SMTPException:
+            server.close()
+    
+    @contextmanager
+    def session(self):
+        """One SMTP connection shared by several deliveries"""
+        server = self.connect()
+        try:
+            yield server
+        finally:
+            self.disconnect(server)
+    
+    def deliver_invitation(self, member_name, email, qr_data, connection=None):
+        """Build and send an invitation, raising on any SMTP error.
+        
+        Sends over ``connection`` (see session()) when given, otherwise
+        over a connection of its own. Returns the message size report.
+        """
+        msg, report = self.build_invitation(member_name, email, qr_data)
+        # Serialized once; the size reported is what SMTP was handed
+        data = self.serialize(msg)
+        report['message_bytes'] = len(data)
+        
+        if connection is not None:
+            connection.sendmail(msg['From'], [email], data)
+            return report
+        
+        server = self.connect()
+        try:
+            server.sendmail(msg['From'], [email], data)
+        finally:
+            self.disconnect(server)
+        return report
+    
     def send_invitation(self, member_name, email, qr_data):
         """Send invitation email with QR code"""
         if not self.username or not self.password:
             return False, "Email credentials not configured"
         
         try:
-            msg = MIMEMultipart('alternative')
-            msg['From'] = self.username
-            msg['To'] = email
-            msg['Subject'] = f"🎟️ Your Access Pass – {Config.EVENT_NAME}"
-            
-            html_content = self.create_email_content(member_name, qr_data)
-            html_part = MIMEText(html_content, 'html')
-            msg.attach(html_part)
-            
-            # Generate and attach QR code
-            qr_img = self.generate_qr_code_image(qr_data, member_name)
-            img_buffer = BytesIO()
-            qr_img.save(img_buffer, format='PNG')
-            img_buffer.seek(0)
-            
-            img_attachment = MIMEImage(img_buffer.read())
-            img_attachment.add_header('Content-Disposition', 'attachment', filename=f'qr-code-{member_name.replace(" ", "-")}.png')
-            msg.attach(img_attachment)
-            
-            # Send via SMTP
-            server = smtplib.SMTP(self.smtp_server, self.smtp_port)
-            server.starttls()
-            server.login(self.username, self.password)
-            server.send_message(msg)
-            server.quit()
-            
+            self.deliver_invitation(member_name, email, qr_data)
             return True, "Email sent successfully"
             
         except Exception as e:
             return False, f"Error sending email: {str(e)}"
     
+    @staticmethod
+    def is_transient_error(error):
+        """Tell whether an SMTP failure is worth retrying later"""
+        if isinstance(error, smtplib.SMTPRecipientsRefused):
+            codes = [code for code, _ in error.recipients.values()]
+            return bool(codes) and all(400 <= code < 500 for code in codes)
+        if isinstance(error, smtplib.SMTPResponseException):
+            return 400 <= error.smtp_code < 500
+        if isinstance(error, smtplib.SMTPServerDisconnected):
+            return True
+        if isinstance(error, smtplib.SMTPException):
+            return False
+        # Connection refused, timeouts and DNS hiccups
+        return isinstance(error, OSError)
+    
     def send_bulk_invitations(self, members, batch_size=10, delay_seconds=1):
         """Send invitations to multiple members with rate limiting"""
         import time
         results = []
         total_members = len(members)
         
-        print(f"Starting bulk email sending for {total_members} members")
+        log.info('Bulk email sending started', extra={'total': total_members})
         
         for i, member in enumerate(members):
-            print(f"Processing member {i+1}/{total_members}: {member.get('full_name', 'Unknown')}")
+            log.debug('Processing member', extra={'index': i + 1, 'total': total_members,
+                                                  'member': member.get('full_name', 'Unknown')})
             
             # Check if member has required fields
             if not member.get('email'):
-                print(f"No email for {member.get('full_name', 'Unknown')}")
+                log.warning('No email address', extra={'member': member.get('full_name', 'Unknown')})
                 results.append({
                     'member': member.get('full_name', 'Unknown'),
                     'email': member.get('email', 'No email'),
@@ -189,7 +305,7 @@ class EmailService:
                 continue
                 
             if not member.get('qr_code'):
-                print(f"No QR code for {member.get('full_name', 'Unknown')}")
+                log.warning('No QR code', extra={'member': member.get('full_name', 'Unknown')})
                 results.append({
                     'member': member.get('full_name', 'Unknown'),
                     'email': member.get('email', 'No email'),
@@ -204,7 +320,10 @@ class EmailService:
                     member['email'],
                     member['qr_code']
                 )
-                print(f"Email result for {member['full_name']}: {success} - {message}")
+                (log.info if success else log.warning)('Invitation email result', extra={
+                    'member': member['full_name'], 'email': member['email'],
+                    'success': success, 'detail': message
+                })
                 results.append({
                     'member': member['full_name'],
                     'email': member['email'],
@@ -212,7 +331,7 @@ class EmailService:
                     'message': message
                 })
             except Exception as e:
-                print(f"Error sending email to {member['full_name']}: {str(e)}")
+                log.exception('Error sending invitation email', extra={'member': member['full_name']})
                 results.append({
                     'member': member['full_name'],
                     'email': member['email'],
@@ -222,10 +341,12 @@ class EmailService:
             
             # Rate limiting: pause after every batch_size emails
             if (i + 1) % batch_size == 0 and i < total_members - 1:
-                print(f"Batch {i+1} completed, pausing for {delay_seconds} seconds...")
+                log.debug('Batch completed, pausing', extra={'sent': i + 1, 'pause_seconds': delay_seconds})
                 time.sleep(delay_seconds)
         
-        print(f"Bulk email sending completed. Results: {len(results)}")
+        log.info('Bulk email sending completed', extra={
+            'total': len(results), 'successful': sum(1 for r in results if r['success'])
+        })
         return results
     
     def send_single_invitation(self, member_id, member_name, email, qr_data):
@@ -241,9 +362,16 @@ class EmailService:
         successful = len([r for r in results if r['success']])
         failed = total - successful
         
-        return {
+        stats = {
             'total': total,
             'successful': successful,
             'failed': failed,
             'success_rate': (successful / total * 100) if total > 0 else 0
         }
+        
+        sizes = [r['size'] for r in results if r.get('size')]
+        if sizes:
+            stats['message_bytes'] = sum(size['message_bytes'] for size in sizes)
+            # Estimate: the saving measured on one sample code, per message
+            stats['saved_bytes'] = len(sizes) * self.qr_saving_estimate()
+        return stats
@@ -0,0 +1,184 @@
+"""
+Online backups and WAL checkpoints during the event
+
+A background thread copies the live database into timestamped snapshot
+files with SQLite's online backup API and keeps the newest few. The copy
+runs in small page steps with a pause between them, from one read
+snapshot, so it is consistent without ever locking out the check-in
+writer: in WAL mode readers and the writer do not block each other.
+Between backups the thread runs passive WAL checkpoints, which copy what
+they can into the main file and never wait on a reader or the writer.
+
+start_worker() switches the database to WAL; without it an open read
+snapshot would block commits, so in rollback-journal mode every step
+takes its own short read lock instead (and a backup restarts if a write
+lands between steps).
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from structured_logging import get_logger
+
+log = get_logger('maintenance')
+
+
+class DatabaseMaintenance:
+    def __init__(self, connect, source, backup_dir='backups', backup_interval_seconds=300, keep=12,
+                 pages_per_step=100, step_pause_seconds=0.005, checkpoint_interval_seconds=30):
+        self.connect = connect
+        # Path of the live database, used to name the snapshots
+        self.source = source
+        self.backup_dir = backup_dir
+        self.backup_interval_seconds = backup_interval_seconds
+        self.keep = keep
+        self.pages_per_step = pages_per_step
+        self.step_pause_seconds = step_pause_seconds
+        self.checkpoint_interval_seconds = checkpoint_interval_seconds
+        self.last_backup = None
+        self.last_checkpoint = None
+        self._worker = None
+        self._stop = threading.Event()
+        self._backup_lock = threading.Lock()
+
+    def enable_wal(self):
+        """Switch the database to WAL (persistent); returns the journal mode"""
+        conn = self.connect()
+        try:
+            return conn.execute('PRAGMA journal_mode=WAL').fetchone()[0]
+        finally:
+            conn.close()
+
+    def backup_once(self):
+        """Copy the live database to a new snapshot file and prune old ones"""
+        with self._backup_lock:
+            os.makedirs(self.backup_dir, exist_ok=True)
+            stem = os.path.splitext(os.path.basename(self.source()))[0]
+            path = os.path.join(self.backup_dir, f"{stem}-{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}.db")
+            partial = path + '.partial'
+            progress = {'steps': 0, 'pages': 0}
+
+            def step(status, remaining, total):
+                progress['steps'] += 1
+                progress['pages'] = total
+                # Let the writer and request threads run between steps
+                time.sleep(self.step_pause_seconds)
+
+            start = time.perf_counter()
+            source = self.connect()
+            target = sqlite3.connect(partial)
+            try:
+                wal = source.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+                if wal:
+                    # One read snapshot for the whole copy: consistent, and in
+                    # WAL mode it does not hold up commits
+                    source.execute('BEGIN')
+                    source.execute('SELECT COUNT(*) FROM sqlite_master').fetchone()
+                source.backup(target, pages=self.pages_per_step, progress=step)
+                if wal:
+                    source.rollback()
+                target.close()
+                # Only complete snapshots ever carry the final name
+                os.replace(partial, path)
+            except Exception:
+                target.close()
+                if os.path.exists(partial):
+                    os.remove(partial)
+                raise
+            finally:
+                source.close()
+
+            self.last_backup = {
+                'path': path,
+                'pages': progress['pages'],
+                'steps': progress['steps'],
+                'bytes': os.path.getsize(path),
+                'duration_ms': round((time.perf_counter() - start) * 1000, 1),
+                'finished_at': datetime.now().isoformat(timespec='seconds')
+            }
+            removed = self.rotate()
+            log.info('Database backup written', extra={**self.last_backup, 'pruned': len(removed)})
+            return self.last_backup
+
+    def checkpoint(self):
+        """Passive WAL checkpoint; never waits on readers or the writer"""
+        conn = self.connect()
+        try:
+            busy, wal_pages, checkpointed = conn.execute('PRAGMA wal_checkpoint(PASSIVE)').fetchone()
+        finally:
+            conn.close()
+        self.last_checkpoint = {
+            'busy': bool(busy),
+            'wal_pages': wal_pages,
+            'checkpointed': checkpointed,
+            'finished_at': datetime.now().isoformat(timespec='seconds')
+        }
+        log.debug('WAL checkpoint', extra=self.last_checkpoint)
+        return self.last_checkpoint
+
+    def snapshots(self):
+        """Snapshot files, newest first"""
+        if not os.path.isdir(self.backup_dir):
+            return []
+        stem = os.path.splitext(os.path.basename(self.source()))[0]
+        names = [name for name in os.listdir(self.backup_dir)
+                 if name.startswith(f'{stem}-') and name.endswith('.db')]
+        return [os.path.join(self.backup_dir, name) for name in sorted(names, reverse=True)]
+
+    def rotate(self):
+        """Delete all but the newest ``keep`` snapshots; returns the removed paths"""
+        removed = self.snapshots()[self.keep:]
+        for path in removed:
+            os.remove(path)
+        return removed
+
+    def status(self):
+        return {
+            'running': bool(self._worker and self._worker.is_alive()),
+            'backup_interval_seconds': self.backup_interval_seconds,
+            'checkpoint_interval_seconds': self.checkpoint_interval_seconds,
+            'keep': self.keep,
+            'last_backup': self.last_backup,
+            'last_checkpoint': self.last_checkpoint,
+            'snapshots': [os.path.basename(path) for path in self.snapshots()]
+        }
+
+    def start_worker(self):
+        """Switch to WAL and start backing up and checkpointing in the background"""
+        if self._worker and self._worker.is_alive():
+            return
+        if not self.backup_interval_seconds and not self.checkpoint_interval_seconds:
+            return
+        mode = self.enable_wal()
+        if mode != 'wal':
+            log.warning('Database could not be switched to WAL', extra={'journal_mode': mode})
+        self._stop.clear()
+        self._worker = threading.Thread(target=self._run, name='db-maintenance', daemon=True)
+        self._worker.start()
+
+    def stop_worker(self):
+        self._stop.set()
+        if self._worker:
+            self._worker.join()
+
+    def _run(self):
+        intervals = [interval for interval in (self.backup_interval_seconds, self.checkpoint_interval_seconds)
+                     if interval]
+        now = time.monotonic()
+        next_backup = now + (self.backup_interval_seconds or float('inf'))
+        next_checkpoint = now + (self.checkpoint_interval_seconds or float('inf'))
+        while not self._stop.wait(min(intervals)):
+            if time.monotonic() >= next_checkpoint:
+                next_checkpoint = time.monotonic() + self.checkpoint_interval_seconds
+                try:
+                    self.checkpoint()
+                except Exception as e:
+                    log.warning('WAL checkpoint failed', extra={'error': str(e)})
+            if time.monotonic() >= next_backup:
+                next_backup = time.monotonic() + self.backup_interval_seconds
+                try:
+                    self.backup_once()
+                except Exception as e:
+                    log.error('Database backup failed', extra={'error': str(e)})
@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+"""
+Event-preparation command line
+
+Runs the heavy, offline jobs against the attendance database outside the
+web process, so the night-before preparation neither competes with gate
+traffic nor dies with an HTTP request. Built on the same modules as the
+app; every step prints progress and how long it took.
+
+    python manage.py import [--csv FILE] [--dry-run]
+    python manage.py render-qr [--workers N] [--force]
+    python manage.py build-indexes
+    python manage.py optimize
+    python manage.py warm [--url http://localhost:5000]
+    python manage.py backup
+    python manage.py queue-invitations [--send]
+    python manage.py export attendance.csv [--checked-in yes|no] [--from T] [--to T] [--gate G]
+
+Use --db to work on another database file than DATABASE_URL.
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+
+
+@contextmanager
+def step(label):
+    print(f"{label}...", flush=True)
+    start = time.perf_counter()
+    yield
+    print(f"  done in {time.perf_counter() - start:.2f}s", flush=True)
+
+
+def fetch_members(conn, where=''):
+    rows = conn.execute(f'SELECT member_id, full_name, email, phone, qr_code FROM members {where}').fetchall()
+    return [dict(zip(('member_id', 'full_name', 'email', 'phone', 'qr_code'), row)) for row in rows]
+
+
+def read_only_members(path):
+    """Members already in the database, without creating or changing anything"""
+    import urllib.request
+    if not os.path.exists(path):
+        return []
+    conn = sqlite3.connect(f'file:{urllib.request.pathname2url(os.path.abspath(path))}?mode=ro', uri=True)
+    try:
+        return fetch_members(conn)
+    except sqlite3.OperationalError:
+        # No members table yet
+        return []
+    finally:
+        conn.close()
+
+
+def cmd_import(app, args):
+    from dedupe import deduplicate_members
+
+    # A dry run only reads: the schema is created on the real import
+    if not args.dry_run:
+        app.init_db()
+    with step(f"Reading {args.csv}"):
+        members = app.load_members_from_csv(args.csv)
+    if not members:
+        print("No members read; nothing to import")
+        return 1
+
+    with step("Checking duplicates"):
+        existing = read_only_members(app.app.config['DATABASE']) if args.dry_run else app.load_existing_members()
+        members, duplicates = deduplicate_members(members, existing)
+    print(f"  {len(members)} members, {len(duplicates)} duplicate rows merged")
+    for duplicate in duplicates[:20]:
+        print(f"  row {duplicate['row']}: {duplicate['full_name']} -> {duplicate['merged_into_name']} "
+              f"(same {duplicate['matched_on']})")
+    if len(duplicates) > 20:
+        print(f"  ... and {len(duplicates) - 20} more")
+
+    if args.dry_run:
+        print("Dry run: database not changed")
+        return 0
+    with step(f"Saving {len(members)} members"):
+        app.save_members_to_db(members)
+    return 0
+
+
+def render_one(app, member, force):
+    path = app.qr_image_path(member['qr_code'], member['full_name'])
+    if not force and os.path.exists(path):
+        return False
+    # Written aside and renamed, so the server never serves a half-written file
+    partial = f'{path}.{os.getpid()}.tmp'
+    app.generate_qr_code(member['qr_code'], member['full_name']).save(partial, format='PNG')
+    os.replace(partial, path)
+    return True
+
+
+def render_chunk(args):
+    # Runs in a worker process
+    import app
+    members, force = args
+    return sum(render_one(app, member, force) for member in members)
+
+
+def cmd_render_qr(app, args):
+    from config import Config
+
+    conn = app.get_db()
+    members = fetch_members(conn)
+    conn.close()
+    os.makedirs(Config.QR_CACHE_DIR, exist_ok=True)
+
+    workers = args.workers or os.cpu_count() or 1
+    chunk_size = max(1, min(100, len(members) // (workers * 4) or 1))
+    chunks = [(members[i:i + chunk_size], args.force) for i in range(0, len(members), chunk_size)]
+
+    with step(f"Rendering {len(members)} QR images on {workers} processes into {Config.QR_CACHE_DIR}"):
+        rendered = done = 0
+        with ProcessPoolExecutor(workers) as pool:
+            for (chunk, _), count in zip(chunks, pool.map(render_chunk, chunks)):
+                rendered += count
+                done += len(chunk)
+                print(f"  {done}/{len(members)}", end='\r', flush=True)
+        print()
+    print(f"  {rendered} rendered, {len(members) - rendered} already up to date")
+    return 0
+
+
+def cmd_build_indexes(app, args):
+    with step("Creating tables, indexes and pending migrations"):
+        app.init_db()
+    conn = app.get_db()
+    with step("Updating query planner statistics (ANALYZE)"):
+        conn.execute('ANALYZE')
+        conn.commit()
+    indexes = conn.execute(
+        "SELECT name, tbl_name FROM sqlite_master WHERE type = 'index' ORDER BY tbl_name, name"
+    ).fetchall()
+    conn.close()
+    for name, table in indexes:
+        print(f"  {table}: {name}")
+    return 0
+
+
+def cmd_optimize(app, args):
+    path = app.app.config['DATABASE']
+    before = os.path.getsize(path)
+    conn = app.get_db()
+    with step("ANALYZE"):
+        conn.execute('ANALYZE')
+        conn.commit()
+    with step("VACUUM (rewrites the file; keep the web server stopped)"):
+        conn.execute('VACUUM')
+    conn.close()
+    after = os.path.getsize(path)
+    print(f"  {before / 1e6:.1f} MB -> {after / 1e6:.1f} MB")
+    return 0
+
+
+def cmd_warm(app, args):
+    path = app.app.config['DATABASE']
+    with step(f"Reading {path} into the OS page cache"):
+        with open(path, 'rb') as db_file:
+            while db_file.read(1 << 20):
+                pass
+    conn = app.get_db()
+    with step("Walking the QR lookup and member indexes"):
+        # Covered by the unique indexes, so these counts read every index page
+        codes = conn.execute('SELECT COUNT(qr_hash) FROM members').fetchone()[0]
+        conn.execute('SELECT COUNT(member_id) FROM members').fetchone()
+    conn.close()
+    print(f"  {codes} QR codes")
+
+    if args.url:
+        import urllib.request
+        with step(f"Building the listing snapshot on {args.url}"):
+            request = urllib.request.Request(args.url.rstrip('/') + '/api/members', headers={'X-Device-Id': 'manage-warm'})
+            with urllib.request.urlopen(request, timeout=60) as response:
+                size = len(response.read())
+            print(f"  {size / 1024:.0f} KB served")
+    return 0
+
+
+def cmd_backup(app, args):
+    with step(f"Backing up {app.app.config['DATABASE']} into {app.maintenance.backup_dir}"):
+        backup = app.maintenance.backup_once()
+    print(f"  {backup['path']}: {backup['pages']} pages, {backup['bytes'] / 1e6:.1f} MB in {backup['steps']} steps")
+    print(f"  {len(app.maintenance.snapshots())} snapshots kept")
+    return 0
+
+
+def cmd_queue_invitations(app, args):
+    conn = app.get_db()
+    members = fetch_members(conn, "WHERE email != '' AND email IS NOT NULL")
+    conn.close()
+
+    with step(f"Queueing invitations for {len(members)} members with an email address"):
+        app.outbox.enqueue(members)
+    pending = app.outbox.pending()
+    print(f"  {len(pending)} invitations not yet delivered")
+
+    if not args.send:
+        print("The web server's outbox worker delivers them (or run again with --send)")
+        return 0
+
+    sent = failed = 0
+    with step("Delivering due invitations"):
+        while True:
+            results = app.outbox.process_due(limit=50)
+            if not results:
+                break
+            sent += sum(1 for result in results if result['success'])
+            failed += sum(1 for result in results if not result['success'])
+            print(f"  {sent} sent, {failed} failed", end='\r', flush=True)
+        print()
+    print(f"  {sent} sent, {failed} failed; {len(app.outbox.pending())} left for retry")
+    return 0 if not failed else 1
+
+
+def cmd_export(app, args):
+    from export import iter_attendance, parse_time, stream_csv, stream_xlsx
+
+    fmt = 'xlsx' if args.output.endswith('.xlsx') else 'csv'
+    filters = {
+        'checked_in': None if args.checked_in is None else args.checked_in == 'yes',
+        'since': parse_time(args.since),
+        'until': parse_time(args.until),
+        'gate': args.gate,
+    }
+    rows = [0]
+
+    def counted(source):
+        for row in source:
+            rows[0] += 1
+            yield row
+
+    writer = stream_xlsx if fmt == 'xlsx' else stream_csv
+    with step(f"Exporting attendance to {args.output}"):
+        with open(args.output, 'wb') as output:
+            for chunk in writer(counted(iter_attendance(app.get_db, **filters))):
+                output.write(chunk.encode('utf-8') if isinstance(chunk, str) else chunk)
+    print(f"  {rows[0]} members")
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description='Offline event preparation for the AGA check-in system')
+    parser.add_argument('--db', help='Database file (default: DATABASE_URL)')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    command = commands.add_parser('import', help='Import members from the registration CSV')
+    command.add_argument('--csv', help='CSV file (default: the registration export)')
+    command.add_argument('--dry-run', action='store_true', help='Report what would be imported, change nothing')
+    command.set_defaults(handler=cmd_import)
+
+    command = commands.add_parser('render-qr', help='Pre-render every member QR image on all cores')
+    command.add_argument('--workers', type=int, help='Processes (default: all cores)')
+    command.add_argument('--force', action='store_true', help='Render again even if up to date')
+    command.set_defaults(handler=cmd_render_qr)
+
+    command = commands.add_parser('build-indexes', help='Create tables/indexes, run migrations, ANALYZE')
+    command.set_defaults(handler=cmd_build_indexes)
+
+    command = commands.add_parser('optimize', help='ANALYZE and VACUUM the database')
+    command.set_defaults(handler=cmd_optimize)
+
+    command = commands.add_parser('warm', help='Load the database into the OS page cache')
+    command.add_argument('--url', help='Also build the listing snapshot on a running server')
+    command.set_defaults(handler=cmd_warm)
+
+    command = commands.add_parser('backup', help='Take an online backup (safe while the server runs)')
+    command.set_defaults(handler=cmd_backup)
+
+    command = commands.add_parser('queue-invitations', help='Queue invitation emails in the outbox')
+    command.add_argument('--send', action='store_true', help='Deliver them from this process too')
+    command.set_defaults(handler=cmd_queue_invitations)
+
+    command = commands.add_parser('export', help='Write the attendance report (.csv or .xlsx)')
+    command.add_argument('output', help='Output file')
+    command.add_argument('--checked-in', choices=('yes', 'no'))
+    command.add_argument('--from', dest='since', help='Checked in at or after (ISO time)')
+    command.add_argument('--to', dest='until', help='Checked in at or before (ISO time)')
+    command.add_argument('--gate', help='Scanner device id or "admin"')
+    command.set_defaults(handler=cmd_export)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    import app
+    if args.db:
+        app.app.config['DATABASE'] = args.db
+    if getattr(args, 'csv', None) is None and args.command == 'import':
+        args.csv = app.MEMBERS_CSV
+    return args.handler(app, args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,292 @@
+"""
+Durable outbox for invitation emails
+
+Every invitation is recorded in the ``email_outbox`` table, keyed by
+member and QR code, so a restarted process knows who was already emailed
+and transient SMTP failures are retried with exponential backoff.
+"""
+
+import threading
+import time
+from config import Config
+from structured_logging import get_logger
+
+log = get_logger('email')
+
+PENDING = 'pending'
+SENDING = 'sending'
+SENT = 'sent'
+FAILED = 'failed'
+
+
+def _default_email_service():
+    from email_service import EmailService
+    return EmailService()
+
+
+class EmailOutbox:
+    def __init__(self, connect, email_service_factory=None,
+                 max_attempts=None, base_delay=None, max_delay=None):
+        self.connect = connect
+        self.email_service_factory = email_service_factory or _default_email_service
+        self.max_attempts = max_attempts or Config.EMAIL_MAX_ATTEMPTS
+        self.base_delay = base_delay if base_delay is not None else Config.EMAIL_RETRY_BASE_SECONDS
+        self.max_delay = max_delay if max_delay is not None else Config.EMAIL_RETRY_MAX_SECONDS
+        self._wakeup = threading.Event()
+        self._worker = None
+
+    def create_tables(self, cursor):
+        """Create the outbox table and its undelivered-rows index"""
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS email_outbox (
+                id INTEGER PRIMARY KEY,
+                member_id TEXT NOT NULL,
+                qr_code TEXT NOT NULL,
+                full_name TEXT,
+                email TEXT,
+                status TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                next_attempt_at REAL NOT NULL DEFAULT 0,
+                last_error TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                sent_at TIMESTAMP,
+                UNIQUE (member_id, qr_code)
+            )
+        ''')
+        # Partial index: delivered rows drop out, so every query filtered on
+        # status != 'sent' costs O(pending) whatever the size of the mailing
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_email_outbox_undelivered
+            ON email_outbox (next_attempt_at) WHERE status != 'sent'
+        ''')
+
+    def retry_delay(self, attempts):
+        """Backoff before the next attempt, doubling per failed attempt"""
+        return min(self.base_delay * 2 ** max(attempts - 1, 0), self.max_delay)
+
+    def enqueue(self, members):
+        """Record invitations for members; returns {member_id: outbox row id}"""
+        conn = self.connect()
+        cursor = conn.cursor()
+        row_ids = {}
+
+        for member in members:
+            if not member.get('email') or not member.get('qr_code'):
+                continue
+
+            # A failed row gets a fresh set of attempts when queued again;
+            # delivered rows are left untouched so they are never resent
+            cursor.execute('''
+                INSERT INTO email_outbox (member_id, qr_code, full_name, email)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT (member_id, qr_code) DO UPDATE SET
+                    full_name = excluded.full_name,
+                    email = excluded.email,
+                    attempts = CASE WHEN status = 'failed' THEN 0 ELSE attempts END,
+                    status = CASE WHEN status = 'failed' THEN 'pending' ELSE status END,
+                    next_attempt_at = CASE WHEN status = 'failed' THEN 0 ELSE next_attempt_at END
+                WHERE status != 'sent'
+            ''', (
+                str(member['member_id']),
+                member['qr_code'],
+                member.get('full_name', ''),
+                member['email']
+            ))
+            cursor.execute(
+                'SELECT id FROM email_outbox WHERE member_id = ? AND qr_code = ?',
+                (str(member['member_id']), member['qr_code'])
+            )
+            row_ids[str(member['member_id'])] = cursor.fetchone()[0]
+
+        conn.commit()
+        conn.close()
+        return row_ids
+
+    def send_now(self, members, force=False, batch_size=10, delay_seconds=1):
+        """Queue members and attempt delivery immediately.
+
+        Returns results in the same format as EmailService.send_bulk_invitations.
+        Members already delivered are skipped unless ``force`` is set, which
+        is reserved for an admin explicitly resending to one person.
+        """
+        service = self.email_service_factory()
+        row_ids = self.enqueue(members)
+        results = []
+        total_members = len(members)
+
+        for i, member in enumerate(members):
+            name = member.get('full_name', 'Unknown')
+
+            if not member.get('email'):
+                results.append(self._result(name, 'No email', False, 'No email address provided'))
+                continue
+            if not member.get('qr_code'):
+                results.append(self._result(name, member['email'], False, 'No QR code provided'))
+                continue
+            if not service.username or not service.password:
+                results.append(self._result(name, member['email'], False, 'Email credentials not configured'))
+                continue
+
+            results.append(self._attempt(service, row_ids[str(member['member_id'])], force=force))
+
+            # Rate limiting: pause after every batch_size emails
+            if (i + 1) % batch_size == 0 and i < total_members - 1:
+                time.sleep(delay_seconds)
+
+        return results
+
+    def process_due(self, limit=50):
+        """Attempt delivery of queued invitations whose retry time has come"""
+        service = self.email_service_factory()
+        if not service.username or not service.password:
+            return []
+
+        conn = self.connect()
+        cursor = conn.cursor()
+        # status != 'sent' is implied by status = 'pending', but spelled out so
+        # the planner uses the partial index (WHERE status != 'sent')
+        cursor.execute('''
+            SELECT id FROM email_outbox
+            WHERE status != 'sent' AND status = 'pending' AND next_attempt_at <= ?
+            ORDER BY next_attempt_at
+            LIMIT ?
+        ''', (time.time(), limit))
+        row_ids = [row[0] for row in cursor.fetchall()]
+        conn.close()
+
+        return [self._attempt(service, row_id) for row_id in row_ids]
+
+    def pending(self):
+        """List invitations not yet delivered (queued, retrying or failed)"""
+        conn = self.connect()
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT member_id, full_name, email, status, attempts, next_attempt_at, last_error
+            FROM email_outbox
+            WHERE status != 'sent'
+            ORDER BY next_attempt_at
+        ''')
+        rows = cursor.fetchall()
+        conn.close()
+
+        return [{
+            'member_id': r[0],
+            'full_name': r[1],
+            'email': r[2],
+            'status': r[3],
+            'attempts': r[4],
+            'next_attempt_at': r[5],
+            'last_error': r[6]
+        } for r in rows]
+
+    def resume(self, start_worker=True):
+        """Requeue sends interrupted by a crash and start the retry worker.
+
+        A row left in 'sending' means the process died mid-delivery; it is
+        retried, so only that narrow window can ever produce a second copy.
+        """
+        conn = self.connect()
+        cursor = conn.cursor()
+        # Redundant status != 'sent' on purpose: it lets the partial index serve the scan
+        cursor.execute('''
+            UPDATE email_outbox SET status = 'pending', next_attempt_at = 0
+            WHERE status != 'sent' AND status = 'sending'
+        ''')
+        resumed = cursor.rowcount
+        conn.commit()
+        conn.close()
+
+        if start_worker:
+            self.start_worker()
+        return resumed
+
+    def start_worker(self, poll_seconds=5):
+        """Start the background thread that retries due invitations"""
+        if self._worker and self._worker.is_alive():
+            return
+        self._worker = threading.Thread(
+            target=self._run, args=(poll_seconds,), name='email-outbox', daemon=True
+        )
+        self._worker.start()
+
+    def wake(self):
+        """Ask the worker to look for due invitations right away"""
+        self._wakeup.set()
+
+    def _run(self, poll_seconds):
+        while True:
+            try:
+                self.process_due()
+            except Exception:
+                log.exception('Email outbox worker error')
+            self._wakeup.wait(poll_seconds)
+            self._wakeup.clear()
+
+    def _attempt(self, service, row_id, force=False):
+        """Claim one outbox row, deliver it and record the outcome"""
+        conn = self.connect()
+        cursor = conn.cursor()
+        claimable = "('pending', 'failed', 'sent')" if force else "('pending')"
+
+        # The conditional UPDATE is the claim: only one caller can move a
+        # row to 'sending', so concurrent workers never deliver it twice
+        cursor.execute(f'''
+            UPDATE email_outbox SET status = 'sending', attempts = attempts + 1
+            WHERE id = ? AND status IN {claimable}
+        ''', (row_id,))
+        claimed = cursor.rowcount == 1
+        conn.commit()
+
+        cursor.execute(
+            'SELECT full_name, email, qr_code, status, attempts FROM email_outbox WHERE id = ?',
+            (row_id,)
+        )
+        full_name, email, qr_code, status, attempts = cursor.fetchone()
+
+        if not claimed:
+            conn.close()
+            if status == SENT:
+                return self._result(full_name, email, True, 'Invitation already delivered', skipped=True)
+            return self._result(full_name, email, False, 'Delivery already in progress', skipped=True)
+
+        try:
+            size = service.deliver_invitation(full_name, email, qr_code)
+        except Exception as e:
+            if service.is_transient_error(e) and attempts < self.max_attempts:
+                delay = self.retry_delay(attempts)
+                new_status = PENDING
+                message = f'Error sending email: {str(e)} (retry {attempts}/{self.max_attempts} in {delay:.0f}s)'
+            else:
+                delay = 0
+                new_status = FAILED
+                message = f'Error sending email: {str(e)}'
+
+            cursor.execute('''
+                UPDATE email_outbox SET status = ?, next_attempt_at = ?, last_error = ?
+                WHERE id = ?
+            ''', (new_status, time.time() + delay, str(e), row_id))
+            conn.commit()
+            conn.close()
+            return self._result(full_name, email, False, message)
+
+        cursor.execute('''
+            UPDATE email_outbox SET status = 'sent', sent_at = CURRENT_TIMESTAMP, last_error = NULL
+            WHERE id = ?
+        ''', (row_id,))
+        conn.commit()
+        conn.close()
+        return self._result(full_name, email, True, 'Email sent successfully', size=size)
+
+    @staticmethod
+    def _result(member_name, email, success, message, skipped=False, size=None):
+        result = {
+            'member': member_name,
+            'email': email,
+            'success': success,
+            'message': message
+        }
+        if skipped:
+            result['skipped'] = True
+        if size:
+            result['size'] = size
+        return result
@@ -0,0 +1,165 @@
+"""
+Sampled per-request profiling
+
+When switched on from the admin panel, a configurable fraction of requests
+(globally, or per endpoint) runs under cProfile. Each sampled request is
+dumped as a pstats file (``snakeviz``, ``flameprof`` or ``gprof2dot`` turn
+them into flame graphs) in a directory that keeps only the newest files,
+and a summary with the request's top functions is kept in memory for the
+admin view. While off, the request hooks cost one attribute check.
+
+Work that leaves the request thread is invisible to its profile: since
+check-ins are group committed, a sampled verify_qr shows only the wait
+for the commit. Such work is profiled on its own thread with task(),
+sampled like an endpoint under its own name ("checkin_batch").
+"""
+
+import cProfile
+import os
+import pstats
+import random
+import re
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+from flask import g, request
+
+
+class RequestProfiler:
+    def __init__(self, directory, sample_rate=0.1, max_files=200, keep_recent=200, top_functions=8):
+        self.directory = directory
+        self.sample_rate = sample_rate
+        self.routes = {}
+        self.max_files = max_files
+        self.top_functions = top_functions
+        self.enabled = False
+        self.exclude = set()
+        self.recent = deque(maxlen=keep_recent)
+        self._files = None
+        self._lock = threading.Lock()
+
+    def install(self, app, exclude=()):
+        """Register the request hooks on a Flask app"""
+        self.exclude.update(exclude)
+        app.before_request(self._start)
+        app.teardown_request(self._finish)
+
+    def configure(self, enabled=None, sample_rate=None, routes=None):
+        """Switch profiling on or off and set the sampled fractions (0..1)"""
+        if sample_rate is not None:
+            self.sample_rate = min(max(float(sample_rate), 0.0), 1.0)
+        if routes is not None:
+            self.routes = {endpoint: min(max(float(rate), 0.0), 1.0) for endpoint, rate in routes.items()}
+        if enabled is not None:
+            self.enabled = bool(enabled)
+
+    def status(self):
+        return {
+            'enabled': self.enabled,
+            'sample_rate': self.sample_rate,
+            'routes': self.routes,
+            'directory': self.directory,
+            'max_files': self.max_files,
+            'profiled': len(self.recent),
+        }
+
+    def slowest(self, limit=20):
+        """Recent sampled requests, slowest first"""
+        return sorted(self.recent, key=lambda entry: entry['duration_ms'], reverse=True)[:limit]
+
+    def task(self, name, detail, func, *args):
+        """Run func(*args) outside a request, sampled like an endpoint called name"""
+        if not self.enabled or random.random() >= self.routes.get(name, self.sample_rate):
+            return func(*args)
+        profile = cProfile.Profile()
+        started = time.perf_counter()
+        try:
+            profile.enable()
+        except ValueError:
+            return func(*args)
+        try:
+            return func(*args)
+        finally:
+            profile.disable()
+            try:
+                self._record(profile, (time.perf_counter() - started) * 1000, name, 'TASK', detail)
+            except OSError:
+                pass
+
+    def _start(self):
+        if not self.enabled:
+            return
+        endpoint = request.endpoint
+        if endpoint is None or endpoint in self.exclude:
+            return
+        if random.random() >= self.routes.get(endpoint, self.sample_rate):
+            return
+
+        profile = cProfile.Profile()
+        g.request_profile = (profile, time.perf_counter())
+        try:
+            profile.enable()
+        except ValueError:
+            # Another profiler is already active on this thread
+            g.request_profile = None
+
+    def _finish(self, exc=None):
+        sample = g.pop('request_profile', None)
+        if not sample:
+            return
+        profile, started = sample
+        profile.disable()
+        duration_ms = (time.perf_counter() - started) * 1000
+
+        try:
+            self._record(profile, duration_ms, request.endpoint, request.method, request.path)
+        except OSError:
+            # A full or read-only disk must never break the request
+            pass
+
+    def _record(self, profile, duration_ms, endpoint, method, path):
+        stats = pstats.Stats(profile)
+        now = datetime.now()
+        filename = f"{now.strftime('%Y%m%d-%H%M%S-%f')}-{re.sub(r'[^A-Za-z0-9_.-]', '_', endpoint)}-{duration_ms:.0f}ms.prof"
+
+        with self._lock:
+            if self._files is None:
+                os.makedirs(self.directory, exist_ok=True)
+                # File names start with a timestamp, so name order is age order
+                self._files = deque(sorted(name for name in os.listdir(self.directory) if name.endswith('.prof')))
+            stats.dump_stats(os.path.join(self.directory, filename))
+            self._files.append(filename)
+            while len(self._files) > self.max_files:
+                old = self._files.popleft()
+                try:
+                    os.remove(os.path.join(self.directory, old))
+                except FileNotFoundError:
+                    pass
+
+        self.recent.append({
+            'time': now.strftime('%Y-%m-%d %H:%M:%S'),
+            'endpoint': endpoint,
+            'method': method,
+            'path': path,
+            'duration_ms': round(duration_ms, 2),
+            'file': filename,
+            'top_functions': self._top_functions(stats),
+        })
+
+    def _top_functions(self, stats):
+        """Functions with the most own time in a profile"""
+        stats.sort_stats('tottime')
+        top = []
+        for func in stats.fcn_list[:self.top_functions]:
+            calls, _, own_time, cumulative, _ = stats.stats[func]
+            filename, line, name = func
+            location = name if filename == '~' else f'{os.path.basename(filename)}:{line}({name})'
+            top.append({
+                'function': location,
+                'calls': calls,
+                'own_ms': round(own_time * 1000, 3),
+                'cumulative_ms': round(cumulative * 1000, 3),
+            })
+        return top
@@ -0,0 +1,119 @@
+"""
+In-process token-bucket rate limiting for the public API
+
+Each limiter keeps one bucket per client key (scanner device id or IP)
+plus an optional global bucket shared by all clients, so a single noisy
+scanner and an overall surge are both shed before the database is touched.
+
+Device ids are chosen by the client, so with ``devices_per_ip`` every
+request also draws on a bucket for its IP address, sized for that many
+devices. A client that sends a fresh device id on every request still
+runs out of its IP's budget.
+"""
+
+import threading
+from collections import Counter
+from time import monotonic
+
+GLOBAL_KEY = '*'
+
+
+class TokenBucketLimiter:
+    def __init__(self, name, rate, burst, global_rate=None, global_burst=None, max_keys=10000, devices_per_ip=None):
+        self.name = name
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self.global_rate = float(global_rate) if global_rate else None
+        self.global_burst = float(global_burst or global_rate or 0)
+        self.devices_per_ip = devices_per_ip
+        self.max_keys = max_keys
+        self.allowed = 0
+        self.rejected = 0
+        self.rejected_by_key = Counter()
+        self._buckets = {}
+        self._ip_buckets = {}
+        self._global = [self.global_burst, monotonic()]
+        self._lock = threading.Lock()
+
+    def acquire(self, key, ip=None):
+        """Take a token for key (and its IP); returns 0 if allowed, else seconds to wait"""
+        now = monotonic()
+        rate, burst = self.rate, self.burst
+        with self._lock:
+            # Each level is refilled in place first, so a rejection keeps
+            # the refill and nothing is taken from any bucket
+            device = self._buckets.get(key)
+            if device is None:
+                device = self._bucket(self._buckets, key, burst, now)
+            tokens = device[0] + (now - device[1]) * rate
+            device[0] = burst if tokens > burst else tokens
+            device[1] = now
+
+            address = None
+            if ip is not None and self.devices_per_ip:
+                # Derived from the device rate so it follows runtime changes
+                ip_rate, ip_burst = rate * self.devices_per_ip, burst * self.devices_per_ip
+                address = self._ip_buckets.get(ip)
+                if address is None:
+                    address = self._bucket(self._ip_buckets, ip, ip_burst, now)
+                tokens = address[0] + (now - address[1]) * ip_rate
+                address[0] = ip_burst if tokens > ip_burst else tokens
+                address[1] = now
+
+            shared = None
+            if self.global_rate:
+                shared = self._global
+                tokens = shared[0] + (now - shared[1]) * self.global_rate
+                shared[0] = self.global_burst if tokens > self.global_burst else tokens
+                shared[1] = now
+
+            if device[0] < 1.0:
+                return self._reject(key, (1.0 - device[0]) / rate)
+            if address is not None and address[0] < 1.0:
+                return self._reject(ip, (1.0 - address[0]) / ip_rate)
+            if shared is not None and shared[0] < 1.0:
+                return self._reject(GLOBAL_KEY, (1.0 - shared[0]) / self.global_rate)
+
+            device[0] -= 1.0
+            if address is not None:
+                address[0] -= 1.0
+            if shared is not None:
+                shared[0] -= 1.0
+            self.allowed += 1
+            return 0.0
+
+    def stats(self, top=10):
+        """Allowed/rejected counters and the most rejected clients"""
+        with self._lock:
+            return {
+                'allowed': self.allowed,
+                'rejected': self.rejected,
+                'clients': len(self._buckets),
+                'ips': len(self._ip_buckets),
+                'top_rejected': [
+                    {'client': key, 'rejected': count}
+                    for key, count in self.rejected_by_key.most_common(top)
+                ]
+            }
+
+    def _bucket(self, buckets, key, burst, now):
+        bucket = buckets.get(key)
+        if bucket is None:
+            if len(buckets) >= self.max_keys:
+                self._evict_idle(buckets, now)
+            bucket = buckets[key] = [burst, now]
+        return bucket
+
+    def _reject(self, key, retry_after):
+        self.rejected += 1
+        self.rejected_by_key[key] += 1
+        return retry_after
+
+    def _evict_idle(self, buckets, now):
+        # Buckets that have refilled completely carry no state worth keeping
+        full_after = self.burst / self.rate
+        idle = [k for k, (_, last) in buckets.items() if now - last >= full_after]
+        for key in idle or list(buckets)[:len(buckets) // 2]:
+            del buckets[key]
+        if len(self.rejected_by_key) > self.max_keys:
+            self.rejected_by_key = Counter(dict(self.rejected_by_key.most_common(self.max_keys // 2)))
@@ -0,0 +1,178 @@
+"""
+In-memory read model for dashboard and scanner reads
+
+Listing endpoints are served from a snapshot of the members table instead
+of querying SQLite, so polling readers never contend with the check-in
+writer for the database lock. Check-in writes patch the snapshot with the
+states they committed; structural edits (import, add, edit, delete) mark it
+stale and it is rebuilt from the database on the next read. Serialized
+JSON is cached per view until the next change.
+
+Every change bumps ``version``; etag() pairs it with a per-process epoch
+so listing endpoints can answer conditional GETs from memory.
+
+The snapshot lives in the process that performs the writes, which matches
+the single-process deployment (``python app.py``). Structural writes also
+bump a one-row counter in the database (mark_changed()); the snapshot
+rechecks it at most every ``recheck_seconds``, so an import run from
+``manage.py`` in another process still reaches the listings and the code
+manifest.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+
+MEMBER_COLUMNS = ('member_id', 'full_name', 'email', 'phone', 'qr_code', 'checked_in', 'check_in_time')
+
+# Fields returned by each listing view
+VIEWS = {
+    'members': ('member_id', 'full_name', 'email', 'phone', 'checked_in', 'check_in_time'),
+    'members_with_qr': MEMBER_COLUMNS,
+}
+
+
+def read_marker(conn):
+    """Current value of the shared change counter (0 before the first change)"""
+    try:
+        row = conn.execute('SELECT version FROM members_version').fetchone()
+    except sqlite3.OperationalError:
+        # Database created before the counter existed
+        return 0
+    return row[0] if row else 0
+
+
+class MemberSnapshot:
+    def __init__(self, connect, source=None, recheck_seconds=1.0):
+        self.connect = connect
+        # Identifies the database (e.g. its path); a change forces a rebuild
+        self.source = source or (lambda: None)
+        self.recheck_seconds = recheck_seconds
+        self._loaded_from = None
+        # Shared change counter as last read, and when it was read
+        self._marker = None
+        self._checked_at = 0.0
+        # Distinguishes this process's versions from a previous run's
+        self.epoch = os.urandom(4).hex()
+        self.version = 0
+        self.rebuilds = 0
+        self._members = None
+        self._ordered = None
+        self._json = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def create_tables(cursor):
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS members_version (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                version INTEGER NOT NULL
+            )
+        ''')
+
+    @staticmethod
+    def mark_changed(cursor):
+        """Bump the shared change counter inside the writer's transaction"""
+        cursor.execute('''
+            INSERT INTO members_version (id, version) VALUES (1, 1)
+            ON CONFLICT (id) DO UPDATE SET version = version + 1
+        ''')
+
+    def invalidate(self):
+        """Drop the snapshot after a structural change; rebuilt on next read"""
+        with self._lock:
+            self._drop()
+
+    def update_checkins(self, states):
+        """Apply committed check-in states: {member_id: (checked_in, check_in_time)}"""
+        if not states:
+            return
+        with self._lock:
+            self.version += 1
+            self._json = {}
+            if self._members is None:
+                return
+            for member_id, (checked_in, check_in_time) in states.items():
+                member = self._members.get(member_id)
+                if member is None:
+                    # Not in the snapshot yet; rebuild rather than guess
+                    self._members = None
+                    self._ordered = None
+                    return
+                member['checked_in'] = bool(checked_in)
+                member['check_in_time'] = check_in_time
+
+    def etag(self):
+        """Validator for the current data version; changes with every write"""
+        with self._lock:
+            self._check_source()
+            return f'{self.epoch}-{self.version}'
+
+    def json(self, view):
+        """Serialized member list for a view, cached until the next change"""
+        with self._lock:
+            self._check_source()
+            cached = self._json.get(view)
+            if cached is None:
+                self._ensure_loaded()
+                fields = VIEWS[view]
+                cached = self._json[view] = json.dumps(
+                    [{field: member[field] for field in fields} for member in self._ordered],
+                    separators=(',', ':')
+                ).encode()
+            return cached
+
+    def codes(self):
+        """(rebuild count, QR codes of every member); the count changes on reload"""
+        with self._lock:
+            self._check_source()
+            self._ensure_loaded()
+            return self.rebuilds, [member['qr_code'] for member in self._ordered]
+
+    def _drop(self):
+        self._members = None
+        self._ordered = None
+        self._json = {}
+        self.version += 1
+        self._marker = None
+
+    def _check_source(self):
+        # The database was swapped (e.g. DATABASE reconfigured); start over
+        if self._loaded_from != self.source():
+            self._loaded_from = self.source()
+            self._drop()
+            return
+        # Nothing loaded since the last drop can be out of date; otherwise
+        # look at the shared counter at most every recheck_seconds
+        now = time.monotonic()
+        if self._marker is None or now - self._checked_at < self.recheck_seconds:
+            return
+        self._checked_at = now
+        conn = self.connect()
+        try:
+            changed = read_marker(conn) != self._marker
+        finally:
+            conn.close()
+        if changed:
+            # Another process changed the members table
+            self._drop()
+
+    def _ensure_loaded(self):
+        if self._members is not None:
+            return
+        conn = self.connect()
+        try:
+            # Read first: a change landing in between only costs a rebuild
+            marker = read_marker(conn)
+            rows = conn.execute(f'SELECT {", ".join(MEMBER_COLUMNS)} FROM members ORDER BY full_name').fetchall()
+        finally:
+            conn.close()
+        self._marker = marker
+
+        self._ordered = [dict(zip(MEMBER_COLUMNS, row)) for row in rows]
+        for member in self._ordered:
+            member['checked_in'] = bool(member['checked_in'])
+        self._members = {member['member_id']: member for member in self._ordered}
+        self.rebuilds += 1
@@ -0,0 +1,245 @@
+"""
+Two-node check-in replication
+
+Every local check-in change is appended to the sequence-numbered
+``checkin_log`` table in the same transaction as the write. Peers exchange
+the log entries past their last seen sequence number over HTTP, so a sync
+costs O(changes) rather than O(members). Conflicts resolve as
+first-check-in-wins: the earliest check-in time for a code is kept.
+"""
+
+import json
+import threading
+import urllib.request
+from structured_logging import get_logger
+
+log = get_logger('replication')
+
+LOG_COLUMNS = ('seq', 'member_id', 'qr_code', 'checked_in', 'check_in_time', 'changed_at', 'check_in_gate')
+
+
+class Replicator:
+    def __init__(self, connect, node_id, peer_url='', token='', batch_size=500, on_change=None):
+        self.connect = connect
+        self.on_change = on_change
+        self.node_id = node_id
+        self.peer_url = peer_url.rstrip('/')
+        self.token = token
+        self.batch_size = batch_size
+        self._worker = None
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return bool(self.token)
+
+    def create_tables(self, cursor):
+        """Create the change log and the per-peer sync cursors"""
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS checkin_log (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                member_id TEXT NOT NULL,
+                qr_code TEXT NOT NULL,
+                checked_in BOOLEAN NOT NULL,
+                check_in_time TIMESTAMP,
+                changed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                check_in_gate TEXT
+            )
+        ''')
+        cursor.execute('PRAGMA table_info(checkin_log)')
+        if 'check_in_gate' not in {column[1] for column in cursor.fetchall()}:
+            cursor.execute('ALTER TABLE checkin_log ADD COLUMN check_in_gate TEXT')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS replication_state (
+                node_id TEXT PRIMARY KEY,
+                pulled_seq INTEGER NOT NULL DEFAULT 0,
+                pushed_seq INTEGER NOT NULL DEFAULT 0
+            )
+        ''')
+
+    def log_members(self, cursor, member_ids):
+        """Append the current check-in state of members to the change log.
+
+        Call with the cursor of the transaction that changed them, after
+        the UPDATE, so the log and the table commit together.
+        """
+        cursor.executemany('''
+            INSERT INTO checkin_log (member_id, qr_code, checked_in, check_in_time, check_in_gate)
+            SELECT member_id, qr_code, checked_in, check_in_time, check_in_gate
+            FROM members WHERE member_id = ?
+        ''', [(member_id,) for member_id in member_ids])
+
+    def changes_since(self, seq, limit=None):
+        """Local log entries after seq, oldest first"""
+        conn = self.connect()
+        cursor = conn.cursor()
+        cursor.execute(f'''
+            SELECT {', '.join(LOG_COLUMNS)} FROM checkin_log
+            WHERE seq > ? ORDER BY seq LIMIT ?
+        ''', (seq, limit or self.batch_size))
+        rows = cursor.fetchall()
+        conn.close()
+
+        return [dict(zip(LOG_COLUMNS, row)) for row in rows]
+
+    def apply(self, origin, changes, since=None):
+        """Merge a peer's log entries into the members table.
+
+        A check-in is applied if the code is not checked in here, or was
+        checked in later than the peer saw it. A check-out only applies if
+        it happened after the local check-in. Applied entries are not
+        re-logged, so changes never echo back to their origin.
+        """
+        stats = {'applied': 0, 'unchanged': 0, 'unmatched': 0}
+        applied = {}
+        if not changes:
+            return stats
+
+        conn = self.connect()
+        cursor = conn.cursor()
+
+        for change in changes:
+            cursor.execute(
+                'SELECT checked_in, check_in_time FROM members WHERE member_id = ? AND qr_code = ?',
+                (change['member_id'], change['qr_code'])
+            )
+            member = cursor.fetchone()
+            if not member:
+                stats['unmatched'] += 1
+                continue
+
+            checked_in, check_in_time = member
+            if change['checked_in']:
+                apply_change = not checked_in or (
+                    change['check_in_time'] and check_in_time and change['check_in_time'] < check_in_time
+                )
+            else:
+                apply_change = bool(checked_in) and (
+                    not check_in_time or check_in_time <= change['changed_at']
+                )
+
+            if not apply_change:
+                stats['unchanged'] += 1
+                continue
+
+            cursor.execute('''
+                UPDATE members SET checked_in = ?, check_in_time = ?, check_in_gate = ?
+                WHERE member_id = ?
+            ''', (bool(change['checked_in']), change['check_in_time'],
+                  change.get('check_in_gate'), change['member_id']))
+            applied[change['member_id']] = (bool(change['checked_in']), change['check_in_time'])
+            stats['applied'] += 1
+
+        # Remember how far we have seen the origin's log; a pushed batch
+        # only counts if it continues from where we already were
+        last_seq = changes[-1]['seq']
+        cursor.execute('INSERT OR IGNORE INTO replication_state (node_id) VALUES (?)', (origin,))
+        cursor.execute('''
+            UPDATE replication_state SET pulled_seq = ?
+            WHERE node_id = ? AND pulled_seq < ? AND (? IS NULL OR pulled_seq >= ?)
+        ''', (last_seq, origin, last_seq, since, since))
+
+        conn.commit()
+        conn.close()
+        if self.on_change and applied:
+            self.on_change(applied)
+        return stats
+
+    def get_state(self, node_id):
+        """(pulled_seq, pushed_seq) for a peer"""
+        conn = self.connect()
+        cursor = conn.cursor()
+        cursor.execute(
+            'SELECT pulled_seq, pushed_seq FROM replication_state WHERE node_id = ?', (node_id,)
+        )
+        row = cursor.fetchone()
+        conn.close()
+        return row or (0, 0)
+
+    def set_pushed(self, node_id, seq):
+        conn = self.connect()
+        cursor = conn.cursor()
+        cursor.execute('INSERT OR IGNORE INTO replication_state (node_id) VALUES (?)', (node_id,))
+        cursor.execute(
+            'UPDATE replication_state SET pushed_seq = MAX(pushed_seq, ?) WHERE node_id = ?',
+            (seq, node_id)
+        )
+        conn.commit()
+        conn.close()
+
+    def sync_once(self):
+        """Pull the peer's new changes, then push ours; returns a summary"""
+        if not self.peer_url:
+            raise ValueError('No replication peer configured')
+
+        with self._lock:
+            peer = self._request('GET', '/api/replication/status')
+            peer_id = peer['node_id']
+            pulled_seq, pushed_seq = self.get_state(peer_id)
+            summary = {'peer': peer_id, 'pulled': 0, 'pushed': 0, 'applied': 0}
+
+            # Pull until the peer has nothing newer
+            while True:
+                batch = self._request('GET', f'/api/replication/changes?since={pulled_seq}')
+                changes = batch['changes']
+                if not changes:
+                    break
+                stats = self.apply(peer_id, changes, since=pulled_seq)
+                summary['pulled'] += len(changes)
+                summary['applied'] += stats['applied']
+                pulled_seq = changes[-1]['seq']
+
+            # Push our log past what the peer has already seen
+            pushed_seq = max(pushed_seq, peer.get('pulled', {}).get(self.node_id, 0))
+            while True:
+                changes = self.changes_since(pushed_seq)
+                if not changes:
+                    break
+                self._request('POST', '/api/replication/apply', {
+                    'origin': self.node_id,
+                    'since': pushed_seq,
+                    'changes': changes
+                })
+                pushed_seq = changes[-1]['seq']
+                summary['pushed'] += len(changes)
+            self.set_pushed(peer_id, pushed_seq)
+
+            return summary
+
+    def status(self):
+        """Node id, head of the local log and how far each peer was pulled"""
+        conn = self.connect()
+        cursor = conn.cursor()
+        cursor.execute('SELECT MAX(seq) FROM checkin_log')
+        head = cursor.fetchone()[0] or 0
+        cursor.execute('SELECT node_id, pulled_seq FROM replication_state')
+        pulled = dict(cursor.fetchall())
+        conn.close()
+
+        return {'node_id': self.node_id, 'head_seq': head, 'pulled': pulled}
+
+    def start_worker(self, interval_seconds):
+        """Sync with the peer in the background every interval_seconds"""
+        if not self.peer_url or (self._worker and self._worker.is_alive()):
+            return
+        self._worker = threading.Thread(
+            target=self._run, args=(interval_seconds,), name='replication', daemon=True
+        )
+        self._worker.start()
+
+    def _run(self, interval_seconds):
+        stop = threading.Event()
+        while not stop.wait(interval_seconds):
+            try:
+                self.sync_once()
+            except Exception as e:
+                log.warning('Replication sync failed', extra={'peer': self.peer_url, 'error': str(e)})
+
+    def _request(self, method, path, payload=None):
+        data = json.dumps(payload).encode() if payload is not None else None
+        req = urllib.request.Request(self.peer_url + path, data=data, method=method, headers={
+            'Content-Type': 'application/json',
+            'X-Replication-Token': self.token
+        })
+        with urllib.request.urlopen(req, timeout=10) as response:
+            return json.loads(response.read())
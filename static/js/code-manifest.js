@@ -0,0 +1,181 @@
+/*
+ * Local pre-check of scanned codes against the valid-code manifest.
+ *
+ * The server publishes the sorted 24-bit hashes of every member's QR code
+ * (see code_manifest.py). A code whose hash is not in the list cannot be
+ * valid and is rejected on the device without a request; a hit is only
+ * "plausible" and still goes to /api/verify-qr. Until a manifest has been
+ * loaded every code is treated as plausible. The list is kept in
+ * localStorage and refreshed with deltas (?since=<version>).
+ *
+ * check() refreshes the list once before rejecting a miss, so a member
+ * registered since the last refresh is not turned away. Misses refresh at
+ * most once per recheckMs, so a stream of foreign codes stays local.
+ */
+class CodeManifest {
+    constructor(url, deviceId, options = {}) {
+        this.url = url;
+        this.deviceId = deviceId;
+        this.refreshMs = options.refreshMs || 60000;
+        this.recheckMs = options.recheckMs || 2000;
+        this.storageKey = options.storageKey || 'codeManifest';
+        this.version = null;
+        this.bits = 24;
+        this.hashes = null;
+        this.refreshing = null;
+        this.refreshedAt = 0;
+        this.restore();
+    }
+
+    // Must match code_hash() in code_manifest.py: FNV-1a over the UTF-8
+    // bytes, murmur3 finalizer, top `bits` bits
+    static hash(code, bits) {
+        let h = 0x811c9dc5;
+        for (const byte of new TextEncoder().encode(code)) {
+            h = Math.imul(h ^ byte, 0x01000193);
+        }
+        h ^= h >>> 16;
+        h = Math.imul(h, 0x85ebca6b);
+        h ^= h >>> 13;
+        h = Math.imul(h, 0xc2b2ae35);
+        h ^= h >>> 16;
+        return (h >>> 0) >>> (32 - bits);
+    }
+
+    static unpack(packed, bits) {
+        const bytes = Uint8Array.from(atob(packed), c => c.charCodeAt(0));
+        const width = bits / 8;
+        const hashes = new Uint32Array(bytes.length / width);
+        for (let i = 0; i < hashes.length; i++) {
+            let value = 0;
+            for (let j = 0; j < width; j++) {
+                value = value * 256 + bytes[i * width + j];
+            }
+            hashes[i] = value;
+        }
+        return hashes;
+    }
+
+    static pack(hashes, bits) {
+        const width = bits / 8;
+        let binary = '';
+        for (const value of hashes) {
+            for (let j = width - 1; j >= 0; j--) {
+                binary += String.fromCharCode(Math.floor(value / 2 ** (8 * j)) & 0xff);
+            }
+        }
+        return btoa(binary);
+    }
+
+    // false only when the code is certainly not a member's code
+    mightBeValid(code) {
+        if (!this.hashes) {
+            return true;
+        }
+        const target = CodeManifest.hash(code, this.bits);
+        let low = 0;
+        let high = this.hashes.length - 1;
+        while (low <= high) {
+            const mid = (low + high) >>> 1;
+            if (this.hashes[mid] === target) {
+                return true;
+            }
+            if (this.hashes[mid] < target) {
+                low = mid + 1;
+            } else {
+                high = mid - 1;
+            }
+        }
+        return false;
+    }
+
+    // Resolves to false only when the code misses even an up-to-date list
+    async check(code) {
+        if (this.mightBeValid(code)) {
+            return true;
+        }
+        if (performance.now() - this.refreshedAt >= this.recheckMs) {
+            await this.refresh();
+        }
+        return this.mightBeValid(code);
+    }
+
+    // Concurrent callers share one request
+    refresh() {
+        if (!this.refreshing) {
+            this.refreshing = this.fetchUpdate().finally(() => {
+                this.refreshedAt = performance.now();
+                this.refreshing = null;
+            });
+        }
+        return this.refreshing;
+    }
+
+    async fetchUpdate() {
+        const query = this.version ? `?since=${encodeURIComponent(this.version)}` : '';
+        const headers = { 'X-Device-Id': this.deviceId };
+        if (this.version) {
+            headers['If-None-Match'] = `"${this.version}"`;
+        }
+        try {
+            const response = await fetch(this.url + query, { headers: headers, cache: 'no-store' });
+            if (response.status === 304 || !response.ok) {
+                return;
+            }
+            this.apply(await response.json());
+        } catch (error) {
+            // Offline: keep checking against the list we have
+        }
+    }
+
+    apply(data) {
+        this.bits = data.hash_bits;
+        if (data.full) {
+            this.hashes = CodeManifest.unpack(data.hashes, this.bits);
+        } else {
+            const removed = new Set(CodeManifest.unpack(data.removed, this.bits));
+            const merged = Array.from(this.hashes).filter(value => !removed.has(value));
+            merged.push(...CodeManifest.unpack(data.added, this.bits));
+            this.hashes = Uint32Array.from(merged).sort();
+        }
+        if (this.hashes.length !== data.count) {
+            // Out of step with the server; take the full list next time
+            this.version = null;
+            this.hashes = null;
+            return;
+        }
+        this.version = data.version;
+        this.save();
+    }
+
+    start() {
+        this.refresh();
+        setInterval(() => this.refresh(), this.refreshMs);
+    }
+
+    save() {
+        try {
+            localStorage.setItem(this.storageKey, JSON.stringify({
+                version: this.version,
+                hash_bits: this.bits,
+                hashes: CodeManifest.pack(this.hashes, this.bits)
+            }));
+        } catch (error) {
+            // Storage full or disabled; the list is re-downloaded next load
+        }
+    }
+
+    restore() {
+        try {
+            const stored = JSON.parse(localStorage.getItem(this.storageKey));
+            if (stored && stored.version) {
+                this.bits = stored.hash_bits;
+                this.hashes = CodeManifest.unpack(stored.hashes, this.bits);
+                this.version = stored.version;
+            }
+        } catch (error) {
+            this.hashes = null;
+            this.version = null;
+        }
+    }
+}
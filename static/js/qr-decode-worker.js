@@ -0,0 +1,20 @@
+/*
+ * QR decode worker: runs decodeQR (qr-decoder.js) on downscaled frames posted by QRScanner so
+ * the page's main thread never blocks on decoding.
+ */
+// The page passes the fingerprinted decoder URL as ?decoder=; a failure here
+// reaches QRScanner through the worker's onerror
+importScripts(new URL(self.location).searchParams.get('decoder'));
+
+self.onmessage = function(event) {
+    const { id, buffer, width, height } = event.data;
+    const start = performance.now();
+
+    const code = decodeQR(new Uint8ClampedArray(buffer), width, height);
+
+    self.postMessage({
+        id: id,
+        data: code ? code.data : null,
+        decodeMs: performance.now() - start
+    });
+};
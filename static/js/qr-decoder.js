@@ -0,0 +1,1392 @@
+/*
+ * QR code decoder for camera frames.
+ *
+ * Used by qr-decode-worker.js, and by QRScanner on the main thread when
+ * the worker fails, on browsers without a native BarcodeDetector. It ships
+ * with the app, so the scanner shell needs no third-party script and works
+ * offline.
+ *
+ * decodeQR(rgba, width, height) reads the first QR code in an RGBA frame
+ * and returns { data, version, location } or null. The reading follows
+ * ISO/IEC 18004:
+ *   - adaptive (block) binarization;
+ *   - search for the three finder patterns, plus the bottom-right
+ *     alignment pattern;
+ *   - perspective sampling of the module grid;
+ *   - format and version information;
+ *   - unmasking and codeword extraction;
+ *   - Reed-Solomon error correction;
+ *   - parsing of the numeric, alphanumeric, byte and kanji segments.
+ * Mirrored symbols are read too.
+ */
+(function(global) {
+    'use strict';
+
+    // Per version, per error correction level (L, M, Q, H):
+    // [ec codewords per block, blocks, data codewords per block, (blocks, data codewords per block)]
+    const EC_BLOCKS = [
+        [[7, 1, 19], [10, 1, 16], [13, 1, 13], [17, 1, 9]],
+        [[10, 1, 34], [16, 1, 28], [22, 1, 22], [28, 1, 16]],
+        [[15, 1, 55], [26, 1, 44], [18, 2, 17], [22, 2, 13]],
+        [[20, 1, 80], [18, 2, 32], [26, 2, 24], [16, 4, 9]],
+        [[26, 1, 108], [24, 2, 43], [18, 2, 15, 2, 16], [22, 2, 11, 2, 12]],
+        [[18, 2, 68], [16, 4, 27], [24, 4, 19], [28, 4, 15]],
+        [[20, 2, 78], [18, 4, 31], [18, 2, 14, 4, 15], [26, 4, 13, 1, 14]],
+        [[24, 2, 97], [22, 2, 38, 2, 39], [22, 4, 18, 2, 19], [26, 4, 14, 2, 15]],
+        [[30, 2, 116], [22, 3, 36, 2, 37], [20, 4, 16, 4, 17], [24, 4, 12, 4, 13]],
+        [[18, 2, 68, 2, 69], [26, 4, 43, 1, 44], [24, 6, 19, 2, 20], [28, 6, 15, 2, 16]],
+        [[20, 4, 81], [30, 1, 50, 4, 51], [28, 4, 22, 4, 23], [24, 3, 12, 8, 13]],
+        [[24, 2, 92, 2, 93], [22, 6, 36, 2, 37], [26, 4, 20, 6, 21], [28, 7, 14, 4, 15]],
+        [[26, 4, 107], [22, 8, 37, 1, 38], [24, 8, 20, 4, 21], [22, 12, 11, 4, 12]],
+        [[30, 3, 115, 1, 116], [24, 4, 40, 5, 41], [20, 11, 16, 5, 17], [24, 11, 12, 5, 13]],
+        [[22, 5, 87, 1, 88], [24, 5, 41, 5, 42], [30, 5, 24, 7, 25], [24, 11, 12, 7, 13]],
+        [[24, 5, 98, 1, 99], [28, 7, 45, 3, 46], [24, 15, 19, 2, 20], [30, 3, 15, 13, 16]],
+        [[28, 1, 107, 5, 108], [28, 10, 46, 1, 47], [28, 1, 22, 15, 23], [28, 2, 14, 17, 15]],
+        [[30, 5, 120, 1, 121], [26, 9, 43, 4, 44], [28, 17, 22, 1, 23], [28, 2, 14, 19, 15]],
+        [[28, 3, 113, 4, 114], [26, 3, 44, 11, 45], [26, 17, 21, 4, 22], [26, 9, 13, 16, 14]],
+        [[28, 3, 107, 5, 108], [26, 3, 41, 13, 42], [30, 15, 24, 5, 25], [28, 15, 15, 10, 16]],
+        [[28, 4, 116, 4, 117], [26, 17, 42], [28, 17, 22, 6, 23], [30, 19, 16, 6, 17]],
+        [[28, 2, 111, 7, 112], [28, 17, 46], [30, 7, 24, 16, 25], [24, 34, 13]],
+        [[30, 4, 121, 5, 122], [28, 4, 47, 14, 48], [30, 11, 24, 14, 25], [30, 16, 15, 14, 16]],
+        [[30, 6, 117, 4, 118], [28, 6, 45, 14, 46], [30, 11, 24, 16, 25], [30, 30, 16, 2, 17]],
+        [[26, 8, 106, 4, 107], [28, 8, 47, 13, 48], [30, 7, 24, 22, 25], [30, 22, 15, 13, 16]],
+        [[28, 10, 114, 2, 115], [28, 19, 46, 4, 47], [28, 28, 22, 6, 23], [30, 33, 16, 4, 17]],
+        [[30, 8, 122, 4, 123], [28, 22, 45, 3, 46], [30, 8, 23, 26, 24], [30, 12, 15, 28, 16]],
+        [[30, 3, 117, 10, 118], [28, 3, 45, 23, 46], [30, 4, 24, 31, 25], [30, 11, 15, 31, 16]],
+        [[30, 7, 116, 7, 117], [28, 21, 45, 7, 46], [30, 1, 23, 37, 24], [30, 19, 15, 26, 16]],
+        [[30, 5, 115, 10, 116], [28, 19, 47, 10, 48], [30, 15, 24, 25, 25], [30, 23, 15, 25, 16]],
+        [[30, 13, 115, 3, 116], [28, 2, 46, 29, 47], [30, 42, 24, 1, 25], [30, 23, 15, 28, 16]],
+        [[30, 17, 115], [28, 10, 46, 23, 47], [30, 10, 24, 35, 25], [30, 19, 15, 35, 16]],
+        [[30, 17, 115, 1, 116], [28, 14, 46, 21, 47], [30, 29, 24, 19, 25], [30, 11, 15, 46, 16]],
+        [[30, 13, 115, 6, 116], [28, 14, 46, 23, 47], [30, 44, 24, 7, 25], [30, 59, 16, 1, 17]],
+        [[30, 12, 121, 7, 122], [28, 12, 47, 26, 48], [30, 39, 24, 14, 25], [30, 22, 15, 41, 16]],
+        [[30, 6, 121, 14, 122], [28, 6, 47, 34, 48], [30, 46, 24, 10, 25], [30, 2, 15, 64, 16]],
+        [[30, 17, 122, 4, 123], [28, 29, 46, 14, 47], [30, 49, 24, 10, 25], [30, 24, 15, 46, 16]],
+        [[30, 4, 122, 18, 123], [28, 13, 46, 32, 47], [30, 48, 24, 14, 25], [30, 42, 15, 32, 16]],
+        [[30, 20, 117, 4, 118], [28, 40, 47, 7, 48], [30, 43, 24, 22, 25], [30, 10, 15, 67, 16]],
+        [[30, 19, 118, 6, 119], [28, 18, 47, 31, 48], [30, 34, 24, 34, 25], [30, 20, 15, 61, 16]]
+    ];
+
+    // Row/column of the alignment pattern centres, per version
+    const ALIGNMENT_CENTERS = [
+        [], [6, 18], [6, 22], [6, 26], [6, 30], [6, 34], [6, 22, 38], [6, 24, 42], [6, 26, 46], [6, 28, 50],
+        [6, 30, 54], [6, 32, 58], [6, 34, 62], [6, 26, 46, 66], [6, 26, 48, 70], [6, 26, 50, 74],
+        [6, 30, 54, 78], [6, 30, 56, 82], [6, 30, 58, 86], [6, 34, 62, 90], [6, 28, 50, 72, 94],
+        [6, 26, 50, 74, 98], [6, 30, 54, 78, 102], [6, 28, 54, 80, 106], [6, 32, 58, 84, 110],
+        [6, 30, 58, 86, 114], [6, 34, 62, 90, 118], [6, 26, 50, 74, 98, 122], [6, 30, 54, 78, 102, 126],
+        [6, 26, 52, 78, 104, 130], [6, 30, 56, 82, 108, 134], [6, 34, 60, 86, 112, 138],
+        [6, 30, 58, 86, 114, 142], [6, 34, 62, 90, 118, 146], [6, 30, 54, 78, 102, 126, 150],
+        [6, 24, 50, 76, 102, 128, 154], [6, 28, 54, 80, 106, 132, 158], [6, 32, 58, 84, 110, 136, 162],
+        [6, 26, 54, 82, 110, 138, 166], [6, 30, 58, 86, 114, 142, 170]
+    ];
+
+    // Error correction level in the format information bits -> index into EC_BLOCKS
+    const EC_LEVEL_INDEX = [1, 0, 3, 2];
+
+    const ALPHANUMERIC = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ $%*+-./:';
+
+    // ---- Galois field GF(256), primitive polynomial x^8 + x^4 + x^3 + x^2 + 1
+
+    const EXP = new Uint8Array(512);
+    const LOG = new Uint8Array(256);
+    (function() {
+        let x = 1;
+        for (let i = 0; i < 255; i++) {
+            EXP[i] = x;
+            LOG[x] = i;
+            x <<= 1;
+            if (x & 0x100) {
+                x ^= 0x11d;
+            }
+        }
+        for (let i = 255; i < 512; i++) {
+            EXP[i] = EXP[i - 255];
+        }
+    })();
+
+    function gfMul(a, b) {
+        return a && b ? EXP[LOG[a] + LOG[b]] : 0;
+    }
+
+    function gfDiv(a, b) {
+        return a ? EXP[LOG[a] + 255 - LOG[b]] : 0;
+    }
+
+    // Value of a polynomial (lowest degree first) at x
+    function gfEval(poly, x) {
+        let result = 0;
+        for (let i = poly.length - 1; i >= 0; i--) {
+            result = gfMul(result, x) ^ poly[i];
+        }
+        return result;
+    }
+
+    // Corrects a block in place (codewords highest degree first); false
+    // when it has more errors than ecCount can correct
+    function correctErrors(block, ecCount) {
+        const n = block.length;
+        const syndromes = new Uint8Array(ecCount);
+        let clean = true;
+        for (let i = 0; i < ecCount; i++) {
+            let value = 0;
+            for (let k = 0; k < n; k++) {
+                value = gfMul(value, EXP[i]) ^ block[k];
+            }
+            syndromes[i] = value;
+            clean = clean && value === 0;
+        }
+        if (clean) {
+            return true;
+        }
+
+        // Berlekamp-Massey: error locator polynomial
+        let locator = [1];
+        let previous = [1];
+        let errors = 0;
+        let shift = 1;
+        let lastDiscrepancy = 1;
+        for (let step = 0; step < ecCount; step++) {
+            let discrepancy = syndromes[step];
+            for (let i = 1; i <= errors; i++) {
+                discrepancy ^= gfMul(locator[i] || 0, syndromes[step - i]);
+            }
+            if (discrepancy === 0) {
+                shift++;
+                continue;
+            }
+            const scale = gfDiv(discrepancy, lastDiscrepancy);
+            const updated = locator.slice();
+            for (let i = 0; i < previous.length; i++) {
+                updated[i + shift] = (updated[i + shift] || 0) ^ gfMul(scale, previous[i]);
+            }
+            if (2 * errors <= step) {
+                previous = locator;
+                errors = step + 1 - errors;
+                lastDiscrepancy = discrepancy;
+                shift = 1;
+            } else {
+                shift++;
+            }
+            locator = updated;
+        }
+        for (let i = 0; i < locator.length; i++) {
+            locator[i] = locator[i] || 0;
+        }
+        if (2 * errors > ecCount) {
+            return false;
+        }
+
+        // Chien search: the codeword at index k carries power n - 1 - k
+        const positions = [];
+        for (let power = 0; power < n; power++) {
+            if (gfEval(locator, EXP[(255 - power) % 255]) === 0) {
+                positions.push(power);
+            }
+        }
+        if (positions.length !== errors) {
+            return false;
+        }
+
+        // Forney: error values from the evaluator polynomial
+        const evaluator = new Uint8Array(ecCount);
+        for (let i = 0; i < ecCount; i++) {
+            for (let j = 0; j <= i && j < locator.length; j++) {
+                evaluator[i] ^= gfMul(syndromes[i - j], locator[j]);
+            }
+        }
+        const derivative = [];
+        for (let i = 1; i < locator.length; i += 2) {
+            derivative[i - 1] = locator[i];
+            derivative[i] = 0;
+        }
+        for (const power of positions) {
+            const inverse = EXP[(255 - power) % 255];
+            const denominator = gfEval(derivative, inverse);
+            if (denominator === 0) {
+                return false;
+            }
+            const magnitude = gfMul(EXP[power], gfDiv(gfEval(evaluator, inverse), denominator));
+            block[n - 1 - power] ^= magnitude;
+        }
+
+        for (let i = 0; i < ecCount; i++) {
+            let value = 0;
+            for (let k = 0; k < n; k++) {
+                value = gfMul(value, EXP[i]) ^ block[k];
+            }
+            if (value !== 0) {
+                return false;
+            }
+        }
+        return true;
+    }
+
+    // ---- Binarization
+
+    // Dark/light per pixel (1 = dark) against the local brightness of 8x8
+    // blocks, averaged over the 5x5 blocks around each one, so uneven
+    // lighting and shadows across the frame do not swallow modules
+    function binarize(rgba, width, height) {
+        const size = width * height;
+        const gray = new Uint8Array(size);
+        for (let i = 0, j = 0; i < size; i++, j += 4) {
+            gray[i] = (rgba[j] * 77 + rgba[j + 1] * 150 + rgba[j + 2] * 29) >> 8;
+        }
+
+        const bits = new Uint8Array(size);
+        const columns = width >> 3;
+        const rows = height >> 3;
+        if (columns < 5 || rows < 5) {
+            let sum = 0;
+            for (let i = 0; i < size; i++) {
+                sum += gray[i];
+            }
+            const threshold = sum / size;
+            for (let i = 0; i < size; i++) {
+                bits[i] = gray[i] <= threshold ? 1 : 0;
+            }
+            return bits;
+        }
+
+        const averages = new Uint8Array(columns * rows);
+        for (let by = 0; by < rows; by++) {
+            const top = Math.min(by << 3, height - 8);
+            for (let bx = 0; bx < columns; bx++) {
+                const left = Math.min(bx << 3, width - 8);
+                let sum = 0;
+                let min = 255;
+                let max = 0;
+                for (let y = 0; y < 8; y++) {
+                    const offset = (top + y) * width + left;
+                    for (let x = 0; x < 8; x++) {
+                        const value = gray[offset + x];
+                        sum += value;
+                        if (value < min) {
+                            min = value;
+                        }
+                        if (value > max) {
+                            max = value;
+                        }
+                    }
+                }
+                let average = sum >> 6;
+                if (max - min <= 24) {
+                    // Flat block: assume background unless the neighbours
+                    // say it sits inside something darker
+                    average = min >> 1;
+                    if (by > 0 && bx > 0) {
+                        const neighbours = (averages[(by - 1) * columns + bx] +
+                            2 * averages[by * columns + bx - 1] +
+                            averages[(by - 1) * columns + bx - 1]) >> 2;
+                        if (min < neighbours) {
+                            average = neighbours;
+                        }
+                    }
+                }
+                averages[by * columns + bx] = average;
+            }
+        }
+
+        for (let by = 0; by < rows; by++) {
+            const top = Math.min(by << 3, height - 8);
+            const centerY = Math.min(Math.max(by, 2), rows - 3);
+            for (let bx = 0; bx < columns; bx++) {
+                const left = Math.min(bx << 3, width - 8);
+                const centerX = Math.min(Math.max(bx, 2), columns - 3);
+                let sum = 0;
+                for (let dy = -2; dy <= 2; dy++) {
+                    const row = (centerY + dy) * columns + centerX;
+                    sum += averages[row - 2] + averages[row - 1] + averages[row] + averages[row + 1] + averages[row + 2];
+                }
+                const threshold = sum / 25;
+                for (let y = 0; y < 8; y++) {
+                    const offset = (top + y) * width + left;
+                    for (let x = 0; x < 8; x++) {
+                        bits[offset + x] = gray[offset + x] <= threshold ? 1 : 0;
+                    }
+                }
+            }
+        }
+
+        // Right and bottom strips narrower than a block follow the last block
+        for (let y = 0; y < height; y++) {
+            for (let x = columns << 3; x < width; x++) {
+                bits[y * width + x] = bits[y * width + x - 1];
+            }
+        }
+        for (let y = rows << 3; y < height; y++) {
+            bits.copyWithin(y * width, (y - 1) * width, y * width);
+        }
+        return bits;
+    }
+
+    // ---- Finder patterns (dark:light:dark:light:dark = 1:1:3:1:1)
+
+    function finderRatio(counts, tolerance) {
+        const total = counts[0] + counts[1] + counts[2] + counts[3] + counts[4];
+        if (total < 7) {
+            return false;
+        }
+        const module = total / 7;
+        const variance = module / tolerance;
+        return Math.abs(module - counts[0]) < variance &&
+            Math.abs(module - counts[1]) < variance &&
+            Math.abs(3 * module - counts[2]) < 3 * variance &&
+            Math.abs(module - counts[3]) < variance &&
+            Math.abs(module - counts[4]) < variance;
+    }
+
+    function centerFromEnd(counts, end) {
+        return end - counts[4] - counts[3] - counts[2] / 2;
+    }
+
+    class FinderSearch {
+        constructor(image) {
+            this.image = image;
+            this.centers = [];
+        }
+
+        dark(x, y) {
+            return this.image.bits[y * this.image.width + x] === 1;
+        }
+
+        find() {
+            const { width, height } = this.image;
+            for (let y = 1; y < height; y += 2) {
+                const counts = [0, 0, 0, 0, 0];
+                let state = 0;
+                for (let x = 0; x < width; x++) {
+                    if (this.dark(x, y)) {
+                        if (state & 1) {
+                            state++;
+                        }
+                        counts[state]++;
+                    } else if (state & 1) {
+                        counts[state]++;
+                    } else if (state === 4) {
+                        if (finderRatio(counts, 2) && this.confirm(counts, y, x)) {
+                            state = 0;
+                            counts.fill(0);
+                        } else {
+                            counts[0] = counts[2];
+                            counts[1] = counts[3];
+                            counts[2] = counts[4];
+                            counts[3] = 1;
+                            counts[4] = 0;
+                            state = 3;
+                        }
+                    } else {
+                        counts[++state]++;
+                    }
+                }
+                if (finderRatio(counts, 2)) {
+                    this.confirm(counts, y, width);
+                }
+            }
+            return this.centers;
+        }
+
+        // Cross-checks a horizontal hit vertically, horizontally again and
+        // diagonally, then merges it with a centre found on earlier rows
+        confirm(counts, y, end) {
+            const total = counts[0] + counts[1] + counts[2] + counts[3] + counts[4];
+            let centerX = centerFromEnd(counts, end);
+            const centerY = this.crossCheck(Math.floor(centerX), y, 0, 1, counts[2], total);
+            if (isNaN(centerY)) {
+                return false;
+            }
+            centerX = this.crossCheck(Math.floor(centerX), Math.floor(centerY), 1, 0, counts[2], total);
+            if (isNaN(centerX) || !this.crossCheckDiagonal(Math.floor(centerX), Math.floor(centerY))) {
+                return false;
+            }
+
+            const moduleSize = total / 7;
+            for (const center of this.centers) {
+                if (Math.abs(centerY - center.y) <= moduleSize && Math.abs(centerX - center.x) <= moduleSize) {
+                    const difference = Math.abs(moduleSize - center.moduleSize);
+                    if (difference <= 1 || difference <= center.moduleSize) {
+                        const count = center.count + 1;
+                        center.x = (center.count * center.x + centerX) / count;
+                        center.y = (center.count * center.y + centerY) / count;
+                        center.moduleSize = (center.count * center.moduleSize + moduleSize) / count;
+                        center.count = count;
+                        return true;
+                    }
+                }
+            }
+            this.centers.push({ x: centerX, y: centerY, moduleSize: moduleSize, count: 1 });
+            return true;
+        }
+
+        // Runs of the 1:1:3:1:1 pattern along (dx, dy) through (x, y);
+        // returns the refined centre coordinate along that axis or NaN
+        crossCheck(x, y, dx, dy, maxCount, originalTotal) {
+            const { width, height } = this.image;
+            const inside = (px, py) => px >= 0 && py >= 0 && px < width && py < height;
+            const counts = [0, 0, 0, 0, 0];
+
+            let px = x;
+            let py = y;
+            while (inside(px, py) && this.dark(px, py)) {
+                counts[2]++;
+                px -= dx;
+                py -= dy;
+            }
+            if (!inside(px, py)) {
+                return NaN;
+            }
+            while (inside(px, py) && !this.dark(px, py) && counts[1] <= maxCount) {
+                counts[1]++;
+                px -= dx;
+                py -= dy;
+            }
+            if (!inside(px, py) || counts[1] > maxCount) {
+                return NaN;
+            }
+            while (inside(px, py) && this.dark(px, py) && counts[0] <= maxCount) {
+                counts[0]++;
+                px -= dx;
+                py -= dy;
+            }
+            if (counts[0] > maxCount) {
+                return NaN;
+            }
+
+            px = x + dx;
+            py = y + dy;
+            while (inside(px, py) && this.dark(px, py)) {
+                counts[2]++;
+                px += dx;
+                py += dy;
+            }
+            if (!inside(px, py)) {
+                return NaN;
+            }
+            while (inside(px, py) && !this.dark(px, py) && counts[3] < maxCount) {
+                counts[3]++;
+                px += dx;
+                py += dy;
+            }
+            if (!inside(px, py) || counts[3] >= maxCount) {
+                return NaN;
+            }
+            while (inside(px, py) && this.dark(px, py) && counts[4] < maxCount) {
+                counts[4]++;
+                px += dx;
+                py += dy;
+            }
+            if (counts[4] >= maxCount) {
+                return NaN;
+            }
+
+            const total = counts[0] + counts[1] + counts[2] + counts[3] + counts[4];
+            if (5 * Math.abs(total - originalTotal) >= 2 * originalTotal || !finderRatio(counts, 2)) {
+                return NaN;
+            }
+            return centerFromEnd(counts, dx ? px : py);
+        }
+
+        crossCheckDiagonal(x, y) {
+            const { width, height } = this.image;
+            const counts = [0, 0, 0, 0, 0];
+            let i = 0;
+            while (x >= i && y >= i && this.dark(x - i, y - i)) {
+                counts[2]++;
+                i++;
+            }
+            while (x >= i && y >= i && !this.dark(x - i, y - i)) {
+                counts[1]++;
+                i++;
+            }
+            while (x >= i && y >= i && this.dark(x - i, y - i)) {
+                counts[0]++;
+                i++;
+            }
+            i = 1;
+            while (x + i < width && y + i < height && this.dark(x + i, y + i)) {
+                counts[2]++;
+                i++;
+            }
+            while (x + i < width && y + i < height && !this.dark(x + i, y + i)) {
+                counts[3]++;
+                i++;
+            }
+            while (x + i < width && y + i < height && this.dark(x + i, y + i)) {
+                counts[4]++;
+                i++;
+            }
+            return counts.every(count => count > 0) && finderRatio(counts, 1.333);
+        }
+    }
+
+    function distance(a, b) {
+        return Math.hypot(a.x - b.x, a.y - b.y);
+    }
+
+    // The three centres of similar module size closest to a right
+    // isosceles triangle, as [bottomLeft, topLeft, topRight]
+    function selectFinderPatterns(centers) {
+        let candidates = centers.filter(center => center.count >= 2);
+        if (candidates.length < 3) {
+            candidates = centers.slice();
+        }
+        if (candidates.length < 3) {
+            return null;
+        }
+        candidates.sort((a, b) => a.moduleSize - b.moduleSize);
+
+        let best = null;
+        let bestScore = Infinity;
+        for (let i = 0; i < candidates.length - 2; i++) {
+            for (let j = i + 1; j < candidates.length - 1; j++) {
+                for (let k = j + 1; k < candidates.length; k++) {
+                    if (candidates[k].moduleSize > candidates[i].moduleSize * 1.4) {
+                        break;
+                    }
+                    const sides = [
+                        (candidates[i].x - candidates[j].x) ** 2 + (candidates[i].y - candidates[j].y) ** 2,
+                        (candidates[j].x - candidates[k].x) ** 2 + (candidates[j].y - candidates[k].y) ** 2,
+                        (candidates[i].x - candidates[k].x) ** 2 + (candidates[i].y - candidates[k].y) ** 2
+                    ].sort((a, b) => a - b);
+                    const score = Math.abs(sides[2] - 2 * sides[1]) + Math.abs(sides[2] - 2 * sides[0]);
+                    if (score < bestScore) {
+                        bestScore = score;
+                        best = [candidates[i], candidates[j], candidates[k]];
+                    }
+                }
+            }
+        }
+        if (!best) {
+            return null;
+        }
+
+        // The top-left centre is the one opposite the longest side
+        const [p0, p1, p2] = best;
+        const d01 = distance(p0, p1);
+        const d12 = distance(p1, p2);
+        const d02 = distance(p0, p2);
+        let a;
+        let b;
+        let c;
+        if (d12 >= d01 && d12 >= d02) {
+            [b, a, c] = [p0, p1, p2];
+        } else if (d02 >= d12 && d02 >= d01) {
+            [b, a, c] = [p1, p0, p2];
+        } else {
+            [b, a, c] = [p2, p0, p1];
+        }
+        if ((c.x - b.x) * (a.y - b.y) - (c.y - b.y) * (a.x - b.x) < 0) {
+            [a, c] = [c, a];
+        }
+        return [a, b, c];
+    }
+
+    // ---- Module size, dimension and alignment pattern
+
+    // Length of the dark-light-dark run from one finder centre towards
+    // another (in both directions), measured on the pixels
+    function runLength(image, fromX, fromY, toX, toY) {
+        const { width, height, bits } = image;
+        const steep = Math.abs(toY - fromY) > Math.abs(toX - fromX);
+        if (steep) {
+            [fromX, fromY] = [fromY, fromX];
+            [toX, toY] = [toY, toX];
+        }
+        const dx = Math.abs(toX - fromX);
+        const dy = Math.abs(toY - fromY);
+        let error = -dx / 2;
+        const xStep = fromX < toX ? 1 : -1;
+        const yStep = fromY < toY ? 1 : -1;
+        let state = 0;
+        const end = toX + xStep;
+        for (let x = fromX, y = fromY; x !== end; x += xStep) {
+            const realX = steep ? y : x;
+            const realY = steep ? x : y;
+            if (realX < 0 || realY < 0 || realX >= width || realY >= height) {
+                break;
+            }
+            if ((state === 1) === (bits[realY * width + realX] === 1)) {
+                if (state === 2) {
+                    return Math.hypot(x - fromX, y - fromY);
+                }
+                state++;
+            }
+            error += dy;
+            if (error > 0) {
+                if (y === toY) {
+                    break;
+                }
+                y += yStep;
+                error -= dx;
+            }
+        }
+        if (state === 2) {
+            return Math.hypot(end - fromX, toY - fromY);
+        }
+        return NaN;
+    }
+
+    function runBothWays(image, fromX, fromY, toX, toY) {
+        let result = runLength(image, fromX, fromY, toX, toY);
+
+        // Mirror the target through the centre, clipped to the image
+        let scale = 1;
+        let otherX = fromX - (toX - fromX);
+        if (otherX < 0) {
+            scale = fromX / (fromX - otherX);
+            otherX = 0;
+        } else if (otherX >= image.width) {
+            scale = (image.width - 1 - fromX) / (otherX - fromX);
+            otherX = image.width - 1;
+        }
+        let otherY = Math.floor(fromY - (toY - fromY) * scale);
+        scale = 1;
+        if (otherY < 0) {
+            scale = fromY / (fromY - otherY);
+            otherY = 0;
+        } else if (otherY >= image.height) {
+            scale = (image.height - 1 - fromY) / (otherY - fromY);
+            otherY = image.height - 1;
+        }
+        otherX = Math.floor(fromX + (otherX - fromX) * scale);
+
+        result += runLength(image, fromX, fromY, otherX, otherY);
+        // Both halves include the centre pixel
+        return result - 1;
+    }
+
+    function moduleSizeOneWay(image, from, to) {
+        const first = runBothWays(image, Math.floor(from.x), Math.floor(from.y), Math.floor(to.x), Math.floor(to.y));
+        const second = runBothWays(image, Math.floor(to.x), Math.floor(to.y), Math.floor(from.x), Math.floor(from.y));
+        if (isNaN(first)) {
+            return second / 7;
+        }
+        if (isNaN(second)) {
+            return first / 7;
+        }
+        return (first + second) / 14;
+    }
+
+    function estimateModuleSize(image, topLeft, topRight, bottomLeft) {
+        return (moduleSizeOneWay(image, topLeft, topRight) + moduleSizeOneWay(image, topLeft, bottomLeft)) / 2;
+    }
+
+    function findAlignment(image, moduleSize, estimateX, estimateY, allowanceFactor) {
+        const allowance = Math.floor(allowanceFactor * moduleSize);
+        const left = Math.max(0, estimateX - allowance);
+        const right = Math.min(image.width - 1, estimateX + allowance);
+        const top = Math.max(0, estimateY - allowance);
+        const bottom = Math.min(image.height - 1, estimateY + allowance);
+        if (right - left < moduleSize * 3 || bottom - top < moduleSize * 3) {
+            return null;
+        }
+
+        const { width, bits } = image;
+        const dark = (x, y) => bits[y * width + x] === 1;
+        const ratio = counts => counts.every(count => Math.abs(moduleSize - count) < moduleSize / 2);
+        const found = [];
+
+        const crossCheckVertical = (startY, x, maxCount, originalTotal) => {
+            const counts = [0, 0, 0];
+            let y = startY;
+            while (y >= 0 && dark(x, y) && counts[1] <= maxCount) {
+                counts[1]++;
+                y--;
+            }
+            if (y < 0 || counts[1] > maxCount) {
+                return NaN;
+            }
+            while (y >= 0 && !dark(x, y) && counts[0] <= maxCount) {
+                counts[0]++;
+                y--;
+            }
+            if (counts[0] > maxCount) {
+                return NaN;
+            }
+            y = startY + 1;
+            while (y < image.height && dark(x, y) && counts[1] <= maxCount) {
+                counts[1]++;
+                y++;
+            }
+            if (y === image.height || counts[1] > maxCount) {
+                return NaN;
+            }
+            while (y < image.height && !dark(x, y) && counts[2] <= maxCount) {
+                counts[2]++;
+                y++;
+            }
+            if (counts[2] > maxCount) {
+                return NaN;
+            }
+            const total = counts[0] + counts[1] + counts[2];
+            if (5 * Math.abs(total - originalTotal) >= 2 * originalTotal || !ratio(counts)) {
+                return NaN;
+            }
+            return y - counts[2] - counts[1] / 2;
+        };
+
+        const confirm = (counts, y, end) => {
+            const total = counts[0] + counts[1] + counts[2];
+            const centerX = end - counts[2] - counts[1] / 2;
+            const centerY = crossCheckVertical(y, Math.floor(centerX), 2 * counts[1], total);
+            if (isNaN(centerY)) {
+                return null;
+            }
+            const size = total / 3;
+            for (const center of found) {
+                if (Math.abs(centerY - center.y) <= size && Math.abs(centerX - center.x) <= size) {
+                    const difference = Math.abs(size - center.moduleSize);
+                    if (difference <= 1 || difference <= center.moduleSize) {
+                        return { x: (center.x + centerX) / 2, y: (center.y + centerY) / 2 };
+                    }
+                }
+            }
+            found.push({ x: centerX, y: centerY, moduleSize: size });
+            return null;
+        };
+
+        // Rows from the middle of the region outwards
+        const middle = top + ((bottom - top) >> 1);
+        for (let i = 0; i <= bottom - top; i++) {
+            const y = middle + ((i & 1) === 0 ? (i + 1) >> 1 : -((i + 1) >> 1));
+            if (y < top || y > bottom) {
+                continue;
+            }
+            const counts = [0, 0, 0];
+            let x = left;
+            while (x <= right && !dark(x, y)) {
+                x++;
+            }
+            let state = 0;
+            for (; x <= right; x++) {
+                if (dark(x, y)) {
+                    if (state === 1) {
+                        counts[1]++;
+                    } else if (state === 2) {
+                        if (ratio(counts)) {
+                            const center = confirm(counts, y, x);
+                            if (center) {
+                                return center;
+                            }
+                        }
+                        counts[0] = counts[2];
+                        counts[1] = 1;
+                        counts[2] = 0;
+                        state = 1;
+                    } else {
+                        counts[++state]++;
+                    }
+                } else {
+                    if (state === 1) {
+                        state++;
+                    }
+                    counts[state]++;
+                }
+            }
+            if (ratio(counts)) {
+                const center = confirm(counts, y, right + 1);
+                if (center) {
+                    return center;
+                }
+            }
+        }
+        return found.length ? found[0] : null;
+    }
+
+    // ---- Perspective transform (unit square <-> quadrilateral)
+
+    class Perspective {
+        constructor(a11, a21, a31, a12, a22, a32, a13, a23, a33) {
+            Object.assign(this, { a11, a21, a31, a12, a22, a32, a13, a23, a33 });
+        }
+
+        static squareToQuad(x0, y0, x1, y1, x2, y2, x3, y3) {
+            const dx3 = x0 - x1 + x2 - x3;
+            const dy3 = y0 - y1 + y2 - y3;
+            if (dx3 === 0 && dy3 === 0) {
+                return new Perspective(x1 - x0, x2 - x1, x0, y1 - y0, y2 - y1, y0, 0, 0, 1);
+            }
+            const dx1 = x1 - x2;
+            const dx2 = x3 - x2;
+            const dy1 = y1 - y2;
+            const dy2 = y3 - y2;
+            const denominator = dx1 * dy2 - dx2 * dy1;
+            const a13 = (dx3 * dy2 - dx2 * dy3) / denominator;
+            const a23 = (dx1 * dy3 - dx3 * dy1) / denominator;
+            return new Perspective(x1 - x0 + a13 * x1, x3 - x0 + a23 * x3, x0,
+                                   y1 - y0 + a13 * y1, y3 - y0 + a23 * y3, y0, a13, a23, 1);
+        }
+
+        static quadToQuad(from, to) {
+            const toSquare = Perspective.squareToQuad(...from).adjoint();
+            return Perspective.squareToQuad(...to).times(toSquare);
+        }
+
+        adjoint() {
+            const { a11, a21, a31, a12, a22, a32, a13, a23, a33 } = this;
+            return new Perspective(
+                a22 * a33 - a23 * a32, a23 * a31 - a21 * a33, a21 * a32 - a22 * a31,
+                a13 * a32 - a12 * a33, a11 * a33 - a13 * a31, a12 * a31 - a11 * a32,
+                a12 * a23 - a13 * a22, a13 * a21 - a11 * a23, a11 * a22 - a12 * a21);
+        }
+
+        times(o) {
+            return new Perspective(
+                this.a11 * o.a11 + this.a21 * o.a12 + this.a31 * o.a13,
+                this.a11 * o.a21 + this.a21 * o.a22 + this.a31 * o.a23,
+                this.a11 * o.a31 + this.a21 * o.a32 + this.a31 * o.a33,
+                this.a12 * o.a11 + this.a22 * o.a12 + this.a32 * o.a13,
+                this.a12 * o.a21 + this.a22 * o.a22 + this.a32 * o.a23,
+                this.a12 * o.a31 + this.a22 * o.a32 + this.a32 * o.a33,
+                this.a13 * o.a11 + this.a23 * o.a12 + this.a33 * o.a13,
+                this.a13 * o.a21 + this.a23 * o.a22 + this.a33 * o.a23,
+                this.a13 * o.a31 + this.a23 * o.a32 + this.a33 * o.a33);
+        }
+
+        apply(x, y) {
+            const denominator = this.a13 * x + this.a23 * y + this.a33;
+            return {
+                x: (this.a11 * x + this.a21 * y + this.a31) / denominator,
+                y: (this.a12 * x + this.a22 * y + this.a32) / denominator
+            };
+        }
+    }
+
+    // Grid of modules (1 = dark), or null if it falls outside the frame
+    function sampleGrid(image, transform, dimension) {
+        const { width, height, bits } = image;
+        const grid = new Uint8Array(dimension * dimension);
+        for (let y = 0; y < dimension; y++) {
+            for (let x = 0; x < dimension; x++) {
+                const point = transform.apply(x + 0.5, y + 0.5);
+                let px = Math.floor(point.x);
+                let py = Math.floor(point.y);
+                if (px < -1 || py < -1 || px > width || py > height || isNaN(px) || isNaN(py)) {
+                    return null;
+                }
+                // Points just past the edge are nudged back in
+                px = Math.min(Math.max(px, 0), width - 1);
+                py = Math.min(Math.max(py, 0), height - 1);
+                grid[y * dimension + x] = bits[py * width + px];
+            }
+        }
+        return grid;
+    }
+
+    function nominalDimension(topLeft, topRight, bottomLeft, moduleSize) {
+        const dimension = ((Math.round(distance(topLeft, topRight) / moduleSize) +
+                            Math.round(distance(topLeft, bottomLeft) / moduleSize)) >> 1) + 7;
+        switch (dimension & 3) {
+            case 0: return dimension + 1;
+            case 2: return dimension - 1;
+            case 3: return 0;
+            default: return dimension;
+        }
+    }
+
+    // Bottom-right corner offsets (in modules) tried when a symbol fails to
+    // read: without an alignment pattern the corner is only a parallelogram
+    // guess, which perspective skews. Error correction rejects wrong guesses.
+    const CORNER_OFFSETS = [];
+    for (let dy = -1.5; dy <= 1.5; dy += 0.5) {
+        for (let dx = -1.5; dx <= 1.5; dx += 0.5) {
+            CORNER_OFFSETS.push([dx, dy]);
+        }
+    }
+    CORNER_OFFSETS.sort((a, b) => Math.hypot(a[0], a[1]) - Math.hypot(b[0], b[1]));
+
+    function locate(transform, dimension, topLeft, topRight, bottomLeft) {
+        const corner = (x, y) => transform.apply(x, y);
+        return {
+            topLeftCorner: corner(0, 0),
+            topRightCorner: corner(dimension, 0),
+            bottomRightCorner: corner(dimension, dimension),
+            bottomLeftCorner: corner(0, dimension),
+            topLeftFinderPattern: { x: topLeft.x, y: topLeft.y },
+            topRightFinderPattern: { x: topRight.x, y: topRight.y },
+            bottomLeftFinderPattern: { x: bottomLeft.x, y: bottomLeft.y }
+        };
+    }
+
+    // Yields sampled candidate symbols, most likely first.
+    function* detect(image) {
+        const patterns = selectFinderPatterns(new FinderSearch(image).find());
+        if (!patterns) {
+            return;
+        }
+        const [bottomLeft, topLeft, topRight] = patterns;
+
+        const moduleSize = estimateModuleSize(image, topLeft, topRight, bottomLeft);
+        if (!(moduleSize >= 1)) {
+            return;
+        }
+        const nominal = nominalDimension(topLeft, topRight, bottomLeft, moduleSize);
+        if (!nominal) {
+            return;
+        }
+        // Unit steps along the symbol's rows and columns, one module long
+        const across = distance(topLeft, topRight);
+        const down = distance(topLeft, bottomLeft);
+
+        for (const dimension of [nominal, nominal - 4, nominal + 4]) {
+            if (dimension < 21 || dimension > 177) {
+                continue;
+            }
+            const stepX = { x: (topRight.x - topLeft.x) / (dimension - 7), y: (topRight.y - topLeft.y) / (dimension - 7) };
+            const stepY = { x: (bottomLeft.x - topLeft.x) / (dimension - 7), y: (bottomLeft.y - topLeft.y) / (dimension - 7) };
+            if (Math.abs(across / (dimension - 7) - moduleSize) > moduleSize ||
+                Math.abs(down / (dimension - 7) - moduleSize) > moduleSize) {
+                continue;
+            }
+
+            let alignment = null;
+            if (dimension > 21) {
+                // Bottom-right alignment pattern, 3 modules in from the corner
+                const correction = 1 - 3 / (dimension - 7);
+                const estimateX = Math.floor(topLeft.x + correction * (topRight.x - topLeft.x + bottomLeft.x - topLeft.x));
+                const estimateY = Math.floor(topLeft.y + correction * (topRight.y - topLeft.y + bottomLeft.y - topLeft.y));
+                for (let factor = 4; factor <= 16 && !alignment; factor <<= 1) {
+                    alignment = findAlignment(image, moduleSize, estimateX, estimateY, factor);
+                }
+            }
+
+            const far = dimension - 3.5;
+            const anchors = [];
+            if (alignment) {
+                anchors.push({ point: alignment, source: far - 3, offsets: CORNER_OFFSETS.slice(0, 1) });
+            }
+            // An alignment match can be spurious (rotated symbols), so the
+            // parallelogram corner is always tried as well
+            anchors.push({
+                point: { x: topRight.x - topLeft.x + bottomLeft.x, y: topRight.y - topLeft.y + bottomLeft.y },
+                source: far,
+                offsets: dimension === nominal ? CORNER_OFFSETS : CORNER_OFFSETS.slice(0, 1)
+            });
+            for (const anchor of anchors) {
+                for (const [dx, dy] of anchor.offsets) {
+                    const bottomRight = {
+                        x: anchor.point.x + dx * stepX.x + dy * stepY.x,
+                        y: anchor.point.y + dx * stepX.y + dy * stepY.y
+                    };
+                    const transform = Perspective.quadToQuad(
+                        [3.5, 3.5, far, 3.5, anchor.source, anchor.source, 3.5, far],
+                        [topLeft.x, topLeft.y, topRight.x, topRight.y, bottomRight.x, bottomRight.y, bottomLeft.x, bottomLeft.y]);
+                    const grid = sampleGrid(image, transform, dimension);
+                    if (grid) {
+                        yield {
+                            grid: grid,
+                            dimension: dimension,
+                            location: locate(transform, dimension, topLeft, topRight, bottomLeft)
+                        };
+                    }
+                }
+            }
+        }
+    }
+
+    // ---- Format and version information
+
+    function bchCode(value, generator, bits) {
+        let remainder = value << bits;
+        const top = 31 - Math.clz32(generator);
+        while (remainder >= 1 << top) {
+            remainder ^= generator << (31 - Math.clz32(remainder) - top);
+        }
+        return (value << bits) | remainder;
+    }
+
+    const FORMAT_CODES = Array.from({ length: 32 }, (_, data) => bchCode(data, 0x537, 10) ^ 0x5412);
+    const VERSION_CODES = Array.from({ length: 34 }, (_, i) => bchCode(i + 7, 0x1f25, 12));
+
+    function popcount(value) {
+        let count = 0;
+        for (; value; value &= value - 1) {
+            count++;
+        }
+        return count;
+    }
+
+    // Index of the closest valid code within 3 bit errors, or -1
+    function closestCode(codes, ...readings) {
+        let best = -1;
+        let bestDistance = 4;
+        codes.forEach((code, index) => {
+            for (const reading of readings) {
+                const bits = popcount(code ^ reading);
+                if (bits < bestDistance) {
+                    best = index;
+                    bestDistance = bits;
+                }
+            }
+        });
+        return best;
+    }
+
+    class ModuleReader {
+        constructor(grid, dimension, mirrored) {
+            this.grid = grid;
+            this.dimension = dimension;
+            this.mirrored = mirrored;
+        }
+
+        get(x, y) {
+            return this.mirrored ? this.grid[x * this.dimension + y] : this.grid[y * this.dimension + x];
+        }
+
+        bits(positions) {
+            return positions.reduce((value, [x, y]) => (value << 1) | this.get(x, y), 0);
+        }
+
+        format() {
+            const size = this.dimension;
+            const first = [];
+            for (let x = 0; x <= 5; x++) {
+                first.push([x, 8]);
+            }
+            first.push([7, 8], [8, 8], [8, 7]);
+            for (let y = 5; y >= 0; y--) {
+                first.push([8, y]);
+            }
+            const second = [];
+            for (let y = size - 1; y >= size - 7; y--) {
+                second.push([8, y]);
+            }
+            for (let x = size - 8; x < size; x++) {
+                second.push([x, 8]);
+            }
+            const data = closestCode(FORMAT_CODES, this.bits(first), this.bits(second));
+            return data < 0 ? null : { ecLevel: EC_LEVEL_INDEX[data >> 3], mask: data & 7 };
+        }
+
+        version() {
+            const size = this.dimension;
+            const provisional = (size - 17) >> 2;
+            if (provisional <= 6) {
+                return provisional;
+            }
+            const topRight = [];
+            const bottomLeft = [];
+            for (let j = 5; j >= 0; j--) {
+                for (let i = size - 9; i >= size - 11; i--) {
+                    topRight.push([i, j]);
+                    bottomLeft.push([j, i]);
+                }
+            }
+            for (const positions of [topRight, bottomLeft]) {
+                const index = closestCode(VERSION_CODES, this.bits(positions));
+                if (index >= 0 && index + 7 === provisional) {
+                    return index + 7;
+                }
+            }
+            return null;
+        }
+    }
+
+    // ---- Codewords
+
+    function functionPatterns(version) {
+        const size = version * 4 + 17;
+        const used = new Uint8Array(size * size);
+        const mark = (left, top, width, height) => {
+            for (let y = top; y < top + height; y++) {
+                used.fill(1, y * size + left, y * size + left + width);
+            }
+        };
+        // Finder patterns with separators and format information
+        mark(0, 0, 9, 9);
+        mark(size - 8, 0, 8, 9);
+        mark(0, size - 8, 9, 8);
+        const centers = ALIGNMENT_CENTERS[version - 1];
+        const last = centers.length - 1;
+        centers.forEach((cy, i) => centers.forEach((cx, j) => {
+            if ((i === 0 && (j === 0 || j === last)) || (i === last && j === 0)) {
+                return;
+            }
+            mark(cx - 2, cy - 2, 5, 5);
+        }));
+        // Timing patterns
+        mark(6, 9, 1, size - 17);
+        mark(9, 6, size - 17, 1);
+        if (version > 6) {
+            mark(size - 11, 0, 3, 6);
+            mark(0, size - 11, 6, 3);
+        }
+        return used;
+    }
+
+    const MASKS = [
+        (i, j) => ((i + j) & 1) === 0,
+        (i, j) => (i & 1) === 0,
+        (i, j) => j % 3 === 0,
+        (i, j) => (i + j) % 3 === 0,
+        (i, j) => ((Math.floor(i / 2) + Math.floor(j / 3)) & 1) === 0,
+        (i, j) => (i * j) % 6 === 0,
+        (i, j) => (((i * j) & 1) + ((i * j) % 3) & 1) === 0,
+        (i, j) => ((((i + j) & 1) + ((i * j) % 3)) & 1) === 0
+    ];
+
+    // Data and error correction codewords in placement order
+    function readCodewords(reader, version, mask) {
+        const size = reader.dimension;
+        const used = functionPatterns(version);
+        const isMasked = MASKS[mask];
+        const codewords = [];
+        let current = 0;
+        let count = 0;
+        let upwards = true;
+        for (let right = size - 1; right > 0; right -= 2) {
+            if (right === 6) {
+                right--;
+            }
+            for (let step = 0; step < size; step++) {
+                const y = upwards ? size - 1 - step : step;
+                for (let column = 0; column < 2; column++) {
+                    const x = right - column;
+                    if (used[y * size + x]) {
+                        continue;
+                    }
+                    current = (current << 1) | (reader.get(x, y) ^ (isMasked(y, x) ? 1 : 0));
+                    if (++count === 8) {
+                        codewords.push(current);
+                        current = 0;
+                        count = 0;
+                    }
+                }
+            }
+            upwards = !upwards;
+        }
+        return codewords;
+    }
+
+    // Splits the interleaved codewords into blocks, corrects each and
+    // returns the data codewords, or null if a block is beyond repair
+    function correctedData(codewords, version, ecLevel) {
+        const [ecPerBlock, ...groups] = EC_BLOCKS[version - 1][ecLevel];
+        const blocks = [];
+        for (let g = 0; g < groups.length; g += 2) {
+            for (let i = 0; i < groups[g]; i++) {
+                blocks.push({ dataCount: groups[g + 1], codewords: new Uint8Array(groups[g + 1] + ecPerBlock) });
+            }
+        }
+        const total = blocks.reduce((sum, block) => sum + block.codewords.length, 0);
+        if (codewords.length < total) {
+            return null;
+        }
+
+        const longData = blocks[blocks.length - 1].dataCount;
+        let offset = 0;
+        for (let i = 0; i < longData; i++) {
+            for (const block of blocks) {
+                if (i < block.dataCount) {
+                    block.codewords[i] = codewords[offset++];
+                }
+            }
+        }
+        for (let i = 0; i < ecPerBlock; i++) {
+            for (const block of blocks) {
+                block.codewords[block.dataCount + i] = codewords[offset++];
+            }
+        }
+
+        const data = [];
+        for (const block of blocks) {
+            if (!correctErrors(block.codewords, ecPerBlock)) {
+                return null;
+            }
+            for (let i = 0; i < block.dataCount; i++) {
+                data.push(block.codewords[i]);
+            }
+        }
+        return data;
+    }
+
+    // ---- Bit stream
+
+    class BitStream {
+        constructor(bytes) {
+            this.bytes = bytes;
+            this.position = 0;
+        }
+
+        available() {
+            return this.bytes.length * 8 - this.position;
+        }
+
+        read(count) {
+            if (count > this.available()) {
+                throw new Error('bit stream exhausted');
+            }
+            let value = 0;
+            for (let i = 0; i < count; i++, this.position++) {
+                value = (value << 1) | ((this.bytes[this.position >> 3] >> (7 - (this.position & 7))) & 1);
+            }
+            return value;
+        }
+    }
+
+    // ECI assignment number -> TextDecoder label
+    const ECI_CHARSETS = {
+        1: 'iso-8859-1', 3: 'iso-8859-1', 4: 'iso-8859-2', 5: 'iso-8859-3', 6: 'iso-8859-4', 7: 'iso-8859-5',
+        8: 'iso-8859-6', 9: 'iso-8859-7', 10: 'iso-8859-8', 11: 'iso-8859-9', 13: 'iso-8859-11', 15: 'iso-8859-13',
+        16: 'iso-8859-14', 17: 'iso-8859-15', 18: 'iso-8859-16', 20: 'shift_jis', 21: 'windows-1250',
+        22: 'windows-1251', 23: 'windows-1252', 24: 'windows-1256', 25: 'utf-16be', 26: 'utf-8', 27: 'us-ascii',
+        28: 'big5', 29: 'gb18030', 30: 'euc-kr'
+    };
+
+    function decodeBytes(bytes, charset) {
+        if (charset) {
+            try {
+                return new TextDecoder(charset).decode(bytes);
+            } catch (error) {
+                // Unknown label: fall through to the guess
+            }
+        }
+        // No ECI: UTF-8 when the bytes are valid UTF-8, else ISO-8859-1
+        try {
+            return new TextDecoder('utf-8', { fatal: true }).decode(bytes);
+        } catch (error) {
+            return String.fromCharCode(...bytes);
+        }
+    }
+
+    function countBits(mode, version) {
+        const range = version <= 9 ? 0 : version <= 26 ? 1 : 2;
+        return {
+            1: [10, 12, 14],
+            2: [9, 11, 13],
+            4: [8, 16, 16],
+            8: [8, 10, 12]
+        }[mode][range];
+    }
+
+    function parseSegments(data, version) {
+        const stream = new BitStream(data);
+        let text = '';
+        let charset = null;
+        while (stream.available() >= 4) {
+            const mode = stream.read(4);
+            if (mode === 0) {
+                break;
+            }
+            if (mode === 7) {
+                const first = stream.read(8);
+                let assignment;
+                if ((first & 0x80) === 0) {
+                    assignment = first;
+                } else if ((first & 0xc0) === 0x80) {
+                    assignment = ((first & 0x3f) << 8) | stream.read(8);
+                } else {
+                    assignment = ((first & 0x1f) << 16) | stream.read(16);
+                }
+                charset = ECI_CHARSETS[assignment] || null;
+                continue;
+            }
+            if (mode === 3) {
+                // Structured append header: symbol position and parity
+                stream.read(16);
+                continue;
+            }
+            if (mode === 5) {
+                continue;
+            }
+            if (mode === 9) {
+                stream.read(8);
+                continue;
+            }
+            if (![1, 2, 4, 8].includes(mode)) {
+                throw new Error(`unsupported mode ${mode}`);
+            }
+
+            let count = stream.read(countBits(mode, version));
+            if (mode === 1) {
+                while (count >= 3) {
+                    const value = stream.read(10);
+                    if (value >= 1000) {
+                        throw new Error('invalid numeric segment');
+                    }
+                    text += String(value).padStart(3, '0');
+                    count -= 3;
+                }
+                if (count === 2) {
+                    const value = stream.read(7);
+                    if (value >= 100) {
+                        throw new Error('invalid numeric segment');
+                    }
+                    text += String(value).padStart(2, '0');
+                } else if (count === 1) {
+                    const value = stream.read(4);
+                    if (value >= 10) {
+                        throw new Error('invalid numeric segment');
+                    }
+                    text += String(value);
+                }
+            } else if (mode === 2) {
+                while (count >= 2) {
+                    const value = stream.read(11);
+                    if (value >= 45 * 45) {
+                        throw new Error('invalid alphanumeric segment');
+                    }
+                    text += ALPHANUMERIC[Math.floor(value / 45)] + ALPHANUMERIC[value % 45];
+                    count -= 2;
+                }
+                if (count === 1) {
+                    const value = stream.read(6);
+                    if (value >= 45) {
+                        throw new Error('invalid alphanumeric segment');
+                    }
+                    text += ALPHANUMERIC[value];
+                }
+            } else if (mode === 4) {
+                const bytes = new Uint8Array(count);
+                for (let i = 0; i < count; i++) {
+                    bytes[i] = stream.read(8);
+                }
+                text += decodeBytes(bytes, charset);
+            } else {
+                const bytes = new Uint8Array(count * 2);
+                for (let i = 0; i < count; i++) {
+                    const value = stream.read(13);
+                    let assembled = (Math.floor(value / 0xc0) << 8) | (value % 0xc0);
+                    assembled += assembled < 0x1f00 ? 0x8140 : 0xc140;
+                    bytes[2 * i] = assembled >> 8;
+                    bytes[2 * i + 1] = assembled & 0xff;
+                }
+                text += new TextDecoder('shift_jis').decode(bytes);
+            }
+        }
+        return text;
+    }
+
+    function readSymbol(grid, dimension, mirrored) {
+        const reader = new ModuleReader(grid, dimension, mirrored);
+        const format = reader.format();
+        const version = format && reader.version();
+        if (!version) {
+            return null;
+        }
+        const data = correctedData(readCodewords(reader, version, format.mask), version, format.ecLevel);
+        if (!data) {
+            return null;
+        }
+        try {
+            return { data: parseSegments(data, version), version: version };
+        } catch (error) {
+            return null;
+        }
+    }
+
+    function decodeQR(rgba, width, height) {
+        const image = { bits: binarize(rgba, width, height), width: width, height: height };
+        for (const symbol of detect(image)) {
+            const result = readSymbol(symbol.grid, symbol.dimension, false) ||
+                readSymbol(symbol.grid, symbol.dimension, true);
+            if (result) {
+                result.location = symbol.location;
+                return result;
+            }
+        }
+        return null;
+    }
+
+    global.decodeQR = decodeQR;
+})(typeof self !== 'undefined' ? self : globalThis);
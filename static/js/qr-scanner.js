@@ -0,0 +1,264 @@
+/*
+ * Camera QR scanner shared by the verification pages.
+ *
+ * Frames are pulled with requestVideoFrameCallback (requestAnimationFrame
+ * where unsupported) and only one decode is in flight at a time, so slow
+ * devices skip frames instead of queueing them. Decoding uses the native
+ * BarcodeDetector when the browser has one, otherwise a downscaled centre
+ * region of the frame is handed to decodeQR (qr-decoder.js) in a Web Worker
+ * as a transferable buffer. Per-frame and time-to-detect timings are kept
+ * in `stats`. If the worker fails (e.g. the decoder could not be loaded into
+ * it) the scanner loads the decoder into the page and decodes on the main
+ * thread; if that fails too, `onError` is told and scanning stops.
+ *
+ * With `debounceMs` set the scanner can stay live across attendees: a code
+ * seen again within that window of its last sighting is not reported twice.
+ */
+class QRScanner {
+    constructor(video, options = {}) {
+        this.video = video;
+        this.onDecode = options.onDecode || function() {};
+        this.onStats = options.onStats || function() {};
+        this.onError = options.onError || function() {};
+        this.roiFraction = options.roiFraction || 0.7;
+        this.targetSize = options.targetSize || 360;
+        this.workerUrl = options.workerUrl || '/static/js/qr-decode-worker.js';
+        this.debounceMs = options.debounceMs || 0;
+        this.lastSeen = new Map();
+
+        this.canvas = document.createElement('canvas');
+        this.context = this.canvas.getContext('2d', { willReadFrequently: true });
+        this.detector = null;
+        this.worker = null;
+        this.mainThread = false;
+        this.running = false;
+        this.busy = false;
+        this.frameRequest = null;
+        this.frameId = 0;
+        this.frameStart = 0;
+        this.startedAt = 0;
+
+        this.stats = {
+            method: null,
+            frames: 0,
+            lastFrameMs: null,
+            avgFrameMs: null,
+            lastDecodeMs: null,
+            timeToDetectMs: null
+        };
+    }
+
+    async start() {
+        this.running = true;
+        this.startedAt = performance.now();
+
+        if (!this.detector && 'BarcodeDetector' in window) {
+            try {
+                const formats = await BarcodeDetector.getSupportedFormats();
+                if (formats.includes('qr_code')) {
+                    this.detector = new BarcodeDetector({ formats: ['qr_code'] });
+                    this.stats.method = 'BarcodeDetector';
+                }
+            } catch (error) {
+                this.detector = null;
+            }
+        }
+
+        if (!this.detector && !this.worker && !this.mainThread) {
+            this.worker = new Worker(this.workerUrl);
+            this.worker.onmessage = (event) => {
+                if (event.data.id === this.frameId) {
+                    this.handleResult(event.data.data, event.data.decodeMs);
+                }
+            };
+            this.worker.onerror = (event) => {
+                event.preventDefault();
+                this.workerFailed(event.message || 'decode worker error');
+            };
+            this.worker.onmessageerror = () => this.workerFailed('decode worker message error');
+            this.stats.method = 'decoder worker';
+        }
+
+        this.scheduleFrame();
+    }
+
+    stop() {
+        this.running = false;
+        this.busy = false;
+
+        if (this.frameRequest !== null) {
+            if (this.video.cancelVideoFrameCallback) {
+                this.video.cancelVideoFrameCallback(this.frameRequest);
+            } else {
+                cancelAnimationFrame(this.frameRequest);
+            }
+            this.frameRequest = null;
+        }
+
+        if (this.worker) {
+            this.worker.terminate();
+            this.worker = null;
+        }
+    }
+
+    scheduleFrame() {
+        if (!this.running) {
+            return;
+        }
+        if (this.video.requestVideoFrameCallback) {
+            this.frameRequest = this.video.requestVideoFrameCallback(() => this.processFrame());
+        } else {
+            this.frameRequest = requestAnimationFrame(() => this.processFrame());
+        }
+    }
+
+    processFrame() {
+        if (!this.running) {
+            return;
+        }
+
+        // Skip frames while the previous one is still decoding
+        if (!this.busy && this.video.readyState >= this.video.HAVE_CURRENT_DATA && this.video.videoWidth) {
+            this.busy = true;
+            this.frameId++;
+            this.frameStart = performance.now();
+
+            if (this.detector) {
+                this.detectNative();
+            } else if (this.worker) {
+                this.decodeInWorker();
+            } else if (this.mainThread && typeof decodeQR === 'function') {
+                this.decodeOnMainThread();
+            } else {
+                // Decoder still loading
+                this.busy = false;
+            }
+        }
+
+        this.scheduleFrame();
+    }
+
+    regionOfInterest() {
+        const width = this.video.videoWidth;
+        const height = this.video.videoHeight;
+        const side = Math.floor(Math.min(width, height) * this.roiFraction);
+
+        return {
+            sx: (width - side) >> 1,
+            sy: (height - side) >> 1,
+            side: side,
+            size: Math.min(side, this.targetSize)
+        };
+    }
+
+    captureRegion() {
+        const roi = this.regionOfInterest();
+
+        // Only resize the canvas when the region size actually changes
+        if (this.canvas.width !== roi.size) {
+            this.canvas.width = roi.size;
+            this.canvas.height = roi.size;
+        }
+
+        this.context.drawImage(this.video, roi.sx, roi.sy, roi.side, roi.side, 0, 0, roi.size, roi.size);
+        return { imageData: this.context.getImageData(0, 0, roi.size, roi.size), roi: roi };
+    }
+
+    decodeInWorker() {
+        const { imageData, roi } = this.captureRegion();
+
+        this.worker.postMessage({
+            id: this.frameId,
+            buffer: imageData.data.buffer,
+            width: roi.size,
+            height: roi.size
+        }, [imageData.data.buffer]);
+    }
+
+    decodeOnMainThread() {
+        const { imageData, roi } = this.captureRegion();
+        const start = performance.now();
+        const code = decodeQR(imageData.data, roi.size, roi.size);
+        this.handleResult(code ? code.data : null, performance.now() - start);
+    }
+
+    workerFailed(reason) {
+        console.error('QR decode worker failed:', reason);
+        if (this.worker) {
+            this.worker.terminate();
+            this.worker = null;
+        }
+        // The frame that was in flight will never be answered
+        this.busy = false;
+        this.mainThread = true;
+        this.stats.method = 'decoder main thread';
+
+        if (typeof decodeQR === 'function') {
+            return;
+        }
+        // Same decoder build the worker was given (?decoder=), loaded into the page
+        const script = document.createElement('script');
+        script.src = new URL(this.workerUrl, location.href).searchParams.get('decoder');
+        script.onerror = () => {
+            this.stop();
+            this.onError('The QR decoder could not be loaded. Please use manual input.');
+        };
+        document.head.appendChild(script);
+    }
+
+    async detectNative() {
+        const start = performance.now();
+        let data = null;
+
+        try {
+            const codes = await this.detector.detect(this.video);
+            data = codes.length > 0 ? codes[0].rawValue : null;
+        } catch (error) {
+            data = null;
+        }
+
+        this.handleResult(data, performance.now() - start);
+    }
+
+    handleResult(data, decodeMs) {
+        this.busy = false;
+
+        const frameMs = performance.now() - this.frameStart;
+        const stats = this.stats;
+        stats.frames++;
+        stats.lastFrameMs = frameMs;
+        stats.lastDecodeMs = decodeMs;
+        stats.avgFrameMs = stats.avgFrameMs === null ? frameMs : stats.avgFrameMs * 0.9 + frameMs * 0.1;
+
+        if (data && this.running && !this.isDuplicate(data)) {
+            stats.timeToDetectMs = performance.now() - this.startedAt;
+            this.onStats(stats);
+            this.onDecode(data, stats);
+            this.startedAt = performance.now();
+        } else if (stats.frames % 15 === 0) {
+            this.onStats(stats);
+        }
+    }
+
+    isDuplicate(data) {
+        if (!this.debounceMs) {
+            return false;
+        }
+
+        // Every sighting extends the window, so a code held in front of
+        // the camera is reported once however long it stays there
+        const now = performance.now();
+        const lastSeen = this.lastSeen.get(data);
+        this.lastSeen.set(data, now);
+
+        if (this.lastSeen.size > 100) {
+            for (const [code, seenAt] of this.lastSeen) {
+                if (now - seenAt > this.debounceMs) {
+                    this.lastSeen.delete(code);
+                }
+            }
+        }
+
+        return lastSeen !== undefined && now - lastSeen < this.debounceMs;
+    }
+}
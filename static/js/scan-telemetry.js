@@ -0,0 +1,64 @@
+/*
+ * Scanner latency telemetry shared by the verification pages.
+ *
+ * Each scan records how long the camera decode took, the verification
+ * round trip and the time until the result was painted. Samples are
+ * buffered and sent in batches (sendBeacon when the page is hidden) so
+ * reporting never adds a request per attendee.
+ */
+class ScanTelemetry {
+    constructor(url, deviceId, options = {}) {
+        this.url = url;
+        this.deviceId = deviceId;
+        this.flushMs = options.flushMs || 10000;
+        this.maxBatch = options.maxBatch || 50;
+        this.samples = [];
+        this.timer = null;
+
+        document.addEventListener('visibilitychange', () => {
+            if (document.visibilityState === 'hidden') {
+                this.flush(true);
+            }
+        });
+    }
+
+    // decodeMs is null for codes typed in by hand; displayStart is the
+    // performance.now() at which the result was handed to the DOM
+    record(decodeMs, rttMs, displayStart) {
+        requestAnimationFrame(() => {
+            // The frame after the update is the first one showing the result
+            requestAnimationFrame(() => {
+                this.samples.push({
+                    decode_ms: decodeMs,
+                    rtt_ms: rttMs,
+                    display_ms: performance.now() - displayStart
+                });
+                if (this.samples.length >= this.maxBatch) {
+                    this.flush();
+                } else if (!this.timer) {
+                    this.timer = setTimeout(() => this.flush(), this.flushMs);
+                }
+            });
+        });
+    }
+
+    flush(leaving = false) {
+        clearTimeout(this.timer);
+        this.timer = null;
+        if (!this.samples.length) {
+            return;
+        }
+
+        const body = JSON.stringify({ device_id: this.deviceId, samples: this.samples.splice(0) });
+        if (leaving && navigator.sendBeacon) {
+            navigator.sendBeacon(this.url, new Blob([body], { type: 'application/json' }));
+            return;
+        }
+        fetch(this.url, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json', 'X-Device-Id': this.deviceId },
+            body: body,
+            keepalive: true
+        }).catch(() => {});
+    }
+}
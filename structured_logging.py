@@ -0,0 +1,100 @@
+"""
+Structured, non-blocking logging
+
+Log calls only put the record on an in-memory queue; a background writer
+thread formats each record as one JSON object per line and writes it out,
+so import and bulk-send loops never wait on stdout/stderr. Messages are
+formatted on the writer thread, so arguments passed to a log call must
+not be mutated afterwards.
+
+Every subsystem logs under ``aga.<subsystem>`` (import, email, verify,
+replication, maintenance) and its level can be set on its own, e.g.
+LOG_LEVELS="email=DEBUG,verify=WARNING".
+"""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+from config import Config
+
+ROOT = 'aga'
+SUBSYSTEMS = ('import', 'email', 'verify', 'replication', 'maintenance')
+
+# Attributes every LogRecord has; anything else came in through extra=
+_RESERVED = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime', 'taskName'}
+
+_listener = None
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            'time': self.formatTime(record, '%Y-%m-%dT%H:%M:%S') + f'.{int(record.msecs):03d}',
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage()
+        }
+        for key, value in vars(record).items():
+            if key not in _RESERVED:
+                entry[key] = value
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class EnqueueHandler(logging.handlers.QueueHandler):
+    """Hands records to the writer thread untouched; formatting happens there"""
+
+    def prepare(self, record):
+        return record
+
+
+def parse_levels(spec):
+    """'email=DEBUG,verify=WARNING' -> {'email': 'DEBUG', 'verify': 'WARNING'}"""
+    levels = {}
+    for item in (spec or '').split(','):
+        name, _, level = item.partition('=')
+        if name.strip() and level.strip():
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def configure_logging(level=None, levels=None, stream=None):
+    """Route ``aga.*`` loggers through the queue to a JSON writer thread"""
+    global _listener
+    stop_logging()
+
+    records = queue.SimpleQueue()
+    writer = logging.StreamHandler(stream or sys.stderr)
+    writer.setFormatter(JsonFormatter())
+    _listener = logging.handlers.QueueListener(records, writer)
+
+    root = logging.getLogger(ROOT)
+    root.handlers = [EnqueueHandler(records)]
+    root.setLevel((level or Config.LOG_LEVEL).upper())
+    root.propagate = False
+
+    for subsystem in SUBSYSTEMS:
+        logging.getLogger(f'{ROOT}.{subsystem}').setLevel(logging.NOTSET)
+    for subsystem, subsystem_level in (parse_levels(Config.LOG_LEVELS) if levels is None else levels).items():
+        logging.getLogger(f'{ROOT}.{subsystem}').setLevel(subsystem_level.upper())
+
+    _listener.start()
+
+
+def stop_logging():
+    """Write out everything still queued and stop the writer thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def get_logger(subsystem):
+    return logging.getLogger(f'{ROOT}.{subsystem}')
+
+
+atexit.register(stop_logging)
@@ -0,0 +1,110 @@
+"""
+Scanner-side latency telemetry
+
+Scanner pages batch-report what attendees actually wait for: the camera
+decode time, the verification round trip and the time until the result
+is painted. Samples are kept per gate (scanner device id) in a rolling
+window, bounded in count per gate and in number of gates, and summarized
+as percentiles for the admin panel so a slow gate or device stands out.
+"""
+
+import math
+import threading
+from collections import deque
+from time import time
+
+METRICS = ('decode_ms', 'rtt_ms', 'display_ms')
+
+# Samples above this are treated as bogus (a tab left in the background)
+MAX_SAMPLE_MS = 60000.0
+
+
+def percentile(ordered, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not ordered:
+        return None
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+class ScanTelemetry:
+    def __init__(self, window_seconds=900, max_samples_per_gate=2000, max_gates=200, clock=time):
+        self.window_seconds = window_seconds
+        self.max_samples_per_gate = max_samples_per_gate
+        self.max_gates = max_gates
+        self.clock = clock
+        self.received = 0
+        self.dropped = 0
+        self._gates = {}
+        self._lock = threading.Lock()
+
+    def record(self, gate, samples):
+        """Store a batch of samples for a gate; returns how many were kept"""
+        now = self.clock()
+        rows = []
+        for sample in samples:
+            row = tuple(self._clean(sample.get(metric)) if isinstance(sample, dict) else None
+                        for metric in METRICS)
+            if any(value is not None for value in row):
+                rows.append((now,) + row)
+
+        with self._lock:
+            self.received += len(rows)
+            self.dropped += len(samples) - len(rows)
+            if not rows:
+                return 0
+            series = self._gates.get(gate)
+            if series is None:
+                if len(self._gates) >= self.max_gates:
+                    self._evict()
+                series = self._gates[gate] = deque(maxlen=self.max_samples_per_gate)
+            series.extend(rows)
+        return len(rows)
+
+    def summary(self):
+        """Per-gate sample counts and p50/p95/max per metric, slowest gate first"""
+        cutoff = self.clock() - self.window_seconds
+        with self._lock:
+            for gate in list(self._gates):
+                series = self._gates[gate]
+                while series and series[0][0] < cutoff:
+                    series.popleft()
+                if not series:
+                    del self._gates[gate]
+            snapshot = {gate: list(series) for gate, series in self._gates.items()}
+
+        gates = []
+        for gate, rows in snapshot.items():
+            entry = {'gate': gate, 'samples': len(rows), 'last_seen': rows[-1][0]}
+            for position, metric in enumerate(METRICS, 1):
+                values = sorted(row[position] for row in rows if row[position] is not None)
+                entry[metric] = {
+                    'count': len(values),
+                    'p50': percentile(values, 0.5),
+                    'p95': percentile(values, 0.95),
+                    'max': values[-1] if values else None
+                }
+            entry['total_p95_ms'] = sum(entry[metric]['p95'] or 0 for metric in METRICS)
+            gates.append(entry)
+
+        gates.sort(key=lambda entry: entry['total_p95_ms'], reverse=True)
+        return {
+            'window_seconds': self.window_seconds,
+            'received': self.received,
+            'dropped': self.dropped,
+            'gates': gates
+        }
+
+    @staticmethod
+    def _clean(value):
+        try:
+            value = float(value)
+        except (TypeError, ValueError):
+            return None
+        if not 0 <= value <= MAX_SAMPLE_MS:
+            return None
+        return round(value, 1)
+
+    def _evict(self):
+        # Make room by forgetting the gate that reported longest ago
+        oldest = min(self._gates, key=lambda gate: self._gates[gate][-1][0] if self._gates[gate] else 0)
+        del self._gates[oldest]
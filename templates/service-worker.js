@@ -0,0 +1,82 @@
+/*
+ * Service worker for the scanner shell.
+ *
+ * Precaches the verification pages and their assets so the scanner opens
+ * instantly from cache after the first visit, even with no network.
+ * Fingerprinted assets are cache-first (their URLs never change meaning),
+ * shell pages are served from cache and refreshed in the background, and
+ * API calls always go to the network.
+ */
+const CACHE_NAME = 'aga-scanner-{{ version }}';
+const SHELL_PAGES = {{ pages | tojson }};
+const PRECACHE_URLS = SHELL_PAGES.concat({{ assets | tojson }});
+
+self.addEventListener('install', event => {
+    event.waitUntil(
+        caches.open(CACHE_NAME)
+        .then(cache => cache.addAll(PRECACHE_URLS))
+        .then(() => self.skipWaiting())
+    );
+});
+
+self.addEventListener('activate', event => {
+    event.waitUntil(
+        caches.keys()
+        .then(names => Promise.all(
+            names
+            .filter(name => name.startsWith('aga-scanner-') && name !== CACHE_NAME)
+            .map(name => caches.delete(name))
+        ))
+        .then(() => self.clients.claim())
+    );
+});
+
+self.addEventListener('fetch', event => {
+    const request = event.request;
+    if (request.method !== 'GET') {
+        return;
+    }
+
+    const url = new URL(request.url);
+    if (url.origin !== self.location.origin || url.pathname.startsWith('/api/')) {
+        return;
+    }
+
+    if (SHELL_PAGES.includes(url.pathname)) {
+        event.respondWith(staleWhileRevalidate(request));
+        return;
+    }
+
+    if (url.pathname.startsWith('/assets/')) {
+        event.respondWith(cacheFirst(request));
+    }
+});
+
+function cacheFirst(request) {
+    return caches.match(request, { ignoreSearch: true }).then(cached => {
+        if (cached) {
+            return cached;
+        }
+        return fetch(request).then(response => {
+            if (response.ok) {
+                const copy = response.clone();
+                caches.open(CACHE_NAME).then(cache => cache.put(request, copy));
+            }
+            return response;
+        });
+    });
+}
+
+function staleWhileRevalidate(request) {
+    return caches.open(CACHE_NAME).then(cache =>
+        cache.match(request, { ignoreSearch: true }).then(cached => {
+            const network = fetch(request).then(response => {
+                if (response.ok) {
+                    cache.put(request, response.clone());
+                }
+                return response;
+            }).catch(() => cached);
+            return cached || network;
+        })
+    );
+}
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Test script for batched admin check-in
+"""
+
+import os
+import sqlite3
+import tempfile
+import time
+
+def make_database(path, count):
+    import app
+    app.app.config['DATABASE'] = path
+    app.init_db()
+    app.save_members_to_db([{
+        'member_id': str(i),
+        'full_name': f'Member {i}',
+        'email': f'member{i}@example.org',
+        'phone': '',
+        'qr_code': f'AGA-{i}-test'
+    } for i in range(1, count + 1)])
+
+def admin_client():
+    import app
+    client = app.app.test_client()
+    with client.session_transaction() as sess:
+        sess['admin_logged_in'] = True
+    return client
+
+def test_bulk_toggle_checkin():
+    print("Testing bulk check-in...")
+    import app
+    previous = app.app.config['DATABASE']
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bulk.db')
+        make_database(path, 60)
+        try:
+            client = admin_client()
+            client.post('/api/toggle-checkin', json={'member_id': '1', 'check_in': True})
+
+            delegation = [str(i) for i in range(1, 41)] + ['missing', '2']
+            data = client.post('/api/bulk-toggle-checkin', json={'member_ids': delegation, 'check_in': True}).get_json()
+            assert data['success'] and data['updated'] == 39
+            statuses = {result['member_id']: result['status'] for result in data['results']}
+            assert len(data['results']) == 41  # the repeated id is reported once
+            assert statuses['1'] == 'unchanged' and statuses['missing'] == 'not_found'
+            assert all(statuses[str(i)] == 'updated' for i in range(2, 41))
+            assert all(result['check_in_time'] for result in data['results'] if result['status'] != 'not_found')
+            print("[OK] 39 checked in, 1 already checked in, 1 unknown id")
+
+            conn = sqlite3.connect(path)
+            assert conn.execute('SELECT COUNT(*) FROM members WHERE checked_in').fetchone()[0] == 40
+            assert conn.execute("SELECT COUNT(*) FROM members WHERE check_in_gate = 'admin'").fetchone()[0] == 40
+            # One toggle plus 39 bulk entries in the replication log
+            assert conn.execute('SELECT COUNT(*) FROM checkin_log').fetchone()[0] == 40
+            conn.close()
+            print("[OK] Database and replication log updated")
+
+            data = client.post('/api/bulk-toggle-checkin', json={'member_ids': ['1', '41'], 'check_in': False}).get_json()
+            assert [result['status'] for result in data['results']] == ['updated', 'unchanged']
+            assert data['results'][0]['checked_in'] is False and data['results'][0]['check_in_time'] is None
+            print("[OK] Bulk check-out")
+
+            assert not client.post('/api/bulk-toggle-checkin', json={'member_ids': [], 'check_in': True}).get_json()['success']
+            print("[OK] Empty selection rejected")
+        finally:
+            app.app.config['DATABASE'] = previous
+
+def test_bulk_vs_individual_requests():
+    import app
+    previous = app.app.config['DATABASE']
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench.db')
+        make_database(path, 100)
+        try:
+            client = admin_client()
+            start = time.perf_counter()
+            for i in range(1, 41):
+                client.post('/api/toggle-checkin', json={'member_id': str(i), 'check_in': True})
+            individual = time.perf_counter() - start
+
+            start = time.perf_counter()
+            client.post('/api/bulk-toggle-checkin', json={'member_ids': [str(i) for i in range(41, 81)], 'check_in': True})
+            bulk = time.perf_counter() - start
+        finally:
+            app.app.config['DATABASE'] = previous
+
+    print(f"[OK] 40 check-ins: {individual * 1000:.0f} ms as single requests, {bulk * 1000:.0f} ms in one batch")
+    assert bulk < individual
+
+if __name__ == "__main__":
+    test_bulk_toggle_checkin()
+    test_bulk_vs_individual_requests()
+    print("\n[SUCCESS] Bulk check-in tests passed!")
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Test script for the valid-code manifest served to scanner devices
+"""
+
+import base64
+import os
+import secrets
+import tempfile
+from code_manifest import HASH_BYTES, code_hash
+
+def make_database(path, count):
+    import app
+    app.app.config['DATABASE'] = path
+    app.init_db()
+    members = [{
+        'member_id': str(i),
+        'full_name': f'Member {i:04d}',
+        'email': f'member{i}@example.org',
+        'phone': '',
+        'qr_code': f'AGA-{i}-{secrets.token_hex(4)}'
+    } for i in range(1, count + 1)]
+    app.save_members_to_db(members)
+    return members
+
+def unpack(packed):
+    data = base64.b64decode(packed)
+    return {int.from_bytes(data[i:i + HASH_BYTES], 'big') for i in range(0, len(data), HASH_BYTES)}
+
+def test_code_manifest():
+    print("Testing valid-code manifest...")
+    import app
+    previous = app.app.config['DATABASE']
+    limiter = app.listing_limiter
+    saved = limiter.rate, limiter.burst
+    limiter.rate, limiter.burst = 1e6, 1e6
+    headers = {'X-Device-Id': 'manifest-test'}
+    with tempfile.TemporaryDirectory() as tmp:
+        members = make_database(os.path.join(tmp, 'manifest.db'), 3000)
+        try:
+            client = app.app.test_client()
+            with client.session_transaction() as sess:
+                sess['admin_logged_in'] = True
+
+            response = client.get('/api/code-manifest', headers=headers)
+            manifest = response.get_json()
+            hashes = unpack(manifest['hashes'])
+            assert manifest['full'] and manifest['count'] == len(hashes)
+            assert all(code_hash(member['qr_code']) in hashes for member in members)
+            assert len(response.data) < 16 * 1024
+            print(f"[OK] {len(members)} codes in a {len(response.data) / 1024:.1f} KB manifest")
+
+            # Wrong codes are rejected locally; only a sliver passes as plausible
+            foreign = [f'AGA-{i}-{secrets.token_hex(4)}' for i in range(20000)]
+            passed = sum(code_hash(code) in hashes for code in foreign)
+            assert passed < 200
+            assert not app.code_manifest.contains('https://example.org/not-a-ticket')
+            print(f"[OK] {passed} of {len(foreign)} unknown codes pass the local check")
+
+            # Check-ins do not change the set of valid codes
+            version = response.headers['ETag']
+            client.post('/api/verify-qr', json={'qr_data': members[0]['qr_code']}, headers=headers)
+            client.post('/api/bulk-toggle-checkin', json={'member_ids': ['2', '3'], 'check_in': True})
+            response = client.get('/api/code-manifest', headers={**headers, 'If-None-Match': version})
+            assert response.status_code == 304 and response.data == b''
+            print("[OK] Unchanged manifest answered with an empty 304")
+
+            since = manifest['version']
+            client.post('/api/add-member', json={'full_name': 'Late Registration', 'email': 'late@example.org'})
+            client.post('/api/delete-member', json={'member_id': '5'})
+            delta = client.get(f'/api/code-manifest?since={since}', headers=headers).get_json()
+            added, removed = unpack(delta['added']), unpack(delta['removed'])
+            assert not delta['full'] and delta['since'] == since and len(added) == len(removed) == 1
+            assert removed == {code_hash(members[4]['qr_code'])}
+            assert (hashes - removed) | added == unpack(
+                client.get('/api/code-manifest', headers=headers).get_json()['hashes'])
+            assert delta['count'] == len((hashes - removed) | added)
+            print("[OK] Devices a few versions behind download only the changes")
+
+            for stale in ('', 'other-1', f"{app.code_manifest.epoch}-999", f"{app.code_manifest.epoch}-x"):
+                assert client.get(f'/api/code-manifest?since={stale}', headers=headers).get_json()['full']
+            print("[OK] Unknown or foreign versions get the full list")
+        finally:
+            app.app.config['DATABASE'] = previous
+            limiter.rate, limiter.burst = saved
+
+if __name__ == "__main__":
+    test_code_manifest()
+    print("\n[SUCCESS] Code manifest tests passed!")
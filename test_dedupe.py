@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Test script for duplicate-member detection on import
+"""
+
+from dedupe import deduplicate_members, normalize_email, normalize_name, normalize_phone
+
+def member(member_id, name, email='', phone='', qr_code=None):
+    return {
+        'member_id': member_id,
+        'full_name': name,
+        'email': email,
+        'phone': phone,
+        'qr_code': qr_code or f'AGA-{member_id}-0000',
+        'qr_hash': f'hash-{member_id}'
+    }
+
+def test_normalized_keys():
+    print("Testing normalized keys...")
+    assert normalize_email('  Someone@Gmail.COM ') == 'someone@gmail.com'
+    for phone in ['+216 99 444 830', '99444830', '0021699444830', '21699444830.0']:
+        assert normalize_phone(phone) == '+21699444830', phone
+    assert normalize_name('Mohamed Taher Zarmdini ') == normalize_name('mohamed  taher zarmdini')
+    assert normalize_name('Amélie Ünal') == 'amelie unal'
+    print("[OK] Email, phone and name keys normalized")
+
+def test_deduplicate_members():
+    print("Testing duplicate merging...")
+    existing = [member('1', 'Rayen Bouguila', 'rayen@example.org', '+21699444830', qr_code='AGA-1-live')]
+    incoming = [
+        member('2', 'Mohamed Taher Zarmdini ', 'taher@example.org'),
+        member('3', 'Mohamed Taher Zarmdini', '', '28 885 895'),
+        member('4', 'Rayen bouguila', 'RAYEN@example.org '),
+        member('5', 'Someone Else', 'else@example.org'),
+    ]
+
+    members, report = deduplicate_members(incoming, existing, match_on=['email', 'phone', 'name'], merge_rule='fill')
+    by_id = {m['member_id']: m for m in members}
+
+    assert sorted(by_id) == ['1', '2', '5']
+    assert by_id['2']['phone'] == '28 885 895'
+    assert by_id['1']['qr_code'] == 'AGA-1-live'
+    assert [(r['member_id'], r['merged_into'], r['matched_on'], r['source']) for r in report] == [
+        ('3', '2', 'name', 'import'),
+        ('4', '1', 'email', 'existing'),
+    ]
+    print("[OK] Batch and existing-table duplicates merged and reported")
+
+    # Matching on email only keeps same-name rows apart
+    members, report = deduplicate_members(incoming, existing, match_on=['email'], merge_rule='first')
+    assert len(report) == 1 and report[0]['member_id'] == '4'
+    print("[OK] Merge rules are configurable")
+
+    # By default two attendees who only share a name both keep their code
+    namesakes = [member('6', 'Amine Ben Ali', 'amine1@example.org'), member('7', 'Amine Ben Ali', 'amine2@example.org')]
+    members, report = deduplicate_members(namesakes, [])
+    assert not report and sorted(m['member_id'] for m in members) == ['6', '7']
+    print("[OK] Same name alone is not a duplicate by default")
+
+if __name__ == "__main__":
+    test_normalized_keys()
+    test_deduplicate_members()
+    print("\n[SUCCESS] Dedupe tests passed!")
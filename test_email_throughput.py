@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Benchmark of invitation email throughput
+
+Runs EmailService against an in-process SMTP sink with a synthetic member
+list and a simulated server latency (added to every SMTP reply), and
+reports messages per second, how the time splits between QR rendering,
+MIME building and the SMTP conversation, and peak Python memory. Two send
+paths are compared:
+
+* send_bulk_invitations: one connection (connect, login) per message
+* session: one logged-in connection reused for every message
+
+Run directly for a bigger load:
+    python test_email_throughput.py [members] [latency_ms]
+"""
+
+import socketserver
+import sys
+import threading
+import time
+import tracemalloc
+from email_service import EmailService
+
+class SmtpSink(socketserver.ThreadingTCPServer):
+    """Accepts any login and message and keeps nothing but counters"""
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, latency=0.0):
+        super().__init__(('127.0.0.1', 0), SmtpHandler)
+        self.latency = latency
+        self.messages = 0
+        self.bytes = 0
+        self.connections = 0
+        self.lock = threading.Lock()
+
+class SmtpHandler(socketserver.StreamRequestHandler):
+    def reply(self, text):
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        self.wfile.write(text.encode() + b'\r\n')
+
+    def handle(self):
+        sink = self.server
+        with sink.lock:
+            sink.connections += 1
+        self.reply('220 sink ESMTP')
+        for line in self.rfile:
+            command = line.decode(errors='replace').strip().upper()
+            if command.startswith('EHLO'):
+                self.reply('250-sink\r\n250-AUTH PLAIN LOGIN\r\n250 8BITMIME')
+            elif command.startswith('AUTH'):
+                self.reply('235 Authenticated')
+            elif command == 'DATA':
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                size = 0
+                for data in self.rfile:
+                    if data == b'.\r\n':
+                        break
+                    size += len(data)
+                with sink.lock:
+                    sink.messages += 1
+                    sink.bytes += size
+                self.reply('250 Queued')
+            elif command == 'QUIT':
+                self.reply('221 Bye')
+                return
+            else:
+                # HELO, MAIL, RCPT, RSET, NOOP
+                self.reply('250 OK')
+
+class TimedEmailService(EmailService):
+    """EmailService that records time spent rendering and building messages"""
+    def __init__(self, port):
+        super().__init__()
+        self.smtp_server, self.smtp_port = '127.0.0.1', port
+        self.username, self.password = 'bench@example.org', 'secret'
+        self.use_tls = False
+        self.render_seconds = 0.0
+        self.build_seconds = 0.0
+
+    def generate_qr_code_image(self, qr_data, member_name):
+        start = time.perf_counter()
+        try:
+            return super().generate_qr_code_image(qr_data, member_name)
+        finally:
+            self.render_seconds += time.perf_counter() - start
+
+    def build_invitation(self, member_name, email, qr_data):
+        start = time.perf_counter()
+        try:
+            return super().build_invitation(member_name, email, qr_data)
+        finally:
+            self.build_seconds += time.perf_counter() - start
+
+def synthetic_members(count):
+    return [{'member_id': str(i), 'full_name': f'Member {i:05d}', 'email': f'member{i}@example.org',
+             'qr_code': f'AGA-{i}-{i * 2654435761 % 2**32:08x}'} for i in range(1, count + 1)]
+
+def send_bulk(service, members):
+    results = service.send_bulk_invitations(members, delay_seconds=0)
+    return sum(result['success'] for result in results)
+
+def send_session(service, members):
+    with service.session() as connection:
+        for member in members:
+            service.deliver_invitation(member['full_name'], member['email'], member['qr_code'], connection)
+    return len(members)
+
+PATHS = {'send_bulk_invitations': send_bulk, 'session': send_session}
+
+def run_path(send, members, latency):
+    sink = SmtpSink(latency)
+    threading.Thread(target=sink.serve_forever, daemon=True).start()
+    try:
+        service = TimedEmailService(sink.server_address[1])
+        start = time.perf_counter()
+        sent = send(service, members)
+        elapsed = time.perf_counter() - start
+
+        # Memory is traced on a separate, smaller pass so it does not skew timings
+        tracemalloc.start()
+        send(TimedEmailService(sink.server_address[1]), members[:50])
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    finally:
+        sink.shutdown()
+        sink.server_close()
+
+    build = service.build_seconds - service.render_seconds
+    return {
+        'sent': sent,
+        'delivered': sink.messages - min(len(members), 50),
+        'connections': sink.connections,
+        'per_second': sent / elapsed,
+        'render_pct': service.render_seconds / elapsed * 100,
+        'build_pct': build / elapsed * 100,
+        'network_pct': (elapsed - service.build_seconds) / elapsed * 100,
+        'peak_mb': peak / 1e6,
+        'mean_bytes': sink.bytes / sink.messages,
+    }
+
+def run_benchmark(count, latency_ms):
+    members = synthetic_members(count)
+    print(f"{count} invitations, {latency_ms:g} ms simulated latency per SMTP reply")
+    results = {}
+    for label, send in PATHS.items():
+        result = results[label] = run_path(send, members, latency_ms / 1000)
+        print(f"  {label:22s} {result['per_second']:7.1f} msg/s ({result['per_second'] * 60:6.0f}/min)  "
+              f"render {result['render_pct']:4.1f}%  MIME {result['build_pct']:4.1f}%  "
+              f"SMTP {result['network_pct']:4.1f}%  peak {result['peak_mb']:.1f} MB  "
+              f"~{result['mean_bytes'] / 1024:.1f} KB/msg")
+    return results
+
+def test_email_throughput():
+    print("Benchmarking invitation email throughput...")
+    results = run_benchmark(40, 2)
+    bulk, session = results['send_bulk_invitations'], results['session']
+    assert bulk['sent'] == bulk['delivered'] == 40 and session['sent'] == session['delivered'] == 40
+    assert session['connections'] == 2  # timed pass plus memory pass
+    # Reusing the connection skips connect/EHLO/AUTH/QUIT round trips per message
+    assert session['per_second'] > bulk['per_second']
+    print("[OK] Every invitation reached the sink; a reused session is faster")
+
+if __name__ == "__main__":
+    run_benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 500,
+                  float(sys.argv[2]) if len(sys.argv) > 2 else 20)
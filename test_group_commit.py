@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Test script for the group-commit check-in writer
+"""
+
+import os
+import sqlite3
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from checkin_committer import CheckinCommitter
+
+def make_database(path, count):
+    import app
+    previous = app.app.config['DATABASE']
+    app.app.config['DATABASE'] = path
+    app.init_db()
+    app.save_members_to_db([{
+        'member_id': str(i),
+        'full_name': f'Member {i}',
+        'email': '',
+        'phone': '',
+        'qr_code': f'AGA-{i}-group'
+    } for i in range(1, count + 1)])
+    app.app.config['DATABASE'] = previous
+
+def make_committer(path, timeout=5, **kwargs):
+    from replication import Replicator
+    connect = lambda: sqlite3.connect(path, timeout=timeout)
+    changes = []
+    committer = CheckinCommitter(connect, Replicator(connect, 'test-node'), on_change=changes.append, **kwargs)
+    return committer, changes
+
+def test_claims_are_coalesced_exactly_once():
+    print("Testing group commit of concurrent check-ins...")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'group.db')
+        make_database(path, 100)
+        committer, changes = make_committer(path, max_batch=32, max_wait_seconds=0.01)
+
+        # Every member is claimed at four gates at once
+        claims = [(str(member), f'gate-{gate}') for gate in range(4) for member in range(1, 101)]
+        with ThreadPoolExecutor(64) as pool:
+            results = list(pool.map(lambda claim: committer.submit(claim[0], True, claim[1]), claims))
+
+        admitted = {}
+        for (member_id, gate), result in zip(claims, results):
+            assert result['checked_in'] and result['check_in_time']
+            if result['applied']:
+                assert member_id not in admitted
+                admitted[member_id] = result['check_in_time']
+        assert len(admitted) == 100
+        # Losers are told when the winner checked the member in
+        for (member_id, _), result in zip(claims, results):
+            assert result['check_in_time'] == admitted[member_id]
+        print(f"[OK] {len(claims)} claims, each member admitted exactly once")
+
+        stats = committer.stats()
+        assert stats['claims'] == len(claims) and stats['batches'] < len(claims) / 4
+        assert stats['largest_batch'] <= 32
+        print(f"[OK] Committed in {stats['batches']} transactions (mean batch {stats['mean_batch']})")
+
+        conn = sqlite3.connect(path)
+        assert conn.execute('SELECT COUNT(*) FROM members WHERE checked_in').fetchone()[0] == 100
+        assert conn.execute('SELECT COUNT(*) FROM checkin_log').fetchone()[0] == 100
+        conn.close()
+        assert sum(len(states) for states in changes) == 100
+        print("[OK] Database, replication log and change callback agree")
+
+def test_claims_in_one_batch_see_each_other():
+    print("Testing claim order inside a batch...")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'order.db')
+        make_database(path, 3)
+        committer, changes = make_committer(path, max_wait_seconds=0.2)
+
+        results = [None] * 3
+        def submit(position, check_in):
+            results[position] = committer.submit('1', check_in, 'gate-1')
+        threads = []
+        for position, check_in in enumerate((True, False, True)):
+            threads.append(threading.Thread(target=submit, args=(position, check_in)))
+            threads[-1].start()
+            threads[-1].join(0.02)
+        for thread in threads:
+            thread.join()
+
+        assert committer.stats()['batches'] == 1
+        assert [result['applied'] for result in results] == [True, True, True]
+        assert [result['checked_in'] for result in results] == [True, False, True]
+        assert changes == [{'1': (True, results[2]['check_in_time'])}]
+        print("[OK] Check-in, check-out, check-in in one batch each get their own result")
+
+def test_failed_batch_applies_nothing():
+    print("Testing a batch that cannot commit...")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'locked.db')
+        make_database(path, 2)
+        committer, changes = make_committer(path, timeout=0.1)
+
+        blocker = sqlite3.connect(path)
+        blocker.execute('BEGIN IMMEDIATE')
+        try:
+            committer.submit('1', True, 'gate-1')
+            assert False, 'expected the lock wait to time out'
+        except sqlite3.OperationalError as e:
+            assert 'locked' in str(e)
+        finally:
+            blocker.rollback()
+            blocker.close()
+
+        conn = sqlite3.connect(path)
+        assert conn.execute('SELECT COUNT(*) FROM members WHERE checked_in').fetchone()[0] == 0
+        conn.close()
+        assert not changes
+        assert committer.submit('1', True, 'gate-1')['applied']
+        print("[OK] The claim failed, nothing was applied, and a retry succeeds")
+
+def test_waits_are_bounded():
+    print("Testing commit wait timeout...")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'slow.db')
+        make_database(path, 3)
+        committer, changes = make_committer(path, timeout=5, timeout_seconds=0.2)
+
+        blocker = sqlite3.connect(path)
+        blocker.execute('BEGIN IMMEDIATE')
+        errors = []
+        def submit(member_id):
+            try:
+                committer.submit(member_id, True, 'gate-1')
+            except sqlite3.OperationalError as e:
+                errors.append(str(e))
+        try:
+            # Member 1 is in the stuck transaction, member 2 queued behind it
+            first = threading.Thread(target=submit, args=('1',))
+            first.start()
+            first.join(0.05)
+            submit('2')
+            first.join()
+        finally:
+            blocker.rollback()
+            blocker.close()
+        assert len(errors) == 2 and all('not committed' in error for error in errors)
+        print("[OK] Callers give up after the timeout instead of hanging")
+
+        committer.timeout_seconds = 5
+        assert committer.submit('3', True, 'gate-1')['applied']
+        conn = sqlite3.connect(path)
+        checked_in = {row[0] for row in conn.execute('SELECT member_id FROM members WHERE checked_in')}
+        conn.close()
+        assert '2' not in checked_in and '3' in checked_in
+        print("[OK] A claim withdrawn while queued is never applied")
+
+def test_writer_failure_fails_waiting_claims():
+    print("Testing a writer that dies...")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'dead.db')
+        make_database(path, 1)
+        committer, _ = make_committer(path, timeout_seconds=5)
+
+        def broken(batch):
+            raise RuntimeError('writer bug')
+        committer._commit = broken
+        try:
+            committer.submit('1', True, 'gate-1')
+            assert False, 'expected the writer error'
+        except RuntimeError as e:
+            assert str(e) == 'writer bug'
+        committer._worker.join(1)
+        print("[OK] The waiting claim gets the writer's error at once")
+
+        del committer._commit
+        assert committer.submit('1', True, 'gate-1')['applied']
+        print("[OK] The next claim starts a new writer")
+
+if __name__ == "__main__":
+    test_claims_are_coalesced_exactly_once()
+    test_claims_in_one_batch_see_each_other()
+    test_failed_batch_applies_nothing()
+    test_waits_are_bounded()
+    test_writer_failure_fails_waiting_claims()
+    print("\n[SUCCESS] Group commit tests passed!")
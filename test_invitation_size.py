@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Test script for invitation message size
+
+Invitations embed the QR code inline as a 1-bit PNG referenced by
+Content-ID; checks the message structure, that the reported size is what
+the SMTP server received, and the estimated bytes saved compared with the
+24-bit RGB attachment.
+"""
+
+from email_service import EmailService, base64_length
+from outbox import EmailOutbox
+from test_email_throughput import SmtpSink
+import threading
+
+def test_inline_qr_message():
+    print("Testing invitation message...")
+    service = EmailService()
+    service.username = 'events@example.org'
+    msg, report = service.build_invitation('Test Member', 'member@example.org', 'AGA-1-abcdef12')
+
+    assert msg.get_content_type() == 'multipart/related'
+    html, image = msg.get_payload()
+    assert image.get_content_type() == 'image/png'
+    assert image['Content-Disposition'].startswith('inline')
+    cid = image['Content-ID'].strip('<>')
+    assert f'cid:{cid}' in html.get_payload(decode=True).decode()
+    print("[OK] QR code embedded inline and referenced from the HTML")
+
+    from PIL import Image
+    from io import BytesIO
+    png = Image.open(BytesIO(image.get_payload(decode=True)))
+    assert png.mode == '1'
+    saving = service.qr_saving_estimate()
+    assert saving > base64_length(report['qr_png_bytes'])
+    print(f"[OK] QR PNG {report['qr_png_bytes']} bytes; about {saving} bytes saved per message after base64")
+
+def test_size_report_in_results():
+    import os
+    import sqlite3
+    import tempfile
+    sink = SmtpSink()
+    threading.Thread(target=sink.serve_forever, daemon=True).start()
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'outbox.db')
+
+        def make_service():
+            service = EmailService()
+            service.smtp_server, service.smtp_port = '127.0.0.1', sink.server_address[1]
+            service.username, service.password = 'events@example.org', 'secret'
+            service.use_tls = False
+            return service
+
+        outbox = EmailOutbox(lambda: sqlite3.connect(path), make_service)
+        conn = sqlite3.connect(path)
+        outbox.create_tables(conn.cursor())
+        conn.commit()
+        conn.close()
+
+        members = [{'member_id': str(i), 'full_name': f'Member {i}', 'email': f'member{i}@example.org',
+                    'qr_code': f'AGA-{i}-abcdef12'} for i in range(3)]
+        try:
+            results = outbox.send_now(members, delay_seconds=0)
+        finally:
+            sink.shutdown()
+            sink.server_close()
+        assert all(result['success'] and result['size']['message_bytes'] for result in results)
+
+        service = make_service()
+        stats = service.get_email_stats(results)
+        assert stats['message_bytes'] == sum(result['size']['message_bytes'] for result in results) == sink.bytes
+        print(f"[OK] Reported sizes add up to the {sink.bytes} bytes the SMTP server received")
+        assert stats['saved_bytes'] == len(members) * service.qr_saving_estimate()
+        print(f"[OK] About {stats['saved_bytes']} bytes saved over {stats['total']} invitations")
+
+if __name__ == "__main__":
+    test_inline_qr_message()
+    test_size_report_in_results()
+    print("\n[SUCCESS] Invitation size tests passed!")
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Test script for the event-preparation command line
+"""
+
+import contextlib
+import csv
+import io
+import os
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import manage
+from config import Config
+
+def run(*argv):
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        assert manage.main(list(argv)) == 0
+    return output.getvalue()
+
+def test_preparation_commands():
+    print("Testing manage.py...")
+    import app
+    previous = app.app.config['DATABASE'], Config.QR_CACHE_DIR
+    with tempfile.TemporaryDirectory() as tmp:
+        db = os.path.join(tmp, 'prep.db')
+        Config.QR_CACHE_DIR = os.path.join(tmp, 'qr')
+        try:
+            output = run('--db', db, 'import', '--dry-run')
+            assert 'Dry run' in output
+            assert not os.path.exists(db)
+            print("[OK] Dry-run import reports members and duplicates without creating the database")
+
+            run('--db', db, 'import')
+            count = sqlite3.connect(db).execute('SELECT COUNT(*) FROM members').fetchone()[0]
+            assert count > 100
+            print(f"[OK] Imported {count} members")
+
+            with open(db, 'rb') as f:
+                before = f.read()
+            assert len(manage.read_only_members(db)) == count
+            assert 'Dry run' in run('--db', db, 'import', '--dry-run')
+            with open(db, 'rb') as f:
+                assert f.read() == before
+            print("[OK] Dry run against a filled database reads the existing members and leaves the file untouched")
+
+            output = run('--db', db, 'render-qr', '--workers', '2')
+            assert f'{count} rendered' in output and len(os.listdir(Config.QR_CACHE_DIR)) == count
+            assert '0 rendered' in run('--db', db, 'render-qr', '--workers', '2')
+            member_id, qr_code, name = sqlite3.connect(db).execute(
+                'SELECT member_id, qr_code, full_name FROM members LIMIT 1').fetchone()
+            response = app.app.test_client().get(f'/api/generate-qr/{member_id}')
+            with open(app.qr_image_path(qr_code, name), 'rb') as cached:
+                assert response.data == cached.read()
+            print(f"[OK] {count} QR images pre-rendered on 2 processes and served by the app")
+
+            assert 'sqlite_autoindex_members_2' in run('--db', db, 'build-indexes')
+            run('--db', db, 'optimize')
+            assert f'{count} QR codes' in run('--db', db, 'warm')
+            assert 'invitations not yet delivered' in run('--db', db, 'queue-invitations')
+            print("[OK] build-indexes, optimize, warm and queue-invitations")
+
+            report = os.path.join(tmp, 'attendance.csv')
+            run('--db', db, 'export', report, '--checked-in', 'no')
+            with open(report, encoding='utf-8-sig') as exported:
+                assert len(list(csv.reader(exported))) == count + 1
+            print("[OK] Attendance report exported")
+        finally:
+            app.app.config['DATABASE'], Config.QR_CACHE_DIR = previous
+
+def test_import_reaches_running_server():
+    print("Testing import against a running server...")
+    import app
+    previous = app.app.config['DATABASE'], app.snapshot.recheck_seconds
+    with tempfile.TemporaryDirectory() as tmp:
+        db = os.path.join(tmp, 'live.db')
+        roster = os.path.join(tmp, 'roster.csv')
+        with open(roster, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['Id', 'Full name', 'Email1', 'Phone number'])
+            writer.writerow([1, 'First Member', 'first@example.org', ''])
+        run('--db', db, 'import', '--csv', roster)
+
+        app.app.config['DATABASE'] = db
+        app.snapshot.recheck_seconds = 0
+        try:
+            client = app.app.test_client()
+            headers = {'X-Device-Id': 'manage-live-test'}
+            etag = client.get('/api/members', headers=headers).headers['ETag']
+            assert client.get('/api/members', headers={**headers, 'If-None-Match': etag}).status_code == 304
+
+            # The import runs in its own process, as it does next to a live server
+            with open(roster, 'a', newline='') as f:
+                csv.writer(f).writerow([2, 'Late Registration', 'late@example.org', ''])
+            here = os.path.dirname(os.path.abspath(__file__))
+            subprocess.run([sys.executable, os.path.join(here, 'manage.py'), '--db', db, 'import', '--csv', roster],
+                           cwd=here, check=True, capture_output=True)
+            code = sqlite3.connect(db).execute("SELECT qr_code FROM members WHERE member_id = '2'").fetchone()[0]
+
+            response = client.get('/api/members', headers={**headers, 'If-None-Match': etag})
+            assert response.status_code == 200 and response.headers['ETag'] != etag
+            assert {m['member_id'] for m in response.get_json()} == {'1', '2'}
+            assert app.code_manifest.contains(code)
+            print("[OK] Listings and the code manifest pick up an import run from another process")
+        finally:
+            app.app.config['DATABASE'], app.snapshot.recheck_seconds = previous
+
+if __name__ == "__main__":
+    test_preparation_commands()
+    test_import_reaches_running_server()
+    print("\n[SUCCESS] manage.py tests passed!")
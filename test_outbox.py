@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Test script for the durable invitation outbox
+"""
+
+import os
+import smtplib
+import sqlite3
+import tempfile
+from email_service import EmailService
+from outbox import EmailOutbox
+
+class FakeEmailService(EmailService):
+    """EmailService that records deliveries instead of talking SMTP"""
+
+    def __init__(self, failures=None):
+        super().__init__()
+        self.username = 'sender@example.org'
+        self.password = 'secret'
+        self.failures = failures or {}
+        self.delivered = []
+
+    def deliver_invitation(self, member_name, email, qr_data):
+        error = self.failures.get(email)
+        if error:
+            raise error
+        self.delivered.append(email)
+
+def make_outbox(service, db_path):
+    outbox = EmailOutbox(lambda: sqlite3.connect(db_path),
+                         email_service_factory=lambda: service,
+                         max_attempts=3, base_delay=0, max_delay=0)
+    conn = sqlite3.connect(db_path)
+    outbox.create_tables(conn.cursor())
+    conn.commit()
+    conn.close()
+    return outbox
+
+MEMBERS = [
+    {'member_id': '1', 'full_name': 'Member One', 'email': 'one@example.org', 'qr_code': 'AGA-1-aaaa'},
+    {'member_id': '2', 'full_name': 'Member Two', 'email': 'two@example.org', 'qr_code': 'AGA-2-bbbb'},
+    {'member_id': '3', 'full_name': 'No Email', 'email': '', 'qr_code': 'AGA-3-cccc'},
+]
+
+def test_outbox():
+    print("Testing email outbox...")
+    db_path = os.path.join(tempfile.mkdtemp(), 'outbox.db')
+
+    # Transient 4xx failure for member two, success for member one
+    service = FakeEmailService({'two@example.org': smtplib.SMTPResponseException(451, b'Try again later')})
+    outbox = make_outbox(service, db_path)
+
+    results = outbox.send_now(MEMBERS, delay_seconds=0)
+    assert [r['success'] for r in results] == [True, False, False]
+    assert service.delivered == ['one@example.org']
+    print("[OK] First run delivered one invitation, deferred the transient failure")
+
+    pending = outbox.pending()
+    assert [p['member_id'] for p in pending] == ['2']
+    assert pending[0]['status'] == 'pending' and pending[0]['attempts'] == 1
+    print("[OK] Undelivered invitations listed")
+
+    # Re-running the bulk send never emails member one again
+    service.failures = {}
+    results = outbox.send_now(MEMBERS, delay_seconds=0)
+    assert results[0]['skipped'] and results[0]['success']
+    assert service.delivered == ['one@example.org', 'two@example.org']
+    assert outbox.pending() == []
+    print("[OK] Re-run skipped delivered members and retried the failed one")
+
+    # Permanent 5xx failures stop retrying straight away
+    service.failures = {'three@example.org': smtplib.SMTPResponseException(550, b'No such user')}
+    outbox.send_now([{'member_id': '4', 'full_name': 'Bad', 'email': 'three@example.org', 'qr_code': 'AGA-4-dddd'}])
+    assert outbox.pending()[0]['status'] == 'failed'
+    assert outbox.process_due() == []
+    print("[OK] Permanent failure marked failed")
+
+    # A crash mid-send leaves 'sending'; resume puts it back in the queue
+    conn = sqlite3.connect(db_path)
+    conn.execute("UPDATE email_outbox SET status = 'sending' WHERE member_id = '4'")
+    conn.commit()
+    conn.close()
+    service.failures = {}
+    assert outbox.resume(start_worker=False) == 1
+    results = outbox.process_due()
+    assert len(results) == 1 and results[0]['success']
+    print("[OK] Interrupted send resumed at startup")
+
+if __name__ == "__main__":
+    test_outbox()
+    print("\n[SUCCESS] Outbox tests passed!")
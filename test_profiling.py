@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Test script for sampled request profiling
+"""
+
+import os
+import pstats
+import tempfile
+import time
+
+def make_database(path, count):
+    import app
+    previous = app.app.config['DATABASE']
+    app.app.config['DATABASE'] = path
+    app.init_db()
+    app.save_members_to_db([{
+        'member_id': str(i),
+        'full_name': f'Member {i}',
+        'email': '',
+        'phone': '',
+        'qr_code': f'AGA-{i}-profiled'
+    } for i in range(1, count + 1)])
+    app.app.config['DATABASE'] = previous
+
+def test_sampled_profiles_rotate():
+    print("Testing request profiling...")
+    import app
+    profiler = app.profiler
+    saved = profiler.directory, profiler.max_files, profiler._files, profiler.status()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        profiler.directory, profiler.max_files, profiler._files = tmp, 3, None
+        try:
+            client = app.app.test_client()
+            with client.session_transaction() as sess:
+                sess['admin_logged_in'] = True
+
+            response = client.post('/api/profiling', json={'enabled': True, 'sample_rate': 0, 'routes': {'verify_qr': 1}})
+            assert response.get_json()['success']
+
+            for i in range(5):
+                client.post('/api/verify-qr', json={'qr_data': 'unknown'}, headers={'X-Device-Id': f'profiled-{i}'})
+            client.get('/')  # sampled at 0%
+
+            files = sorted(os.listdir(tmp))
+            assert len(files) == 3 and all('verify_qr' in name for name in files)
+            pstats.Stats(os.path.join(tmp, files[0]))
+            print("[OK] Every verify_qr request profiled, only the newest 3 files kept")
+
+            status = client.get('/api/profiling').get_json()
+            assert len(status['slowest']) == 5
+            assert status['slowest'][0]['top_functions'][0]['function']
+            durations = [entry['duration_ms'] for entry in status['slowest']]
+            assert durations == sorted(durations, reverse=True)
+            print(f"[OK] Slowest request {durations[0]:.1f} ms, top function {status['slowest'][0]['top_functions'][0]['function']}")
+
+            client.post('/api/profiling', json={'enabled': False})
+            client.post('/api/verify-qr', json={'qr_data': 'unknown'}, headers={'X-Device-Id': 'profiled-off'})
+            assert sorted(os.listdir(tmp)) == files
+            print("[OK] Nothing recorded while disabled")
+        finally:
+            profiler.directory, profiler.max_files, profiler._files = saved[:3]
+            profiler.configure(enabled=saved[3]['enabled'], sample_rate=saved[3]['sample_rate'], routes=saved[3]['routes'])
+            profiler.recent.clear()
+
+def test_checkin_batches_profiled():
+    print("Testing profiling of group-committed check-ins...")
+    import sqlite3
+    from checkin_committer import CheckinCommitter
+    from profiling import RequestProfiler
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'profiled.db')
+        make_database(path, 2)
+        profiler = RequestProfiler(os.path.join(tmp, 'profiles'))
+        committer = CheckinCommitter(lambda: sqlite3.connect(path), profiler=profiler)
+
+        committer.submit('1', True, 'gate-1')
+        assert not profiler.recent
+        profiler.configure(enabled=True, sample_rate=0, routes={'checkin_batch': 1})
+        assert committer.submit('2', True, 'gate-1')['applied']
+
+        # The profile is written on the writer thread after the claim is answered
+        deadline = time.monotonic() + 5
+        while not profiler.recent and time.monotonic() < deadline:
+            time.sleep(0.01)
+        entry, = profiler.recent
+        assert entry['endpoint'] == 'checkin_batch' and entry['path'] == '1 claims'
+        assert any('_apply' in fn['function'] or 'execute' in fn['function'] for fn in entry['top_functions'])
+        pstats.Stats(os.path.join(profiler.directory, entry['file']))
+        print(f"[OK] Commit batch profiled on the writer thread ({entry['duration_ms']:.1f} ms)")
+
+def test_disabled_overhead():
+    import app
+    profiler = app.profiler
+    assert not profiler.enabled
+    iterations = 200000
+    start = time.perf_counter()
+    for _ in range(iterations):
+        profiler._start()
+    per_call = (time.perf_counter() - start) / iterations
+    print(f"[OK] Disabled hook cost: {per_call * 1e9:.0f} ns per request")
+    assert per_call < 5e-6
+
+if __name__ == "__main__":
+    test_sampled_profiles_rotate()
+    test_checkin_batches_profiled()
+    test_disabled_overhead()
+    print("\n[SUCCESS] Profiling tests passed!")
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Test script for the scanner's self-hosted QR decoder (static/js/qr-decoder.js)
+
+Runs the decoder under Node on codes rendered with the same library the app
+uses for invitations; skipped when node is not installed.
+"""
+
+import base64
+import json
+import os
+import shutil
+import subprocess
+import qrcode
+from PIL import Image, ImageOps
+
+DECODER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static', 'js', 'qr-decoder.js')
+
+RUNNER = """
+const fs = require('fs');
+const vm = require('vm');
+const context = { TextDecoder: TextDecoder };
+context.globalThis = context;
+vm.createContext(context);
+vm.runInContext(fs.readFileSync(process.argv[1], 'utf8'), context);
+const cases = JSON.parse(fs.readFileSync(0, 'utf8'));
+console.log(JSON.stringify(cases.map(c => {
+    const code = context.decodeQR(new Uint8ClampedArray(Buffer.from(c.rgba, 'base64')), c.width, c.height);
+    return code ? code.data : null;
+})));
+"""
+
+def render(data, error_correction=qrcode.constants.ERROR_CORRECT_M, box_size=5, version=None):
+    code = qrcode.QRCode(version=version, error_correction=error_correction, box_size=box_size, border=4)
+    code.add_data(data)
+    code.make(fit=version is None)
+    return code.make_image().convert('L')
+
+def framed(image, size=360):
+    canvas = Image.new('L', (size, size), 255)
+    canvas.paste(image, ((size - image.size[0]) // 2, (size - image.size[1]) // 2))
+    return canvas
+
+def decode(images):
+    cases = [{'rgba': base64.b64encode(image.convert('RGBA').tobytes()).decode(),
+              'width': image.size[0], 'height': image.size[1]} for image in images]
+    output = subprocess.run(['node', '-e', RUNNER, DECODER], input=json.dumps(cases),
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(output)
+
+def test_qr_decoder():
+    print("Testing QR decoder...")
+    if not shutil.which('node'):
+        print("[SKIP] node is not installed")
+        return
+
+    levels = [qrcode.constants.ERROR_CORRECT_L, qrcode.constants.ERROR_CORRECT_M,
+              qrcode.constants.ERROR_CORRECT_Q, qrcode.constants.ERROR_CORRECT_H]
+    codes = [f'AGA-{i}-{i * 7919:08x}' for i in range(1, 5)]
+    assert decode([framed(render(data, level)) for data, level in zip(codes, levels)]) == codes
+    print("[OK] Member codes decode at every error-correction level")
+
+    versions = [(version, f'v{version}-' + 'x' * version) for version in (1, 7, 15, 25)]
+    images = [framed(render(data, box_size=2, version=version), 400) for version, data in versions]
+    assert decode(images) == [data for _, data in versions]
+    print("[OK] Larger versions decode (version information and alignment patterns)")
+
+    data = 'AGA-42-5eb0c1d2'
+    image = render(data)
+    transformed = [
+        framed(image.rotate(90, expand=True)),
+        framed(image.rotate(30, expand=True, fillcolor=255, resample=Image.BILINEAR)),
+        framed(ImageOps.mirror(image)),
+        framed(image).point(lambda value: 60 + value * 0.5),
+    ]
+    assert decode(transformed) == [data] * len(transformed)
+    print("[OK] Rotated, mirrored and low-contrast frames decode")
+
+    from email_service import EmailService
+    invitation = EmailService().generate_qr_code_image(data, 'Sample Member').convert('L')
+    invitation.thumbnail((340, 340))
+    assert decode([framed(invitation)]) == [data]
+    print("[OK] The emailed invitation image decodes")
+
+    blank = Image.new('L', (360, 360), 255)
+    finders_only = blank.copy()
+    finders_only.paste(image.crop((0, 0, 80, 80)), (40, 40))
+    assert decode([blank, finders_only]) == [None, None]
+    print("[OK] Frames without a complete code decode to nothing")
+
+if __name__ == "__main__":
+    test_qr_decoder()
+    print("\n[SUCCESS] QR decoder tests passed!")
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Benchmark of the QR lookup index
+
+Compares the old layout (UNIQUE qr_code text plus UNIQUE 64-character hex
+qr_hash) with the 16-byte BLOB digest index: on-disk index size and the
+latency of a verification lookup. Runs 1M members when executed directly;
+the test suite uses a smaller table (QR_BENCH_MEMBERS to override).
+"""
+
+import hashlib
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+OLD_LAYOUT = '''
+    CREATE TABLE members (
+        id INTEGER PRIMARY KEY,
+        member_id TEXT UNIQUE,
+        full_name TEXT,
+        email TEXT,
+        phone TEXT,
+        qr_code TEXT UNIQUE,
+        qr_hash TEXT UNIQUE,
+        checked_in BOOLEAN DEFAULT FALSE,
+        check_in_time TIMESTAMP,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        check_in_gate TEXT
+    )
+'''
+
+def qr_codes(count):
+    rng = random.Random(2025)
+    return [f'AGA-{i}-{rng.getrandbits(32):08x}' for i in range(1, count + 1)]
+
+def build_database(path, codes, digest):
+    import app
+    conn = sqlite3.connect(path)
+    if digest:
+        app.create_members_table(conn.cursor())
+        key = app.qr_digest
+    else:
+        conn.execute(OLD_LAYOUT)
+        key = lambda code: hashlib.sha256(code.encode()).hexdigest()
+    conn.executemany(
+        'INSERT INTO members (member_id, full_name, qr_code, qr_hash) VALUES (?, ?, ?, ?)',
+        ((str(i), f'Member {i}', code, key(code)) for i, code in enumerate(codes, 1))
+    )
+    conn.commit()
+    return conn
+
+def qr_index_bytes(conn):
+    """Bytes used by the indexes on qr_code/qr_hash, if dbstat is compiled in"""
+    try:
+        rows = conn.execute('''
+            SELECT name, SUM(pgsize) FROM dbstat
+            WHERE name LIKE 'sqlite_autoindex_members_%' GROUP BY name
+        ''').fetchall()
+    except sqlite3.OperationalError:
+        return None
+    # Autoindex 1 is member_id; the rest are the QR lookup keys
+    return sum(size for name, size in rows if not name.endswith('_1'))
+
+def time_lookups(conn, codes, digest):
+    import app
+    if digest:
+        query, key = 'SELECT * FROM members WHERE qr_hash = ?', app.qr_digest
+    else:
+        query, key = 'SELECT * FROM members WHERE qr_code = ?', lambda code: code
+    start = time.perf_counter()
+    for code in codes:
+        assert conn.execute(query, (key(code),)).fetchone() is not None
+    return (time.perf_counter() - start) / len(codes)
+
+def run_benchmark(count):
+    codes = qr_codes(count)
+    sample = random.Random(1).sample(codes, min(20000, count))
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for label, digest in (('text qr_code + hex qr_hash', False), ('16-byte BLOB digest', True)):
+            path = os.path.join(tmp, f'{digest}.db')
+            conn = build_database(path, codes, digest)
+            time_lookups(conn, sample[:1000], digest)  # warm the page cache
+            results[label] = {
+                'file_mb': os.path.getsize(path) / 1e6,
+                'index_mb': (qr_index_bytes(conn) or 0) / 1e6,
+                'lookup_us': time_lookups(conn, sample, digest) * 1e6,
+            }
+            conn.close()
+
+    print(f"{count:,} members")
+    for label, result in results.items():
+        print(f"  {label:28s} file {result['file_mb']:7.1f} MB  "
+              f"QR index {result['index_mb']:6.1f} MB  lookup {result['lookup_us']:5.1f} us")
+    return results
+
+def test_digest_index_is_smaller():
+    print("Benchmarking QR lookup index...")
+    count = int(os.getenv('QR_BENCH_MEMBERS', '100000'))
+    old, new = run_benchmark(count).values()
+    assert new['file_mb'] < old['file_mb']
+    if old['index_mb']:
+        assert new['index_mb'] < old['index_mb'] / 2
+    # Hashing the payload costs about a microsecond; the lookup must stay comparable
+    assert new['lookup_us'] < old['lookup_us'] * 2
+    print("[OK] Digest index is smaller with comparable lookup latency")
+
+if __name__ == "__main__":
+    run_benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 1000000)
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Test script for scanner rate limiting
+"""
+
+import threading
+import time
+from time import monotonic
+from rate_limit import TokenBucketLimiter
+
+def test_token_buckets():
+    print("Testing token buckets...")
+    limiter = TokenBucketLimiter('verify', rate=1, burst=3, global_rate=1000, global_burst=4)
+
+    assert [limiter.acquire('gate-1') for _ in range(3)] == [0.0, 0.0, 0.0]
+    retry_after = limiter.acquire('gate-1')
+    assert 0 < retry_after <= 1
+    print(f"[OK] Burst exhausted, retry after {retry_after:.2f}s")
+
+    # Another device has its own bucket, until the shared budget runs out
+    assert limiter.acquire('gate-2') == 0.0
+    assert limiter.acquire('gate-2') > 0
+
+    stats = limiter.stats()
+    assert stats['allowed'] == 4 and stats['rejected'] == 2
+    assert {entry['client'] for entry in stats['top_rejected']} == {'gate-1', '*'}
+    print("[OK] Per-device and global rejections counted")
+
+    # A new device id per request does not escape the IP's budget
+    limiter = TokenBucketLimiter('verify', rate=1, burst=2, devices_per_ip=3)
+    results = [limiter.acquire(f'10.0.0.7/fake-{i}', '10.0.0.7') for i in range(8)]
+    assert results[:6] == [0.0] * 6 and all(results[6:])
+    assert limiter.acquire('10.0.0.8/gate-1', '10.0.0.8') == 0.0
+    assert limiter.stats()['top_rejected'][0]['client'] == '10.0.0.7'
+    print("[OK] Rotating device ids are limited per IP")
+
+class SingleBucket:
+    """One token bucket behind a lock: the least any decision can cost"""
+    def __init__(self, rate, burst):
+        self.rate, self.burst = rate, burst
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, key, ip=None):
+        now = monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [self.burst, now]
+            tokens = bucket[0] + (now - bucket[1]) * self.rate
+            bucket[0] = self.burst if tokens > self.burst else tokens
+            bucket[1] = now
+            if bucket[0] < 1.0:
+                return (1.0 - bucket[0]) / self.rate
+            bucket[0] -= 1.0
+            return 0.0
+
+def per_call(acquire, iterations=50000, repeats=5):
+    # Best of several runs, so a busy machine does not skew the comparison
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            acquire('10.0.0.1/gate-1', '10.0.0.1')
+        best = min(best, (time.perf_counter() - start) / iterations)
+    return best
+
+def test_decision_cost():
+    limiter = TokenBucketLimiter('bench', rate=1e9, burst=1e9, global_rate=1e9, devices_per_ip=10)
+    baseline = per_call(SingleBucket(1e9, 1e9).acquire)
+    cost = per_call(limiter.acquire)
+    print(f"[OK] Decision cost with device, IP and global buckets: {cost * 1e9:.0f} ns "
+          f"({cost / baseline:.1f}x a single bucket)")
+    # Three unrolled buckets cost about twice one; building per-call lists
+    # and zips pushed this past 5x
+    assert cost < 3.5 * baseline
+
+def test_verify_endpoint_sheds_load():
+    print("Testing 429 responses...")
+    import app
+    limiter = app.verify_limiter
+    saved = limiter.rate, limiter.burst
+    limiter.rate, limiter.burst = 0.001, 2
+    try:
+        client = app.app.test_client()
+        # A client address of its own, so draining it does not affect other tests
+        client.environ_base['REMOTE_ADDR'] = '198.51.100.7'
+        headers = {'X-Device-Id': 'noisy-scanner'}
+        statuses = [client.post('/api/verify-qr', json={}, headers=headers).status_code for _ in range(3)]
+        assert statuses == [200, 200, 429]
+        response = client.post('/api/verify-qr', json={}, headers=headers)
+        assert int(response.headers['Retry-After']) >= 1
+        assert client.post('/api/verify-qr', json={}, headers={'X-Device-Id': 'other'}).status_code == 200
+        print("[OK] Over-budget scanner gets 429 with Retry-After")
+
+        statuses = [client.post('/api/verify-qr', json={}, headers={'X-Device-Id': f'spoofed-{i}'}).status_code
+                    for i in range(limiter.devices_per_ip * 2 + 5)]
+        assert statuses[-1] == 429
+        print("[OK] Spoofed device ids share their IP's budget")
+    finally:
+        limiter.rate, limiter.burst = saved
+
+if __name__ == "__main__":
+    test_token_buckets()
+    test_decision_cost()
+    test_verify_endpoint_sheds_load()
+    print("\n[SUCCESS] Rate limit tests passed!")
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Test script for the in-memory read model behind the listing endpoints
+"""
+
+import os
+import sqlite3
+import tempfile
+import time
+
+def make_database(path, count):
+    import app
+    app.app.config['DATABASE'] = path
+    app.init_db()
+    app.save_members_to_db([{
+        'member_id': str(i),
+        'full_name': f'Member {i:04d}',
+        'email': f'member{i}@example.org',
+        'phone': '',
+        'qr_code': f'AGA-{i}-test'
+    } for i in range(1, count + 1)])
+
+def listing(client, path='/api/members'):
+    return {m['member_id']: m for m in client.get(path, headers={'X-Device-Id': 'read-model-test'}).get_json()}
+
+def test_snapshot_follows_writes():
+    print("Testing read model...")
+    import app
+    previous = app.app.config['DATABASE']
+    limiter = app.listing_limiter
+    saved = limiter.rate, limiter.burst
+    limiter.rate, limiter.burst = 1e6, 1e6
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'read.db')
+        make_database(path, 500)
+        try:
+            client = app.app.test_client()
+            with client.session_transaction() as sess:
+                sess['admin_logged_in'] = True
+
+            members = listing(client)
+            assert len(members) == 500 and not members['7']['checked_in']
+            rebuilds = app.snapshot.rebuilds
+
+            client.post('/api/verify-qr', json={'qr_data': 'AGA-7-test'}, headers={'X-Device-Id': 'gate-1'})
+            client.post('/api/bulk-toggle-checkin', json={'member_ids': ['8', '9'], 'check_in': True})
+            members = listing(client)
+            assert all(members[i]['checked_in'] and members[i]['check_in_time'] for i in ('7', '8', '9'))
+            assert listing(client, '/api/members-with-qr')['7']['qr_code'] == 'AGA-7-test'
+            assert app.snapshot.rebuilds == rebuilds
+            print("[OK] Check-ins patched into the snapshot without re-reading the table")
+
+            app.replicator.apply('peer', [{
+                'seq': 1, 'member_id': '10', 'qr_code': 'AGA-10-test', 'checked_in': True,
+                'check_in_time': '2025-10-26 08:00:00', 'changed_at': '2025-10-26 08:00:00'
+            }])
+            assert listing(client)['10']['check_in_time'] == '2025-10-26 08:00:00'
+            print("[OK] Replicated check-ins reach the snapshot")
+
+            client.post('/api/edit-member', json={'member_id': '7', 'full_name': 'Renamed', 'email': 'r@example.org'})
+            members = listing(client)
+            assert members['7']['full_name'] == 'Renamed' and members['7']['checked_in']
+            assert app.snapshot.rebuilds == rebuilds + 1
+            print("[OK] Structural edits rebuild the snapshot")
+
+            # A writer holding the database lock does not stall readers
+            writer = sqlite3.connect(path)
+            writer.execute('BEGIN EXCLUSIVE')
+            try:
+                start = time.perf_counter()
+                for _ in range(100):
+                    assert client.get('/api/members', headers={'X-Device-Id': 'read-model-test'}).status_code == 200
+                elapsed = (time.perf_counter() - start) / 100
+            finally:
+                writer.rollback()
+                writer.close()
+            print(f"[OK] Listing served in {elapsed * 1000:.2f} ms while the database is locked")
+        finally:
+            app.app.config['DATABASE'] = previous
+            limiter.rate, limiter.burst = saved
+
+def test_conditional_listing_requests():
+    print("Testing ETag conditional GETs...")
+    import app
+    previous = app.app.config['DATABASE']
+    limiter = app.listing_limiter
+    saved = limiter.rate, limiter.burst
+    limiter.rate, limiter.burst = 1e6, 1e6
+    headers = {'X-Device-Id': 'etag-test'}
+    with tempfile.TemporaryDirectory() as tmp:
+        make_database(os.path.join(tmp, 'etag.db'), 50)
+        try:
+            client = app.app.test_client()
+            with client.session_transaction() as sess:
+                sess['admin_logged_in'] = True
+
+            first = client.get('/api/members', headers=headers)
+            etag = first.headers['ETag']
+            assert first.status_code == 200 and first.headers['Cache-Control'] == 'no-cache'
+
+            # A 304 is answered from memory: the database is never opened
+            connect = app.snapshot.connect
+            app.snapshot.connect = None
+            try:
+                for path in ('/api/members', '/api/members-with-qr'):
+                    response = client.get(path, headers={**headers, 'If-None-Match': etag})
+                    assert response.status_code == 304 and response.data == b''
+                    assert response.headers['ETag'] == etag
+            finally:
+                app.snapshot.connect = connect
+            print("[OK] Unchanged data answered with an empty 304")
+
+            writes = [
+                ('/api/verify-qr', {'qr_data': 'AGA-1-test'}),
+                ('/api/toggle-checkin', {'member_id': '2', 'check_in': True}),
+                ('/api/bulk-toggle-checkin', {'member_ids': ['3', '4'], 'check_in': True}),
+                ('/api/reset-checkins', {}),
+                ('/api/add-member', {'full_name': 'New Member', 'email': 'new@example.org'}),
+                ('/api/edit-member', {'member_id': '5', 'full_name': 'Edited', 'email': 'e@example.org'}),
+                ('/api/delete-member', {'member_id': '6'}),
+                ('/api/toggle-checkin', {'member_id': '7', 'check_in': True}),
+                ('/api/bulk-checkout', {}),
+            ]
+            for path, body in writes:
+                assert client.post(path, json=body, headers=headers).status_code == 200
+                response = client.get('/api/members', headers={**headers, 'If-None-Match': etag})
+                assert response.status_code == 200, path
+                etag = response.headers['ETag']
+
+            app.save_members_to_db([{'member_id': '99', 'full_name': 'Imported', 'email': '',
+                                     'phone': '', 'qr_code': 'AGA-99-test'}])
+            assert client.get('/api/members', headers={**headers, 'If-None-Match': etag}).status_code == 200
+            print(f"[OK] ETag changes on all {len(writes) + 1} write paths")
+        finally:
+            app.app.config['DATABASE'] = previous
+            limiter.rate, limiter.burst = saved
+
+if __name__ == "__main__":
+    test_snapshot_follows_writes()
+    test_conditional_listing_requests()
+    print("\n[SUCCESS] Read model tests passed!")
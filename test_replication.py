@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Test script for two-node check-in replication
+
+Starts two local app instances, each with its own copy of a small
+database, and checks that check-ins made at either node reach the other.
+"""
+
+import json
+import os
+import shutil
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+TOKEN = 'test-replication-token'
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def make_database(path):
+    import app
+    previous = app.app.config['DATABASE']
+    app.app.config['DATABASE'] = path
+    app.init_db()
+    app.save_members_to_db([{
+        'member_id': str(i),
+        'full_name': f'Member {i}',
+        'email': f'member{i}@example.org',
+        'phone': '',
+        'qr_code': f'AGA-{i}-test',
+        'qr_hash': f'hash-{i}'
+    } for i in range(1, 4)])
+    app.app.config['DATABASE'] = previous
+
+def start_node(db_path, port, node_id, peer_port):
+    env = dict(os.environ,
+               DATABASE_URL=db_path,
+               PORT=str(port),
+               NODE_ID=node_id,
+               REPLICATION_TOKEN=TOKEN,
+               REPLICATION_PEER_URL=f'http://127.0.0.1:{peer_port}',
+               REPLICATION_INTERVAL_SECONDS='3600')
+    here = os.path.dirname(os.path.abspath(__file__))
+    proc = subprocess.Popen([sys.executable, 'app.py'], cwd=here, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    for _ in range(100):
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.1).close()
+            return proc
+        except OSError:
+            time.sleep(0.1)
+    proc.kill()
+    raise RuntimeError(f'{node_id} did not start')
+
+def call(port, path, payload=None):
+    req = urllib.request.Request(
+        f'http://127.0.0.1:{port}{path}',
+        data=json.dumps(payload).encode() if payload is not None else None,
+        method='POST' if payload is not None else 'GET',
+        headers={'Content-Type': 'application/json', 'X-Replication-Token': TOKEN}
+    )
+    with urllib.request.urlopen(req, timeout=10) as response:
+        return json.loads(response.read())
+
+def checked_in(db_path):
+    conn = sqlite3.connect(db_path)
+    rows = dict(conn.execute('SELECT member_id, check_in_time FROM members WHERE checked_in'))
+    conn.close()
+    return rows
+
+def test_replication():
+    print("Testing two-node replication...")
+    workdir = tempfile.mkdtemp()
+    db_a = os.path.join(workdir, 'hall_a.db')
+    db_b = os.path.join(workdir, 'hall_b.db')
+    make_database(db_a)
+    shutil.copy(db_a, db_b)
+
+    port_a, port_b = free_port(), free_port()
+    node_a = start_node(db_a, port_a, 'hall-a', port_b)
+    node_b = start_node(db_b, port_b, 'hall-b', port_a)
+    try:
+        assert call(port_a, '/api/verify-qr', {'qr_data': 'AGA-1-test'})['valid']
+        time.sleep(1.1)
+        # Same code admitted at hall B before the halls synced
+        assert call(port_b, '/api/verify-qr', {'qr_data': 'AGA-1-test'})['valid']
+        assert call(port_b, '/api/verify-qr', {'qr_data': 'AGA-2-test'})['valid']
+
+        summary = call(port_a, '/api/replication/sync', {})
+        assert summary['success'] and summary['pulled'] == 2 and summary['pushed'] == 1
+        print(f"[OK] Sync pulled {summary['pulled']} and pushed {summary['pushed']} changes")
+
+        a, b = checked_in(db_a), checked_in(db_b)
+        assert set(a) == set(b) == {'1', '2'}
+        assert a['1'] == b['1'], 'first check-in time should win at both halls'
+        print("[OK] Both halls agree, earliest check-in kept")
+
+        # Codes checked in at one hall are rejected at the other
+        result = call(port_a, '/api/verify-qr', {'qr_data': 'AGA-2-test'})
+        assert not result['valid'] and 'already used' in result['message']
+
+        # Nothing new: a second sync ships no changes
+        summary = call(port_b, '/api/replication/sync', {})
+        assert summary['pulled'] == 0 and summary['pushed'] == 0
+        print("[OK] Idle sync transfers nothing")
+    finally:
+        node_a.terminate()
+        node_b.terminate()
+        node_a.wait()
+        node_b.wait()
+
+if __name__ == "__main__":
+    test_replication()
+    print("\n[SUCCESS] Replication tests passed!")
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Test script for worker startup cost
+
+Each measurement runs in a fresh interpreter so modules already imported
+by the test runner do not hide what app.py pulls in.
+"""
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+HEAVY_MODULES = ['pandas', 'qrcode', 'PIL', 'smtplib', 'email.mime.multipart', 'openpyxl']
+
+MEASURE = '''
+import json, sys, time
+start = time.perf_counter()
+{preload}
+import app
+elapsed = time.perf_counter() - start
+
+def rss_mb():
+    # Current resident set; ru_maxrss would include the parent's high-water mark
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1]) / 1024
+print(json.dumps({{
+    'import_ms': elapsed * 1000,
+    'rss_mb': rss_mb(),
+}}))
+'''
+
+VERIFY_PATH = '''
+import json, sys
+import app
+app.init_db()
+conn = app.get_db()
+conn.execute("INSERT INTO members (member_id, full_name, email, phone, qr_code, qr_hash) "
+             "VALUES ('1', 'Test Member', '', '', 'AGA2025-1-test', ?)", (app.qr_digest('AGA2025-1-test'),))
+conn.commit()
+conn.close()
+client = app.app.test_client()
+response = client.post('/api/verify-qr', json={'qr_data': 'AGA2025-1-test'})
+assert response.get_json()['valid'], response.get_json()
+client.get('/api/members')
+print(json.dumps(sorted(m for m in %r if m in sys.modules)))
+''' % (HEAVY_MODULES,)
+
+def run_python(code, database):
+    env = dict(os.environ, DATABASE_URL=database)
+    result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True,
+                            cwd=os.path.dirname(os.path.abspath(__file__)), env=env, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def measure_startup(database, preload=''):
+    runs = [run_python(MEASURE.format(preload=preload), database) for _ in range(3)]
+    return min(run['import_ms'] for run in runs), min(run['rss_mb'] for run in runs)
+
+def test_startup_benchmark():
+    print("Measuring worker startup...")
+    with tempfile.TemporaryDirectory() as tmp:
+        database = os.path.join(tmp, 'startup.db')
+        lazy_ms, lazy_rss = measure_startup(database)
+        eager_ms, eager_rss = measure_startup(database, 'import pandas, qrcode, PIL.Image, smtplib')
+    print(f"[OK] import app: {lazy_ms:.0f} ms, {lazy_rss:.0f} MB RSS")
+    print(f"[OK] with heavy deps preloaded: {eager_ms:.0f} ms, {eager_rss:.0f} MB RSS")
+    assert lazy_rss < eager_rss
+
+def test_verify_path_stays_light():
+    print("Checking verification path imports...")
+    with tempfile.TemporaryDirectory() as tmp:
+        loaded = run_python(VERIFY_PATH, os.path.join(tmp, 'verify.db'))
+    assert loaded == [], f"verification path imported {loaded}"
+    print("[OK] Verification path does not import pandas, qrcode, PIL or email modules")
+
+if __name__ == "__main__":
+    test_startup_benchmark()
+    test_verify_path_stays_light()
+    print("\n[SUCCESS] Startup tests passed!")
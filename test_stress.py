@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Stress harness for concurrent check-ins
+
+Starts the app on a synthetic database and fires scans from several
+processes, each with a pool of threads, at /api/verify-qr and
+/api/toggle-checkin:
+
+* duplicate storm: every code is scanned at several gates at once while
+  an admin also checks the member in by hand
+* distinct scans: one scan per remaining code, as fast as possible
+
+and checks that every member was admitted exactly once, that every
+success is in the database and the replication log (no lost updates),
+and reports throughput, latency and "database is locked" retries.
+
+Run directly for a bigger load: python test_stress.py [members] [copies]
+"""
+
+import http.cookiejar
+import json
+import os
+import random
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+PROCESSES = 4
+THREADS = 16
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def make_database(path, count):
+    import app
+    previous = app.app.config['DATABASE']
+    app.app.config['DATABASE'] = path
+    app.init_db()
+    app.save_members_to_db([{
+        'member_id': str(i),
+        'full_name': f'Member {i}',
+        'email': f'member{i}@example.org',
+        'phone': '',
+        'qr_code': f'AGA-{i}-stress'
+    } for i in range(1, count + 1)])
+    app.app.config['DATABASE'] = previous
+
+def start_app(db_path, port):
+    env = dict(os.environ,
+               DATABASE_URL=db_path,
+               PORT=str(port),
+               REPLICATION_TOKEN='',
+               VERIFY_RATE_PER_SECOND='100000',
+               VERIFY_BURST='100000',
+               VERIFY_GLOBAL_RATE_PER_SECOND='100000')
+    here = os.path.dirname(os.path.abspath(__file__))
+    proc = subprocess.Popen([sys.executable, 'app.py'], cwd=here, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    for _ in range(100):
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.1).close()
+            return proc
+        except OSError:
+            time.sleep(0.1)
+    proc.kill()
+    raise RuntimeError('app did not start')
+
+def admin_cookie(port):
+    jar = http.cookiejar.CookieJar()
+    opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(jar))
+    form = urllib.parse.urlencode({'username': 'admin', 'password': 'admintipcs'}).encode()
+    opener.open(f'http://127.0.0.1:{port}/admin/login', form, timeout=10)
+    return '; '.join(f'{cookie.name}={cookie.value}' for cookie in jar)
+
+def send(port, job):
+    """One scan or admin toggle; retried while the server reports lock waits"""
+    kind, member_id, gate, cookie = job
+    if kind == 'verify':
+        path, body = '/api/verify-qr', {'qr_data': f'AGA-{member_id}-stress'}
+        headers = {'X-Device-Id': gate}
+    else:
+        path, body = '/api/toggle-checkin', {'member_id': member_id, 'check_in': True}
+        headers = {'Cookie': cookie}
+    headers['Content-Type'] = 'application/json'
+
+    retries = 0
+    start = time.perf_counter()
+    while True:
+        request = urllib.request.Request(f'http://127.0.0.1:{port}{path}', json.dumps(body).encode(), headers)
+        try:
+            with urllib.request.urlopen(request, timeout=30) as response:
+                data = json.loads(response.read())
+            break
+        except urllib.error.HTTPError as e:
+            if e.code != 503:
+                raise
+            retries += 1
+            time.sleep(0.05)
+
+    success = data.get('valid') if kind == 'verify' else data.get('success')
+    return member_id, bool(success), retries, time.perf_counter() - start
+
+def run_chunk(args):
+    port, jobs = args
+    with ThreadPoolExecutor(THREADS) as pool:
+        return list(pool.map(lambda job: send(port, job), jobs))
+
+def fire(port, jobs):
+    chunks = [(port, jobs[i::PROCESSES]) for i in range(PROCESSES)]
+    start = time.perf_counter()
+    with ProcessPoolExecutor(PROCESSES) as pool:
+        results = [result for chunk in pool.map(run_chunk, chunks) for result in chunk]
+    return results, time.perf_counter() - start
+
+def report(label, results, elapsed):
+    latencies = sorted(result[3] for result in results)
+    retries = sum(result[2] for result in results)
+    p50 = latencies[len(latencies) // 2] * 1000
+    p95 = latencies[int(len(latencies) * 0.95)] * 1000
+    print(f"[OK] {label}: {len(results)} requests in {elapsed:.2f}s "
+          f"({len(results) / elapsed:.0f} req/s, p50 {p50:.1f} ms, p95 {p95:.1f} ms, "
+          f"{retries} 'database is locked' retries)")
+
+def run_stress(members=600, duplicated=150, copies=6):
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'stress.db')
+        make_database(db_path, members)
+        port = free_port()
+        proc = start_app(db_path, port)
+        try:
+            cookie = admin_cookie(port)
+
+            # Same code at `copies` gates plus one admin toggle, all at once
+            storm = [('verify', str(i), f'gate-{g}', None) for i in range(1, duplicated + 1) for g in range(copies)]
+            storm += [('toggle', str(i), 'admin', cookie) for i in range(1, duplicated + 1)]
+            random.Random(7).shuffle(storm)
+            results, elapsed = fire(port, storm)
+            successes = {}
+            for member_id, success, _, _ in results:
+                successes[member_id] = successes.get(member_id, 0) + success
+            assert all(successes[str(i)] == 1 for i in range(1, duplicated + 1)), \
+                {k: v for k, v in successes.items() if v != 1}
+            report(f'{copies + 1} concurrent check-ins per code', results, elapsed)
+
+            distinct = [('verify', str(i), f'gate-{i % 8}', None) for i in range(duplicated + 1, members + 1)]
+            results, elapsed = fire(port, distinct)
+            assert all(success for _, success, _, _ in results)
+            report('distinct scans', results, elapsed)
+        finally:
+            proc.terminate()
+            proc.wait(timeout=10)
+
+        conn = sqlite3.connect(db_path)
+        checked_in = conn.execute('SELECT COUNT(*) FROM members WHERE checked_in').fetchone()[0]
+        logged = conn.execute('SELECT COUNT(DISTINCT member_id), COUNT(*) FROM checkin_log').fetchone()
+        conn.close()
+        assert checked_in == members
+        assert logged == (members, members)
+        print(f"[OK] {members} members admitted exactly once, {logged[1]} replication log entries")
+
+def test_concurrent_checkins():
+    print("Stress testing concurrent check-ins...")
+    run_stress()
+
+if __name__ == "__main__":
+    members = int(sys.argv[1]) if len(sys.argv) > 1 else 3000
+    copies = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    run_stress(members, members // 4, copies)
+    print("\n[SUCCESS] Stress test passed!")
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Test script for scanner latency telemetry
+"""
+
+import random
+from telemetry import ScanTelemetry, percentile
+
+def test_percentiles_per_gate():
+    print("Testing scanner telemetry...")
+    now = [1000.0]
+    telemetry = ScanTelemetry(window_seconds=60, max_samples_per_gate=500, clock=lambda: now[0])
+    rng = random.Random(3)
+
+    telemetry.record('hall-a', [{'decode_ms': rng.uniform(20, 40), 'rtt_ms': rng.uniform(30, 60),
+                                 'display_ms': 16} for _ in range(200)])
+    telemetry.record('hall-b', [{'decode_ms': rng.uniform(20, 40), 'rtt_ms': rng.uniform(400, 900),
+                                 'display_ms': 16} for _ in range(200)])
+    # Typed-in codes have no decode time; junk values are discarded
+    telemetry.record('hall-a', [{'decode_ms': None, 'rtt_ms': 50, 'display_ms': 16},
+                                {'rtt_ms': 'slow'}, {'rtt_ms': -5}, {'rtt_ms': 1e9}, 'bogus'])
+
+    summary = telemetry.summary()
+    slowest, fastest = summary['gates']
+    assert slowest['gate'] == 'hall-b' and fastest['gate'] == 'hall-a'
+    assert 400 <= slowest['rtt_ms']['p50'] <= 900 and fastest['rtt_ms']['p95'] <= 60
+    assert fastest['samples'] == 201 and fastest['decode_ms']['count'] == 200
+    assert summary['received'] == 401 and summary['dropped'] == 4
+    print(f"[OK] Slow gate ranked first (round trip p95 {slowest['rtt_ms']['p95']:.0f} ms "
+          f"vs {fastest['rtt_ms']['p95']:.0f} ms)")
+
+    assert percentile([1, 2, 3, 4], 0.5) == 2 and percentile(list(range(1, 101)), 0.95) == 95
+    print("[OK] Nearest-rank percentiles")
+
+    telemetry.record('hall-a', [{'rtt_ms': 10}] * 600)
+    assert telemetry.summary()['gates'][-1]['samples'] == 500
+    now[0] += 61
+    assert telemetry.summary()['gates'] == []
+    print("[OK] Samples bounded per gate and expired after the window")
+
+def test_telemetry_endpoint():
+    import app
+    client = app.app.test_client()
+    response = client.post('/api/telemetry/scans', json={
+        'device_id': 'telemetry-test-gate',
+        'samples': [{'decode_ms': 25, 'rtt_ms': 80, 'display_ms': 17}] * 3
+    }, headers={'X-Device-Id': 'telemetry-test-gate'})
+    assert response.get_json() == {'success': True, 'recorded': 3}
+    assert client.post('/api/telemetry/scans', json={'samples': 'nope'},
+                       headers={'X-Device-Id': 'telemetry-test-gate'}).status_code == 400
+
+    assert client.get('/api/telemetry/scans').status_code == 302  # admin only
+    with client.session_transaction() as sess:
+        sess['admin_logged_in'] = True
+    gates = {gate['gate']: gate for gate in client.get('/api/telemetry/scans').get_json()['gates']}
+    assert gates['telemetry-test-gate']['rtt_ms']['p50'] == 80
+    print("[OK] Scanner batches recorded and summarized for the admin view")
+
+if __name__ == "__main__":
+    test_percentiles_per_gate()
+    test_telemetry_endpoint()
+    print("\n[SUCCESS] Telemetry tests passed!")
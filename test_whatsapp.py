@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Test script for WhatsApp invitations against a local stub of the Cloud API
+"""
+
+import json
+import threading
+import time
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from whatsapp_service import WhatsAppService
+
+class StubApi(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    state = None
+
+    def setup(self):
+        super().setup()
+        with self.state['lock']:
+            self.state['connections'] += 1
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers['Content-Length']))
+        state = self.state
+        assert self.headers['Authorization'] == 'Bearer test-token'
+        with state['lock']:
+            if self.path.endswith('/media'):
+                assert b'image/png' in body and b'\x89PNG' in body
+                state['uploads'] += 1
+                self._reply(200, {'id': f"media-{state['uploads']}"})
+                return
+            message = json.loads(body)
+            if state['throttle'] > 0:
+                state['throttle'] -= 1
+                # Retry-After in both forms: an HTTP date, then delay-seconds
+                retry_after = '0' if state['throttle'] % 2 else formatdate(usegmt=True)
+                self._reply(429, {'error': {'message': 'Rate limit hit'}}, {'Retry-After': retry_after})
+                return
+            if message['to'] == '21699999999':
+                self._reply(400, {'error': {'message': 'Invalid recipient'}})
+                return
+            state['messages'].append(message)
+            self._reply(200, {'messages': [{'id': f"wamid-{len(state['messages'])}"}]})
+
+    def _reply(self, status, payload, headers=None):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+def start_stub():
+    StubApi.state = {'lock': threading.Lock(), 'connections': 0, 'uploads': 0, 'messages': [], 'throttle': 2}
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubApi)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, StubApi.state
+
+def members(count):
+    return [{'member_id': str(i), 'full_name': f'Member {i}', 'phone': f'+216 20 {i:03d} {i:03d}',
+             'qr_code': f'AGA-{i}-abcdef12'} for i in range(1, count + 1)]
+
+def test_bulk_whatsapp_invitations():
+    print("Testing WhatsApp invitations...")
+    server, state = start_stub()
+    try:
+        service = WhatsAppService(f'http://127.0.0.1:{server.server_port}/v19.0/12345', 'test-token',
+                                  rate_per_second=200, concurrency=4)
+        batch = members(40) + [{'full_name': 'No Phone', 'phone': '', 'qr_code': 'AGA-X-1'},
+                               {'full_name': 'Bad Number', 'phone': '99 999 999', 'qr_code': 'AGA-Y-1'}]
+        start = time.perf_counter()
+        results = service.send_bulk_invitations(batch)
+        elapsed = time.perf_counter() - start
+
+        assert [r['member'] for r in results] == [m['full_name'] for m in batch]
+        assert all(r['success'] for r in results[:40])
+        assert results[40]['message'] == 'No phone number provided'
+        assert not results[41]['success'] and 'Invalid recipient' in results[41]['message']
+        stats = service.get_stats(results)
+        assert (stats['total'], stats['successful'], stats['failed']) == (42, 40, 2)
+        print(f"[OK] 40 sent, 2 rejected, same result/stats format as email ({elapsed * 1000:.0f} ms)")
+
+        sent = {m['to']: m for m in state['messages']}
+        first = sent['21620001001']['template']
+        assert first['components'][0]['parameters'][0]['image']['id'].startswith('media-')
+        assert first['components'][1]['parameters'][0]['text'] == 'Member 1'
+        print("[OK] Template messages reference the uploaded QR image; 429 responses retried")
+
+        assert state['connections'] <= 4 and service.pool.opened <= 4
+        print(f"[OK] {state['uploads'] + len(state['messages']) + 3} requests over {state['connections']} keep-alive connections")
+
+        uploads = state['uploads']
+        results = service.send_bulk_invitations(members(40))
+        assert all(r['success'] for r in results) and state['uploads'] == uploads
+        print("[OK] Resending reuses uploaded media ids")
+        service.close()
+    finally:
+        server.shutdown()
+        server.server_close()
+
+def test_rate_limit_paces_requests():
+    server, state = start_stub()
+    state['throttle'] = 0
+    try:
+        service = WhatsAppService(f'http://127.0.0.1:{server.server_port}', 'test-token',
+                                  rate_per_second=50, concurrency=8)
+        start = time.perf_counter()
+        results = service.send_bulk_invitations(members(40))
+        elapsed = time.perf_counter() - start
+        service.close()
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    # 80 API calls with a burst of 50 at 50/s need at least 0.6 s
+    assert all(r['success'] for r in results)
+    assert elapsed >= 0.55, elapsed
+    print(f"[OK] 80 API calls took {elapsed:.2f}s under a 50/s token bucket with a burst of 50")
+    stats = service.pacer.stats()
+    assert stats['calls'] == 80 and 0 < stats['paced'] <= 30 and stats['waited_seconds'] > 0
+    print(f"[OK] {stats['paced']} calls paced, {stats['waited_seconds']:.2f}s waited in total")
+
+def test_retry_delay():
+    delay = WhatsAppService._retry_delay
+    assert delay('3', 1) == 3.0 and delay('-1', 1) == 0.0
+    assert 8 < delay(formatdate(time.time() + 10, usegmt=True), 1) <= 10
+    assert delay('Wed, 21 Oct 2015 07:28:00 GMT', 1) == 0.0
+    assert delay('soon', 3) == 4 and delay(None, 2) == 2
+    print("[OK] Retry-After parsed as seconds or an HTTP date, backoff otherwise")
+
+def test_unconfigured():
+    results = WhatsAppService('', '').send_bulk_invitations(members(2))
+    assert [r['message'] for r in results] == ['WhatsApp credentials not configured'] * 2
+    print("[OK] Unconfigured channel reports every member as failed")
+
+if __name__ == "__main__":
+    test_bulk_whatsapp_invitations()
+    test_rate_limit_paces_requests()
+    test_retry_delay()
+    test_unconfigured()
+    print("\n[SUCCESS] WhatsApp tests passed!")
@@ -0,0 +1,295 @@
+"""
+WhatsApp invitation channel
+
+Sends the same access pass as the invitation email through the WhatsApp
+Cloud API: each member's QR image is uploaded once (media ids are cached
+per QR code) and a template message referencing it is sent. Requests run
+concurrently over a small pool of keep-alive HTTP connections and are
+paced by a token bucket so the API rate limit is never exceeded. Results
+use the same format as EmailService.send_bulk_invitations.
+"""
+
+import http.client
+import json
+import queue
+import threading
+import time
+import urllib.parse
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from config import Config
+from dedupe import normalize_phone
+
+# Statuses worth retrying: rate limited or a server-side failure
+TRANSIENT_STATUSES = {429, 500, 502, 503, 504}
+
+
+class WhatsAppError(Exception):
+    def __init__(self, status, message):
+        super().__init__(f'{status}: {message}')
+        self.status = status
+
+    @property
+    def transient(self):
+        return self.status in TRANSIENT_STATUSES
+
+
+class Pacer:
+    """Token bucket that makes callers wait their turn instead of refusing them"""
+
+    def __init__(self, rate, burst):
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self.calls = 0
+        self.paced = 0
+        self.waited_seconds = 0.0
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            # Going below zero reserves the next free slot for this caller
+            self._tokens -= 1.0
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+            self.calls += 1
+            if wait:
+                self.paced += 1
+                self.waited_seconds += wait
+        if wait:
+            time.sleep(wait)
+
+    def stats(self):
+        with self._lock:
+            return {'calls': self.calls, 'paced': self.paced, 'waited_seconds': round(self.waited_seconds, 3)}
+
+
+class ConnectionPool:
+    """Keep-alive HTTP(S) connections to one host, shared by worker threads"""
+
+    def __init__(self, base_url, timeout=15):
+        parts = urllib.parse.urlsplit(base_url)
+        self.connection_class = http.client.HTTPSConnection if parts.scheme == 'https' else http.client.HTTPConnection
+        self.host = parts.hostname
+        self.port = parts.port
+        self.base_path = parts.path.rstrip('/')
+        self.timeout = timeout
+        self.opened = 0
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+
+    def request(self, method, path, body=None, headers=None):
+        """Send a request on an idle connection; returns (status, headers, body)"""
+        try:
+            conn, reused = self._idle.get_nowait(), True
+        except queue.Empty:
+            conn, reused = self._open(), False
+
+        try:
+            response = self._send(conn, method, path, body, headers)
+        except (http.client.HTTPException, OSError):
+            conn.close()
+            if not reused:
+                raise
+            # The server may have dropped an idle keep-alive connection
+            conn = self._open()
+            response = self._send(conn, method, path, body, headers)
+
+        status, response_headers, data, will_close = response
+        if will_close:
+            conn.close()
+        else:
+            self._idle.put(conn)
+        return status, response_headers, data
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+    def _open(self):
+        with self._lock:
+            self.opened += 1
+        return self.connection_class(self.host, self.port, timeout=self.timeout)
+
+    def _send(self, conn, method, path, body, headers):
+        conn.request(method, self.base_path + path, body=body, headers=headers or {})
+        response = conn.getresponse()
+        data = response.read()
+        return response.status, response.headers, data, response.will_close
+
+
+class WhatsAppService:
+    def __init__(self, api_url=None, access_token=None, template_name=None, language=None,
+                 rate_per_second=None, concurrency=None, max_attempts=3):
+        self.api_url = api_url if api_url is not None else Config.WHATSAPP_API_URL
+        self.access_token = access_token if access_token is not None else Config.WHATSAPP_ACCESS_TOKEN
+        self.template_name = template_name or Config.WHATSAPP_TEMPLATE_NAME
+        self.language = language or Config.WHATSAPP_TEMPLATE_LANGUAGE
+        self.concurrency = concurrency or Config.WHATSAPP_CONCURRENCY
+        self.max_attempts = max_attempts
+        rate = rate_per_second or Config.WHATSAPP_RATE_PER_SECOND
+        self.pacer = Pacer(rate, max(rate, 1))
+        self._media_ids = {}
+        self._pool = None
+        self._renderer = None
+        self._lock = threading.Lock()
+
+    @property
+    def configured(self):
+        return bool(self.api_url and self.access_token)
+
+    @property
+    def pool(self):
+        with self._lock:
+            if self._pool is None:
+                self._pool = ConnectionPool(self.api_url)
+            return self._pool
+
+    def send_invitation(self, member_name, phone, qr_data):
+        """Send one invitation; returns (success, message) like EmailService"""
+        try:
+            self.deliver_invitation(member_name, phone, qr_data)
+            return True, "WhatsApp message sent successfully"
+        except Exception as e:
+            return False, f"Failed to send WhatsApp message: {str(e)}"
+
+    def deliver_invitation(self, member_name, phone, qr_data):
+        """Upload the QR image (once) and send the invitation template"""
+        to = normalize_phone(phone).lstrip('+')
+        if not to:
+            raise ValueError('No usable phone number')
+
+        media_id = self.upload_qr(member_name, qr_data)
+        return self._call('POST', '/messages', json.dumps({
+            'messaging_product': 'whatsapp',
+            'to': to,
+            'type': 'template',
+            'template': {
+                'name': self.template_name,
+                'language': {'code': self.language},
+                'components': [
+                    {'type': 'header', 'parameters': [{'type': 'image', 'image': {'id': media_id}}]},
+                    {'type': 'body', 'parameters': [{'type': 'text', 'text': member_name}]}
+                ]
+            }
+        }).encode(), 'application/json')
+
+    def upload_qr(self, member_name, qr_data):
+        """Media id of the member's QR image, uploading it the first time"""
+        media_id = self._media_ids.get(qr_data)
+        if media_id:
+            return media_id
+
+        renderer = self._get_renderer()
+        png = renderer.encode_png(renderer.generate_qr_code_image(qr_data, member_name))
+        boundary = uuid.uuid4().hex
+        body = b''.join([
+            self._form_field(boundary, 'messaging_product', b'whatsapp'),
+            self._form_field(boundary, 'type', b'image/png'),
+            self._form_field(boundary, 'file', png, filename='qr-code.png', content_type='image/png'),
+            f'--{boundary}--\r\n'.encode()
+        ])
+        media_id = self._call('POST', '/media', body, f'multipart/form-data; boundary={boundary}')['id']
+        self._media_ids[qr_data] = media_id
+        return media_id
+
+    def send_bulk_invitations(self, members):
+        """Send invitations concurrently; results keep the members' order"""
+        if not self.configured:
+            return [self._result(m.get('full_name', 'Unknown'), m.get('phone', ''), False,
+                                 'WhatsApp credentials not configured') for m in members]
+
+        def send(member):
+            name = member.get('full_name', 'Unknown')
+            if not member.get('phone'):
+                return self._result(name, 'No phone', False, 'No phone number provided')
+            if not member.get('qr_code'):
+                return self._result(name, member['phone'], False, 'No QR code provided')
+            success, message = self.send_invitation(name, member['phone'], member['qr_code'])
+            return self._result(name, member['phone'], success, message)
+
+        with ThreadPoolExecutor(self.concurrency) as executor:
+            return list(executor.map(send, members))
+
+    def get_stats(self, results):
+        """Sending statistics, in the same format as EmailService.get_email_stats"""
+        return self._get_renderer().get_email_stats(results)
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.close()
+
+    def _get_renderer(self):
+        # The email service draws the pass image; imported lazily with qrcode
+        if self._renderer is None:
+            from email_service import EmailService
+            self._renderer = EmailService()
+        return self._renderer
+
+    def _call(self, method, path, body, content_type):
+        headers = {
+            'Authorization': f'Bearer {self.access_token}',
+            'Content-Type': content_type
+        }
+        for attempt in range(1, self.max_attempts + 1):
+            self.pacer.wait()
+            status, response_headers, data = self.pool.request(method, path, body, headers)
+            if status < 400:
+                return json.loads(data or b'{}')
+
+            error = WhatsAppError(status, self._error_message(data))
+            if not error.transient or attempt == self.max_attempts:
+                raise error
+            time.sleep(self._retry_delay(response_headers.get('Retry-After'), attempt))
+
+    @staticmethod
+    def _retry_delay(retry_after, attempt):
+        """Seconds to wait before a retry: Retry-After (seconds or an HTTP date), else backoff"""
+        if retry_after:
+            try:
+                return max(0.0, float(retry_after))
+            except ValueError:
+                pass
+            try:
+                when = parsedate_to_datetime(retry_after)
+            except (TypeError, ValueError):
+                pass
+            else:
+                if when.tzinfo is None:
+                    when = when.replace(tzinfo=timezone.utc)
+                return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+        return 2 ** (attempt - 1)
+
+    @staticmethod
+    def _error_message(data):
+        try:
+            return json.loads(data)['error']['message']
+        except (ValueError, KeyError, TypeError):
+            return data.decode(errors='replace')[:200]
+
+    @staticmethod
+    def _form_field(boundary, name, value, filename=None, content_type=None):
+        disposition = f'form-data; name="{name}"'
+        if filename:
+            disposition += f'; filename="{filename}"'
+        head = f'--{boundary}\r\nContent-Disposition: {disposition}\r\n'
+        if content_type:
+            head += f'Content-Type: {content_type}\r\n'
+        return head.encode() + b'\r\n' + value + b'\r\n'
+
+    @staticmethod
+    def _result(member_name, phone, success, message):
+        return {
+            'member': member_name,
+            'phone': phone,
+            'success': success,
+            'message': message
+        }